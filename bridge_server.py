@@ -14,10 +14,20 @@ import os
 import sys
 import json
 import asyncio
+import re
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncGenerator, List, Tuple
+
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.jsonl_segments import SegmentedLog
+from utils.latency import LatencyStats
+from utils.reply_tailer import ReplyTailer
+from utils.file_watcher import FileWatcher
+from utils.spool import FILE_LAYOUT, Spool, iter_spool_reply
+from utils.framing import FrameError, encode_frame, read_frame
+from utils.session_key import session_key_of
 
 try:
     from fastapi import FastAPI, HTTPException
@@ -50,6 +60,129 @@ OUTBOX_PATH = Path(os.getenv("OPENCLAW_OUTBOX", DEFAULT_OUTBOX))
 INBOX_PATH.mkdir(parents=True, exist_ok=True)
 OUTBOX_PATH.mkdir(parents=True, exist_ok=True)
 
+# 准入控制：限制同时等待回复的请求数与排队长度，超出时快速返回 429/503
+admission = AdmissionController(
+    max_inflight=int(os.getenv("BRIDGE_MAX_INFLIGHT", "16")),
+    max_queue=int(os.getenv("BRIDGE_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("BRIDGE_QUEUE_TIMEOUT", "5")),
+    retry_after=float(os.getenv("BRIDGE_RETRY_AFTER", "2")),
+)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    结束时调用 on_close 的流式响应
+
+    生成器的 finally 只有在生成器启动后才会执行；客户端在生成器启动前断开时，
+    准入槽位等资源由这里统一释放（正常完成、断开、发送失败都会调用）。
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+# inbox 分段日志：活动段超过大小/时间上限时轮转，监听器读过的段自动清理
+inbox_log = SegmentedLog(INBOX_PATH, "wechat_messages")
+
+# outbox 尾随读取器：单个后台任务读取新回复并分发给等待中的请求
+reply_tailer = ReplyTailer(OUTBOX_PATH / "wechat_replies.jsonl")
+
+# spool 布局（OPENCLAW_FILE_LAYOUT=spool）：每条消息/回复一个文件，按 ID 直接查找
+inbox_spool = Spool(INBOX_PATH) if FILE_LAYOUT == "spool" else None
+outbox_spool = Spool(OUTBOX_PATH) if FILE_LAYOUT == "spool" else None
+outbox_watcher = FileWatcher(OUTBOX_PATH) if FILE_LAYOUT == "spool" else None
+
+# 状态计数：启动时统计一次已有数量，之后增量更新
+# （jsonl 布局下 inbox 按日志增量统计，包括其他写入方；outbox 只计最终回复，不计 partial 片段）
+counters = {"inbox_base": 0, "outbox_base": 0, "inbox_written": 0, "replies_read": 0, "timeouts": 0, "waiting": 0}
+inbox_counted: Dict[str, Any] = {"cursor": None, "lock": asyncio.Lock()}
+
+# 文件桥接往返延迟（写入 inbox 到读到最终回复）
+round_trip = LatencyStats()
+
+# 同机部署时额外监听的 Unix 域套接字路径（留空不启用）
+UDS_PATH = os.getenv("BRIDGE_UDS_PATH", "")
+uds_server: Optional[asyncio.AbstractServer] = None
+uds_connections: set = set()
+
+
+@app.on_event("startup")
+async def start_reply_tailer():
+    """启动 outbox 尾随读取，并统计已有的消息与回复数"""
+    if FILE_LAYOUT == "spool":
+        counters["inbox_base"], counters["outbox_base"] = await asyncio.gather(
+            asyncio.to_thread(inbox_spool.count),
+            asyncio.to_thread(outbox_spool.count),
+        )
+        return
+    reply_tailer.start()
+    outbox_log = reply_tailer.log
+    counters["outbox_base"], _ = await asyncio.to_thread(
+        outbox_log.count, None, lambda entry: not entry.get("partial")
+    )
+    await _count_inbox()
+
+
+async def _count_inbox() -> int:
+    """
+    统计 inbox 中的消息数（jsonl 布局）
+    
+    FileBridgeConnector 等其他进程也会写入 inbox，只数本服务写入的会漏掉它们；
+    这里从日志本身增量统计，每次只读取上次统计之后追加的内容
+    """
+    async with inbox_counted["lock"]:
+        added, inbox_counted["cursor"] = await asyncio.to_thread(inbox_log.count, inbox_counted["cursor"])
+        counters["inbox_base"] += added
+    return counters["inbox_base"]
+
+
+@app.on_event("startup")
+async def start_uds_server():
+    """配置了 BRIDGE_UDS_PATH 时同时在 Unix 域套接字上提供服务"""
+    global uds_server
+    if not UDS_PATH:
+        return
+    if not hasattr(asyncio, "start_unix_server"):
+        print("[UDS] Unix domain sockets are not supported on this platform, skipped")
+        return
+    path = Path(UDS_PATH).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()  # 上次异常退出遗留的套接字文件
+    uds_server = await asyncio.start_unix_server(_handle_uds_connection, path=str(path))
+    os.chmod(path, 0o600)
+    print(f"[UDS] Listening on {path}")
+
+
+@app.on_event("shutdown")
+async def stop_uds_server():
+    """关闭 Unix 域套接字服务并删除套接字文件"""
+    if uds_server is None:
+        return
+    uds_server.close()
+    for writer in list(uds_connections):
+        writer.close()
+    await uds_server.wait_closed()
+    try:
+        Path(UDS_PATH).expanduser().unlink()
+    except FileNotFoundError:
+        pass
+
+
+@app.on_event("shutdown")
+async def stop_reply_tailer():
+    """停止 outbox 尾随读取"""
+    if FILE_LAYOUT == "spool":
+        outbox_watcher.close()
+        return
+    await reply_tailer.stop()
+
 
 class ChatRequest(BaseModel):
     """聊天请求"""
@@ -58,21 +191,15 @@ class ChatRequest(BaseModel):
     context: dict = {}
     session_key: Optional[str] = None
     stream: bool = False
+    chunk_size: Optional[int] = None  # 流式输出时每个事件的最大字符数，不填按段落输出
 
 
-async def forward_via_file_bridge(message: str, sender: str, context: dict) -> str:
-    """
-    通过文件桥接转发消息并等待回复
-    
-    流程:
-    1. 写入消息到 inbox
-    2. 轮询 outbox 等待回复（最多60秒）
-    3. 返回回复内容
-    """
+def _write_inbox(
+    message: str, sender: str, context: dict, stream: bool = False, session_key: Optional[str] = None
+) -> str:
+    """写入消息到 inbox，返回消息 ID（会话键随消息写入，监听器按会话串行处理）"""
     msg_id = str(uuid.uuid4())[:8]
     
-    # 1. 写入消息到 inbox
-    message_file = INBOX_PATH / "wechat_messages.jsonl"
     entry = {
         "id": msg_id,
         "timestamp": datetime.now().isoformat(),
@@ -80,51 +207,129 @@ async def forward_via_file_bridge(message: str, sender: str, context: dict) -> s
         "message": message,
         "context": context
     }
+    entry["session_key"] = session_key or session_key_of(entry)
+    if stream:
+        entry["stream"] = True
     
+    if FILE_LAYOUT == "spool":
+        inbox_spool.put(msg_id, entry)
+    else:
+        inbox_log.append(entry)
+    counters["inbox_written"] += 1
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Message #{msg_id} written to inbox")
+    return msg_id
+
+
+# 句末标点（切分后保留在句子末尾）
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;…\n])|(?<=\.)(?=\s)")
+
+
+def _split_chunks(text: str, chunk_size: Optional[int] = None) -> List[str]:
+    """
+    把回复切成流式输出的片段
+    
+    - 不指定 chunk_size：按段落（空行）切分
+    - 指定 chunk_size：按句子切分，再把相邻句子合并到不超过 chunk_size 个字符，
+      单句超长时按 chunk_size 硬切
+    拼接所有片段等于原文。
+    """
+    if not text:
+        return []
+    if not chunk_size or chunk_size <= 0:
+        parts = text.split("\n\n")
+        return [p if i == len(parts) - 1 else f"{p}\n\n" for i, p in enumerate(parts) if p or i < len(parts) - 1]
+    
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) > chunk_size:
+            chunks.append(current)
+            current = ""
+        current += sentence
+        while len(current) > chunk_size:
+            chunks.append(current[:chunk_size])
+            current = current[chunk_size:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+TIMEOUT_REPLY = "[Timeout] OpenClaw agent did not respond within 30 seconds. The agent may be offline or the file bridge is not synchronized.\n\nPossible solutions:\n1. Check if the file bridge monitor is running\n2. Switch to HTTP mode for faster response\n3. Check file permissions between Windows and Docker"
+
+
+async def _reply_events(msg_id: str, timeout: float = 30) -> AsyncGenerator[Tuple[str, str], None]:
+    """
+    按当前文件布局等待回复
+    
+    依次产出 ("chunk", 片段)，最后产出 ("done", 完整回复)；超时产出 ("done", TIMEOUT_REPLY)。
+    须在写入 inbox 后立即开始迭代。
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    if FILE_LAYOUT == "spool":
+        events = iter_spool_reply(outbox_spool, outbox_watcher, msg_id, timeout)
+    else:
+        events = reply_tailer.iter_reply(msg_id, timeout)
+    
+    counters["waiting"] += 1
+    try:
+        async for kind, text in events:
+            if kind == "done":
+                round_trip.record(loop.time() - started)
+                counters["replies_read"] += 1
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Reply #{msg_id} found")
+            yield kind, text
+            if kind == "done":
+                return
+    finally:
+        counters["waiting"] -= 1
+    
+    counters["timeouts"] += 1
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Timeout waiting for reply #{msg_id}")
+    yield "done", TIMEOUT_REPLY
+
+
+async def forward_via_file_bridge(
+    message: str, sender: str, context: dict, session_key: Optional[str] = None
+) -> str:
+    """
+    通过文件桥接转发消息并等待回复
+    
+    流程:
+    1. 写入消息到 inbox
+    2. 等待回复分发（最多30秒）
+    3. 返回回复内容
+    """
+    # 1. 写入消息到 inbox
     try:
-        with open(message_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Message #{msg_id} written to inbox")
+        msg_id = _write_inbox(message, sender, context, session_key=session_key)
     except Exception as e:
         print(f"Error writing to inbox: {e}")
         return f"[Error] Failed to write message: {e}"
     
-    # 2. 轮询等待回复（最多30秒，轮询间隔0.1秒）
-    reply_file = OUTBOX_PATH / "wechat_replies.jsonl"
-    start_time = datetime.now()
-    max_wait = 30  # 减少到30秒
-    
+    # 2. 等待最终回复（partial 片段忽略）
     print(f"[{datetime.now().strftime('%H:%M:%S')}] Waiting for reply #{msg_id}...")
+    reply = TIMEOUT_REPLY
+    async for kind, text in _reply_events(msg_id):
+        if kind == "done":
+            reply = text
+    return reply
+
+
+async def stream_via_file_bridge(
+    message: str, sender: str, context: dict, session_key: Optional[str] = None
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """
+    通过文件桥接转发消息并流式读取回复
     
-    # 先等待1秒给处理时间
-    await asyncio.sleep(1)
-    
-    while (datetime.now() - start_time).seconds < max_wait:
-        if reply_file.exists():
-            try:
-                with open(reply_file, "r", encoding="utf-8") as f:
-                    lines = f.readlines()
-                
-                # 查找对应 msg_id 的回复
-                for line in reversed(lines):
-                    try:
-                        reply_entry = json.loads(line.strip())
-                        if reply_entry.get("reply_to") == msg_id:
-                            reply = reply_entry.get("reply", "[Empty reply]")
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Reply #{msg_id} found")
-                            return reply
-                    except json.JSONDecodeError:
-                        continue
-                        
-            except Exception as e:
-                print(f"Error reading reply file: {e}")
-        
-        # 等待后重试（100ms轮询）
-        await asyncio.sleep(0.1)
-    
-    # 超时
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Timeout waiting for reply #{msg_id}")
-    return "[Timeout] OpenClaw agent did not respond within 30 seconds. The agent may be offline or the file bridge is not synchronized.\n\nPossible solutions:\n1. Check if the file bridge monitor is running\n2. Switch to HTTP mode for faster response\n3. Check file permissions between Windows and Docker"
+    监听器为流式请求写入的 partial 片段按顺序产出 ("chunk", 片段)，
+    最终回复产出 ("done", 完整回复)。
+    """
+    msg_id = _write_inbox(message, sender, context, stream=True, session_key=session_key)
+    async for event in _reply_events(msg_id):
+        yield event
 
 
 @app.get("/health")
@@ -135,6 +340,8 @@ async def health_check():
         "mode": "file_bridge",
         "inbox": str(INBOX_PATH),
         "outbox": str(OUTBOX_PATH),
+        "admission": admission.snapshot(),
+        "reply_waiters": counters["waiting"],
         "timestamp": datetime.now().isoformat(),
         "version": "2.0.0"
     }
@@ -142,12 +349,18 @@ async def health_check():
 
 @app.post("/api/v1/chat")
 async def chat(request: ChatRequest):
-    """非流式聊天接口"""
+    """非流式聊天接口（超出准入上限时返回 429/503 并附带 Retry-After）"""
+    try:
+        await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers=e.headers)
+    
     try:
         reply = await forward_via_file_bridge(
             message=request.message,
             sender=request.sender,
-            context=request.context
+            context=request.context,
+            session_key=request.session_key
         )
         
         return {
@@ -158,24 +371,44 @@ async def chat(request: ChatRequest):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission.release()
 
 
 @app.post("/api/v1/chat/stream")
 async def chat_stream(request: ChatRequest):
-    """流式聊天接口"""
+    """
+    流式聊天接口
+    
+    监听器写入的 partial 片段到达即转发；最终回复只补发尚未转发的部分
+    """
+    try:
+        release = await admission.hold()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers=e.headers)
+    
     async def generate():
         try:
-            reply = await forward_via_file_bridge(
+            streamed = ""
+            async for kind, text in stream_via_file_bridge(
                 message=request.message,
                 sender=request.sender,
-                context=request.context
-            )
-            
-            # 模拟流式输出
-            for char in reply:
-                chunk = json.dumps({"content": char})
-                yield f"data: {chunk}\n\n"
-                await asyncio.sleep(0.005)
+                context=request.context,
+                session_key=request.session_key
+            ):
+                if kind == "chunk":
+                    streamed += text
+                    for chunk in _split_chunks(text, request.chunk_size):
+                        yield f"data: {json.dumps({'content': chunk})}\n\n"
+                    continue
+                
+                # 最终回复：只补发尚未转发的部分；监听器未分段写入时整段切块一次性发出
+                if streamed:
+                    rest = text[len(streamed):] if text.startswith(streamed) else ""
+                else:
+                    rest = text
+                for chunk in _split_chunks(rest, request.chunk_size):
+                    yield f"data: {json.dumps({'content': chunk})}\n\n"
             
             yield "data: [DONE]\n\n"
             
@@ -183,38 +416,96 @@ async def chat_stream(request: ChatRequest):
             error_chunk = json.dumps({"error": str(e)})
             yield f"data: {error_chunk}\n\n"
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    return ClosingStreamingResponse(generate(), on_close=release, media_type="text/event-stream")
 
 
-@app.get("/api/v1/status")
-async def get_status():
-    """获取状态"""
-    inbox_count = 0
-    outbox_count = 0
-    
+async def _serve_uds_request(frame: Dict[str, Any], send) -> None:
+    """处理 Unix 域套接字上的一个请求，响应帧格式见 core.openclaw_connector.UnixSocketConnector"""
+    request_id = frame.get("id")
     try:
-        msg_file = INBOX_PATH / "wechat_messages.jsonl"
-        if msg_file.exists():
-            with open(msg_file, "r", encoding="utf-8") as f:
-                inbox_count = len(f.readlines())
-    except:
-        pass
+        await admission.acquire()
+    except AdmissionRejected as e:
+        await send({
+            "id": request_id, "error": e.reason, "status": e.status_code,
+            "retry_after": e.retry_after, "done": True,
+        })
+        return
     
+    message = frame.get("message", "")
+    sender = frame.get("sender", "wechat-user")
+    context = frame.get("context") or {}
+    session_key = frame.get("session_key")
     try:
-        reply_file = OUTBOX_PATH / "wechat_replies.jsonl"
-        if reply_file.exists():
-            with open(reply_file, "r", encoding="utf-8") as f:
-                outbox_count = len(f.readlines())
-    except:
-        pass
+        if frame.get("stream"):
+            async for kind, text in stream_via_file_bridge(message, sender, context, session_key):
+                if kind == "chunk":
+                    await send({"id": request_id, "chunk": text})
+                else:
+                    await send({"id": request_id, "reply": text, "done": True})
+        else:
+            reply = await forward_via_file_bridge(message, sender, context, session_key)
+            await send({"id": request_id, "reply": reply, "done": True})
+    except (ConnectionError, OSError):
+        pass  # 客户端已断开
+    except Exception as e:
+        await send({"id": request_id, "error": str(e), "done": True})
+    finally:
+        admission.release()
+
+
+async def _handle_uds_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    一条 Unix 域套接字连接
+    
+    连接是持久的：每个请求帧单独起一个任务处理，响应帧按 id 交错写回，
+    写入用锁串行化以免帧内容互相穿插。连接断开时取消尚未完成的请求。
+    """
+    write_lock = asyncio.Lock()
+    tasks = set()
+    uds_connections.add(writer)
     
+    async def send(payload: Dict[str, Any]) -> None:
+        async with write_lock:
+            writer.write(encode_frame(payload))
+            await writer.drain()
+    
+    try:
+        while True:
+            frame = await read_frame(reader)
+            if frame is None:
+                break
+            task = asyncio.create_task(_serve_uds_request(frame, send))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (FrameError, ConnectionError) as e:
+        print(f"[UDS] Connection dropped: {e}")
+    finally:
+        uds_connections.discard(writer)
+        for task in tasks:
+            task.cancel()
+        writer.close()
+
+
+@app.get("/api/v1/status")
+async def get_status():
+    """获取状态（来自内存计数；jsonl 布局下只增量读取 inbox 新追加的内容）"""
+    if FILE_LAYOUT == "spool":
+        inbox_messages = counters["inbox_base"] + counters["inbox_written"]
+        outbox_replies = counters["outbox_base"] + counters["replies_read"]
+    else:
+        inbox_messages = await _count_inbox()
+        outbox_replies = counters["outbox_base"] + reply_tailer.stats["replies"]
     return {
         "agent_name": "xiaohuge",
         "mode": "file_bridge",
+        "layout": FILE_LAYOUT,
         "inbox_path": str(INBOX_PATH),
         "outbox_path": str(OUTBOX_PATH),
-        "inbox_messages": inbox_count,
-        "outbox_replies": outbox_count,
+        "inbox_messages": inbox_messages,
+        "outbox_replies": outbox_replies,
+        "pending_replies": counters["waiting"],
+        "timeouts": counters["timeouts"],
+        "round_trip": round_trip.snapshot(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -229,12 +520,14 @@ def main():
 ║     OpenClaw Agent Bridge Server v2.0.0       ║
 ╠════════════════════════════════════════════════╣
 ║  Mode:   File Bridge                           ║
+║  Layout: {FILE_LAYOUT:<36} ║
 ║  Agent:  xiaohuge                              ║
 ║  Host:   {host:<36} ║
 ║  Port:   {port:<36} ║
 ╠════════════════════════════════════════════════╣
 ║  Inbox:  {str(INBOX_PATH):<36} ║
 ║  Outbox: {str(OUTBOX_PATH):<36} ║
+║  UDS:    {(UDS_PATH or "disabled"):<36} ║
 ╚════════════════════════════════════════════════╝
 
 Started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -6,19 +6,26 @@ LangChain Agent 核心
 新增: OpenClaw 代理对接支持
 """
 import asyncio
+import hashlib
 import os
-from typing import Optional, List
+from typing import Optional, List, AsyncGenerator, Any, Dict, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain.tools import Tool
 from core.tool_manager import ToolManager
 from core.config import conf
-from core.openclaw_connector import OpenClawConnector, get_connector_info
-from core.openclaw_http_client import OpenClawHTTPClient
+from core.openclaw_connector import get_connector_info
+from core.connector_chain import ConnectorChain, get_connector_chain
+from core.memory import memory_manager
+from utils.session_key import derive_session_key
+from utils.token_window import Turn
+from utils.hedging import Hedger
+from utils.response_cache import DEFAULT_TTLS, ResponseCache, cache_key, classify_query, is_side_effecting, normalize_query
 from utils.logger import logger
 
 
@@ -72,6 +79,348 @@ def get_chat_model(provider, model_name, conf, temp=0.7, max_tokens=4096):
     #     )
 
 
+class HedgedChatModel(BaseChatModel):
+    """
+    对冲聊天模型
+    
+    主模型超过其观测到的 p95 仍未返回时，把同一组消息发给备用模型，
+    先返回者胜出、另一方取消；对冲次数受 Hedger 的预算限制。
+    对冲发生在单次模型调用上（ReAct 的每一步），工具不会被重复执行。
+    """
+    primary: BaseChatModel
+    secondary: BaseChatModel
+    hedger: Any = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+    
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        """同步调用不对冲，直接走主模型"""
+        return self.primary._generate(messages, stop=stop, **kwargs)
+    
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await self.hedger.call(
+            lambda: self.primary._agenerate(messages, stop=stop, **kwargs),
+            lambda: self.secondary._agenerate(messages, stop=stop, **kwargs),
+        )
+
+
+# 按主模型共享的对冲器（延迟样本与预算需要跨消息累积）
+_llm_hedgers: Dict[Tuple[str, str], Hedger] = {}
+
+
+def get_hedged_chat_model(provider, model_name, conf, temp=0.7, max_tokens=4096):
+    """
+    创建聊天模型；配置了 LLM_HEDGE_PROVIDER 时包装为对冲模型
+    
+    备用模型使用 LLM_HEDGE_MODEL（留空则与主模型同名）
+    """
+    primary = get_chat_model(provider, model_name, conf, temp, max_tokens)
+    hedge_provider = getattr(conf, 'llm_hedge_provider', '')
+    if primary is None or not hedge_provider:
+        return primary
+    
+    hedge_model = getattr(conf, 'llm_hedge_model', '') or model_name
+    secondary = get_chat_model(hedge_provider, hedge_model, conf, temp, max_tokens)
+    if secondary is None:
+        return primary
+    
+    hedger = _llm_hedgers.setdefault((provider, model_name), Hedger())
+    return HedgedChatModel(primary=primary, secondary=secondary, hedger=hedger)
+
+
+# NOTE: 同时检查英文前缀和中文关键词，覆盖所有错误格式
+_ERROR_PREFIXES = ["[Error]", "[Unavailable]", "[Timeout]", "[HTTP Error]", "[Bridge Error]", "[OpenClaw Error]", "[Busy]"]
+
+
+def _isErrorReply(reply: Optional[str]) -> bool:
+    """判断 OpenClaw 返回的是否为错误信息"""
+    return not reply or any(reply.startswith(prefix) for prefix in _ERROR_PREFIXES)
+
+
+def _isOpenClawEnabled() -> bool:
+    """是否走 OpenClaw 通道（LLM_PROVIDER=openclaw 或 OPENCLAW_ENABLED=true）"""
+    provider = getattr(conf, 'llm_provider', 'google')
+    openclaw_enabled = getattr(conf, 'openclaw_enabled', False)
+    if isinstance(openclaw_enabled, str):
+        openclaw_enabled = openclaw_enabled.lower() == 'true'
+    return provider == 'openclaw' or openclaw_enabled
+
+
+def _openClawChain() -> ConnectorChain:
+    """OpenClaw 连接器链：OPENCLAW_CHAIN（如 http,bridge,file），未配置时只用 openclaw_mode"""
+    spec = os.getenv("OPENCLAW_CHAIN", "") or getattr(conf, 'openclaw_mode', 'bridge')
+    return get_connector_chain(spec)
+
+
+def _buildOpenClawContext(role_level: int, kwargs: dict) -> dict:
+    """构建发送给 OpenClaw 的上下文"""
+    return {
+        "role_level": role_level,
+        "is_voice": kwargs.get("is_voice", False),
+        "group_name": kwargs.get("group_name", ""),
+        "timestamp": kwargs.get("timestamp", ""),
+    }
+
+
+def _memorySessionId(sender: str, kwargs: dict) -> str:
+    """传统 Agent 的记忆会话（与 OpenClaw 会话键一致：私聊按联系人，群聊按群内成员）"""
+    return derive_session_key(sender, kwargs.get("group_name") or None)
+
+
+def _remember(sessionId: str, userInput: str, reply: str) -> None:
+    """记录一问一答（回复为空时不记录，避免留下没有回答的提问）"""
+    if not reply:
+        return
+    try:
+        memory_manager.addUserMessage(sessionId, userInput)
+        memory_manager.addAiMessage(sessionId, reply)
+    except Exception as e:
+        logger.warning(f"对话记忆写入失败: {e}")
+
+
+async def _summarizeTurns(previous: str, turns: List[Turn]) -> str:
+    """用当前聊天模型把淘汰出窗口的对话并入滚动摘要"""
+    provider = getattr(conf, 'llm_provider', 'google')
+    if provider == 'openclaw':
+        return ""  # 没有本地模型，使用摘录式摘要
+    model_name = getattr(conf, 'model_name', 'gemini-1.5-flash')
+    limit = getattr(conf, 'memory_summary_tokens', 300)
+    dialogue = "\n".join(f"{'用户' if t.role == 'user' else '助手'}: {t.content}" for t in turns)
+    prompt = (
+        f"请把下面的新对话并入已有摘要，保留用户的身份、偏好、待办与已确认的事实，"
+        f"省略寒暄，输出不超过 {limit} 字的中文摘要，只输出摘要本身。\n\n"
+        f"【已有摘要】\n{previous or '（无）'}\n\n【新对话】\n{dialogue}"
+    )
+    chat_model = get_chat_model(provider, model_name, conf, 0.2, 512)
+    result = await chat_model.ainvoke([HumanMessage(content=prompt)])
+    content = result.content
+    return content if isinstance(content, str) else ""
+
+
+memory_manager.summarizer = _summarizeTurns
+
+
+_response_cache: Optional[ResponseCache] = None
+_cache_version: Tuple[int, str] = (-1, "")
+
+
+def _responseCache() -> Optional[ResponseCache]:
+    """回复缓存（RESPONSE_CACHE_ENABLED=false 时关闭）"""
+    global _response_cache
+    if str(getattr(conf, 'response_cache_enabled', True)).lower() != 'true':
+        return None
+    if _response_cache is None:
+        db_path = getattr(conf, 'response_cache_db_path', None) or "data/response_cache.db"
+        _response_cache = ResponseCache(conf.project_root / db_path)
+    return _response_cache
+
+
+def _cacheVersion() -> str:
+    """
+    提示词 / 工具 / 模型的版本哈希
+    
+    作为缓存键的一部分：系统提示、工具列表或模型配置变化（含重载配置）后，
+    旧回复自然不再命中，过期后被清理。
+    """
+    global _cache_version
+    if _cache_version[0] != conf.version:
+        try:
+            tools = sorted(f"{t.name}:{t.description}" for t in ToolManager.load_all_tools())
+        except Exception as e:
+            logger.warning(f"回复缓存版本计算时加载工具失败: {e}")
+            tools = []
+        raw = "\x00".join([
+            str(getattr(conf, 'llm_provider', '')),
+            str(getattr(conf, 'model_name', '')),
+            str(_isOpenClawEnabled()),
+            os.getenv("OPENCLAW_CHAIN", ""),
+            _build_system_prompt("", 0),
+            *tools,
+        ])
+        _cache_version = (conf.version, hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16])
+    return _cache_version[1]
+
+
+def _cacheLookup(userInput: str, role_level: int, sessionId: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    查询回复缓存
+    
+    常见问题的回答可能受会话历史影响，只在同一会话内复用；问候与身份回复跨会话共享。
+    
+    Returns:
+        (缓存键, 分类, 命中的回复)；消息不适合缓存（无法分类或可能触发副作用工具）时键为 None
+    """
+    cache = _responseCache()
+    if cache is None or is_side_effecting(userInput):
+        return None, None, None
+    normalized = normalize_query(userInput)
+    category = classify_query(normalized)
+    if category is None:
+        return None, None, None
+    key = cache_key(normalized, role_level, _cacheVersion(), sessionId if category == "faq" else "")
+    return key, category, cache.get(key)
+
+
+def _cacheStore(key: Optional[str], category: Optional[str], sender: str, reply: Optional[str], used_tools: int) -> None:
+    """写入回复缓存：调用过工具、出错或回复中带有用户名称的不缓存"""
+    if key is None or _response_cache is None or used_tools or _isErrorReply(reply):
+        return
+    if sender and sender in reply:
+        return
+    ttl = float(getattr(conf, f'response_cache_ttl_{category}', DEFAULT_TTLS[category]))
+    _response_cache.put(key, category, reply, ttl)
+
+
+_FINAL_ANSWER_MARKER = "Final Answer:"
+
+# 流式回复已发出部分内容后中途出错时，代替错误信息发给用户的提示
+_STREAM_INTERRUPTED = "\n\n（回复中断，请稍后重试）"
+
+
+async def _streamAgentReply(
+    userInput: str, sender: str, role_level: int, provider: str,
+    chat_history: Optional[list] = None, trace: Optional[dict] = None
+) -> AsyncGenerator[str, None]:
+    """
+    流式执行传统 ReAct Agent，逐段产出最终回复
+    
+    监听模型的逐 token 输出：某次模型调用中出现 "Final Answer:" 后，
+    其后的内容就是最终回复，立即产出；Thought / Action 等中间步骤不产出。
+    模型不支持流式（或事件流不可用）时，退回一次性产出 Agent 的最终结果。
+    trace["tools"] 累计本次调用的工具次数（供回复缓存判断）。
+    """
+    trace = {} if trace is None else trace
+    trace.setdefault("tools", 0)
+    agent_executor = _buildAgentExecutor(provider, sender, role_level)
+    inputs = {"input": userInput, "chat_history": chat_history or []}
+    
+    streamed = False
+    final_output = None
+    try:
+        buffer = ""
+        emitted = 0
+        async for event in agent_executor.astream_events(inputs, version="v1"):
+            kind = event["event"]
+            if kind == "on_chat_model_start":
+                # 每次模型调用（ReAct 的每一步）重新查找标记
+                buffer, emitted = "", 0
+            elif kind == "on_tool_start":
+                trace["tools"] += 1
+            elif kind == "on_chat_model_stream":
+                content = getattr(event["data"].get("chunk"), "content", "")
+                if not isinstance(content, str):
+                    continue
+                buffer += content
+                marker = buffer.find(_FINAL_ANSWER_MARKER)
+                if marker < 0:
+                    continue
+                answer = buffer[marker + len(_FINAL_ANSWER_MARKER):].lstrip()
+                if len(answer) > emitted:
+                    streamed = True
+                    yield answer[emitted:]
+                    emitted = len(answer)
+            elif kind == "on_chain_end" and event.get("name") == "AgentExecutor":
+                output = event["data"].get("output")
+                if isinstance(output, dict):
+                    final_output = output.get("output", "")
+    except (AttributeError, NotImplementedError) as e:
+        if streamed:
+            raise
+        logger.warning(f"Agent 事件流不可用，改为一次性执行: {e}")
+    
+    if streamed:
+        return
+    if final_output is None:
+        result = await agent_executor.ainvoke(inputs)
+        trace["tools"] += len(result.get("intermediate_steps") or [])
+        final_output = result.get("output", "")
+    reply = final_output.strip()
+    logger.info(f"Agent 生成回复: {reply[:100]}...")
+    if reply:
+        yield reply
+
+
+async def processMessageStream(userInput: str, sender: str, role_level: int = 1, **kwargs) -> AsyncGenerator[str, None]:
+    """
+    流式处理用户消息，逐段产出 AI 回复
+    
+    OpenClaw 模式下直接转发 Bridge 的 SSE 流，连接器链首段即报错时产出链的最终错误
+    （链内已按需换过通道，不再重走一遍），配置允许降级时改走传统 Agent；未启用 OpenClaw 时
+    流式执行传统 Agent，最终回复边生成边产出。命中回复缓存时直接产出缓存的回复。
+    每个片段都检查错误：中途出错时不转发错误信息，产出中断提示后结束，
+    不完整的回复不写入缓存与记忆。
+    
+    Args:
+        userInput: 用户输入内容
+        sender: 发送者标识
+        role_level: 用户角色级别
+        **kwargs: 额外参数（is_voice, group_name 等）
+        
+    Yields:
+        回复文本片段
+    """
+    session_id = _memorySessionId(sender, kwargs)
+    key, category, cached = _cacheLookup(userInput, role_level, session_id)
+    if cached is not None:
+        logger.info(f"回复缓存命中 [{category}]: {userInput[:30]}")
+        if not _isOpenClawEnabled():
+            _remember(session_id, userInput, cached)
+        yield cached
+        return
+    
+    if _isOpenClawEnabled():
+        context = _buildOpenClawContext(role_level, kwargs)
+        chain = _openClawChain()
+        stream = chain.send_message_stream(userInput, sender, **context)
+        
+        chunks = []
+        error = None
+        async for chunk in stream:
+            if not chunk:
+                continue
+            if _isErrorReply(chunk):
+                error = chunk
+                if chunks:
+                    logger.warning(f"[OpenClaw] Stream interrupted: {chunk[:80]}")
+                    yield _STREAM_INTERRUPTED
+                break
+            chunks.append(chunk)
+            yield chunk
+        await stream.aclose()
+        
+        if chunks:
+            # 只缓存正常结束的流：中途出错、未收到结束标记（连接器以错误片段收尾）都不缓存
+            if error is None:
+                _cacheStore(key, category, sender, "".join(chunks).strip(), 0)
+            return
+        
+        error = error or "[Error] OpenClaw 没有返回内容"
+        logger.error(f"[OpenClaw] Stream failed: {error[:80]}")
+        failure = _openClawFailureReply(error, chain.describe())
+        if failure is not None:
+            yield failure
+            return
+    
+    provider = getattr(conf, 'llm_provider', 'google')
+    chunks = []
+    trace = {"tools": 0}
+    try:
+        history = memory_manager.getMessages(session_id)
+        async for chunk in _streamAgentReply(userInput, sender, role_level, provider, history, trace):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        logger.error(f"Agent 流式处理消息失败: {e}")
+        if chunks:
+            yield _STREAM_INTERRUPTED
+        return
+    reply = "".join(chunks).strip()
+    _remember(session_id, userInput, reply)
+    _cacheStore(key, category, sender, reply, trace["tools"])
+
+
 async def processMessage(userInput: str, sender: str, role_level: int = 1, **kwargs) -> Optional[str]:
     """
     处理用户消息并返回 AI 回复
@@ -85,6 +434,45 @@ async def processMessage(userInput: str, sender: str, role_level: int = 1, **kwa
     Returns:
         AI 生成的回复文本，如果处理失败则返回 None
     """
+    # 问候、身份、常见问题等可缓存的提问先查回复缓存
+    session_id = _memorySessionId(sender, kwargs)
+    key, category, cached = _cacheLookup(userInput, role_level, session_id)
+    if cached is not None:
+        logger.info(f"回复缓存命中 [{category}]: {userInput[:30]}")
+        if not _isOpenClawEnabled():
+            _remember(session_id, userInput, cached)
+        return cached
+    
+    trace = {"tools": 0}
+    reply = await _generateReply(userInput, sender, role_level, trace, **kwargs)
+    _cacheStore(key, category, sender, reply, trace["tools"])
+    return reply
+
+
+def _openClawFailureReply(reply: str, chainName: str) -> Optional[str]:
+    """
+    OpenClaw 连接器链失败后回复给用户的内容，返回 None 表示降级到传统 AI
+    """
+    provider = getattr(conf, 'llm_provider', 'google')
+    openclaw_enabled = getattr(conf, 'openclaw_enabled', False)
+    if isinstance(openclaw_enabled, str):
+        openclaw_enabled = openclaw_enabled.lower() == 'true'
+    
+    # 如果 OpenClaw 失败且强制模式开启，返回错误
+    if openclaw_enabled and provider != 'openclaw':
+        return f"[OpenClaw Error] 无法连接到 OpenClaw ({chainName}模式): {reply}\n\n请检查:\n1. Bridge/HTTP 服务器是否运行\n2. .env 配置是否正确\n3. 配置 OPENCLAW_CHAIN=http,bridge,file 启用自动故障转移"
+    # OpenClaw 模式强制启用时直接返回错误
+    if provider == 'openclaw':
+        return reply
+    # 否则继续尝试传统模式（降级）
+    logger.info("[OpenClaw] Falling back to traditional AI...")
+    return None
+
+
+async def _generateReply(userInput: str, sender: str, role_level: int, trace: dict, **kwargs) -> Optional[str]:
+    """
+    生成回复（OpenClaw 通道或传统 Agent），trace["tools"] 记录传统 Agent 调用工具的次数
+    """
     try:
         # 获取配置
         provider = getattr(conf, 'llm_provider', 'google')
@@ -96,64 +484,27 @@ async def processMessage(userInput: str, sender: str, role_level: int = 1, **kwa
         # ==================== OpenClaw 模式 ====================
         # 条件：LLM_PROVIDER=openclaw 或 OPENCLAW_ENABLED=true
         if provider == 'openclaw' or openclaw_enabled:
-            # 获取模式：file 或 http
-            openclaw_mode = getattr(conf, 'openclaw_mode', 'bridge')
+            # 连接器链：按健康度与延迟选择通道，失败时自动换下一个
+            chain = _openClawChain()
+            openclaw_mode = chain.describe()
             
-            logger.info(f"[OpenClaw] Processing message from {sender} (mode: {openclaw_mode})")
+            logger.info(f"[OpenClaw] Processing message from {sender} (chain: {openclaw_mode})")
             
             # 构建上下文
-            context = {
-                "role_level": role_level,
-                "is_voice": kwargs.get("is_voice", False),
-                "group_name": kwargs.get("group_name", ""),
-                "timestamp": kwargs.get("timestamp", ""),
-            }
+            context = _buildOpenClawContext(role_level, kwargs)
             
-            reply = None
-            
-            # 根据模式选择连接器
-            if openclaw_mode == 'http':
-                # HTTP 模式（更快）
-                http_api = getattr(conf, 'openclaw_http_api', None)
-                if not http_api:
-                    http_api = 'http://localhost:9848'
-                logger.info(f"[OpenClaw] HTTP API: {http_api}")
-                client = OpenClawHTTPClient(http_api)
-                reply = await client.send_message(userInput, sender, **context)
-            else:
-                # File/Bridge 模式（默认）
-                connector = OpenClawConnector()
-                
-                # 健康检查
-                health_ok = await connector.health_check()
-                if not health_ok:
-                    logger.warning("[OpenClaw] Health check failed, attempting anyway...")
-                
-                # 发送消息到 OpenClaw
-                reply = await connector.send_message(
-                    message=userInput,
-                    sender=sender,
-                    **context
-                )
+            # 发送消息到 OpenClaw（健康状态由后台探测与熔断器维护，不再逐条检查）
+            reply = await chain.send_message(userInput, sender, **context)
             
             # 检查是否出错
-            # NOTE: 同时检查英文前缀和中文关键词，覆盖所有错误格式
-            error_indicators = ["[Error]", "[Timeout]", "[HTTP Error]", "[Bridge Error]"]
-            is_error = not reply or any(reply.startswith(prefix) for prefix in error_indicators)
-            
-            if not is_error:
+            if not _isErrorReply(reply):
                 logger.info(f"[OpenClaw] Reply received: {reply[:50]}...")
                 return reply
             else:
                 logger.error(f"[OpenClaw] Failed: {reply}")
-                # 如果 OpenClaw 失败且强制模式开启，返回错误
-                if openclaw_enabled and provider != 'openclaw':
-                    return f"[OpenClaw Error] 无法连接到 OpenClaw ({openclaw_mode}模式): {reply}\n\n请检查:\n1. Bridge/HTTP 服务器是否运行\n2. .env 配置是否正确\n3. 尝试切换 OPENCLAW_MODE=http 或 file"
-                # 否则继续尝试传统模式（降级）
-                if provider != 'openclaw':
-                    logger.info("[OpenClaw] Falling back to traditional AI...")
-                else:
-                    return reply  # OpenClaw 模式强制启用时直接返回错误
+                failure = _openClawFailureReply(reply, openclaw_mode)
+                if failure is not None:
+                    return failure
         
         # ==================== 传统 AI 模式 ====================
         # 只有当 OpenClaw 未启用或失败时才执行到这里
@@ -161,24 +512,48 @@ async def processMessage(userInput: str, sender: str, role_level: int = 1, **kwa
             # 如果走到这里，说明 OpenClaw 强制启用但失败了
             return "[Error] OpenClaw 模式已启用但连接失败，请检查配置"
         
-        # 修复：使用 model_name 而不是 llm_model
-        model_name = getattr(conf, 'model_name', 'gemini-1.5-flash')
-        temp = getattr(conf, 'temperature', 0.7)
-        max_tokens = getattr(conf, 'max_tokens', 4096)
+        agent_executor = _buildAgentExecutor(provider, sender, role_level)
         
-        # 创建聊天模型
-        chat_model = get_chat_model(provider, model_name, conf, temp, max_tokens)
-        
-        # 获取可用工具
-        tool_manager = ToolManager()
-        tools = tool_manager.load_all_tools()
+        # 执行 Agent（注入该会话的滚动摘要与 Token 预算内的最近对话）
+        session_id = _memorySessionId(sender, kwargs)
+        result = await agent_executor.ainvoke({
+            "input": userInput,
+            "chat_history": memory_manager.getMessages(session_id)
+        })
         
-        # 构建系统提示
-        system_prompt = _build_system_prompt(sender, role_level)
+        trace["tools"] = len(result.get("intermediate_steps") or [])
+        reply = result.get("output", "").strip()
+        logger.info(f"Agent 生成回复: {reply[:100]}...")
+        _remember(session_id, userInput, reply)
+        return reply
         
-        # 创建 ReAct Agent
-        # ReAct 提示词模板
-        react_instruction = """
+    except Exception as e:
+        logger.error(f"Agent 处理消息失败: {e}")
+        return None
+
+
+def _buildAgentExecutor(provider: str, sender: str, role_level: int) -> AgentExecutor:
+    """
+    构建传统 ReAct Agent 执行器（聊天模型、工具与系统提示）
+    """
+    # 修复：使用 model_name 而不是 llm_model
+    model_name = getattr(conf, 'model_name', 'gemini-1.5-flash')
+    temp = getattr(conf, 'temperature', 0.7)
+    max_tokens = getattr(conf, 'max_tokens', 4096)
+    
+    # 创建聊天模型（配置了备用模型时自动对冲慢请求）
+    chat_model = get_hedged_chat_model(provider, model_name, conf, temp, max_tokens)
+    
+    # 获取可用工具
+    tool_manager = ToolManager()
+    tools = tool_manager.load_all_tools()
+    
+    # 构建系统提示
+    system_prompt = _build_system_prompt(sender, role_level)
+    
+    # 创建 ReAct Agent
+    # ReAct 提示词模板
+    react_instruction = """
 TOOLS:
 ------
 You have access to the following tools:
@@ -201,40 +576,27 @@ Thought: Do I need to use a tool? No
 Final Answer: [your response here]
 ```
 """
-        full_system_prompt = system_prompt + "\n\n" + react_instruction
+    full_system_prompt = system_prompt + "\n\n" + react_instruction
 
 
 
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(full_system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}\n\n{agent_scratchpad}"),
-        ])
-        
-        agent = create_react_agent(chat_model, tools, prompt)
-
-        agent_executor = AgentExecutor(
-            agent=agent,
-            tools=tools,
-            verbose=True,
-            handle_parsing_errors=True,
-            max_iterations=10,
-            return_intermediate_steps=False
-        )
-        
-        # 执行 Agent
-        result = await agent_executor.ainvoke({
-            "input": userInput,
-            "chat_history": []
-        })
-        
-        reply = result.get("output", "").strip()
-        logger.info(f"Agent 生成回复: {reply[:100]}...")
-        return reply
-        
-    except Exception as e:
-        logger.error(f"Agent 处理消息失败: {e}")
-        return None
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(full_system_prompt),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}\n\n{agent_scratchpad}"),
+    ])
+
+    agent = create_react_agent(chat_model, tools, prompt)
+    
+    agent_executor = AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        handle_parsing_errors=True,
+        max_iterations=10,
+        return_intermediate_steps=True  # 回复缓存据此判断是否调用过工具
+    )
+    return agent_executor
 
 
 def _build_system_prompt(sender: str, role_level: int) -> str:
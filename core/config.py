@@ -21,9 +21,25 @@ class Config:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Config, cls).__new__(cls)
+            cls._instance._version = 0
             cls._instance._load()
         return cls._instance
 
+    @property
+    def version(self) -> int:
+        """配置版本号，每次 reload() 加一"""
+        return self._version
+
+    def reload(self) -> int:
+        """
+        重新加载 .env 与模板配置，返回新的配置版本号
+
+        长生命周期对象（如 OpenClaw 连接器注册表）比较版本号，发现变化后按新配置重建。
+        """
+        self._load()
+        self._version += 1
+        return self._version
+
     def _load(self):
         # 0. 初始化基础路径
         self.project_root = self.PROJECT_ROOT
@@ -41,9 +57,10 @@ class Config:
         except ImportError:
             pass
 
-        # 3. 环境变量覆盖
+        # 3. 环境变量覆盖（跳过方法与只读属性）
         for key in dir(self):
-            if not key.startswith("_"):
+            if not key.startswith("_") and not callable(getattr(type(self), key, None)) \
+                    and not isinstance(getattr(type(self), key, None), property):
                 env_val = os.getenv(key.upper())
                 if env_val is not None:
                     # 特殊处理 whitelist 字符串到列表的转换
@@ -21,6 +21,9 @@ class ConfigTemplate:
     temperature = 0.2
     max_output_tokens = 2048
     genai_rpm = 15
+    # 对冲：主模型超过其 p95 仍未返回时，把同一请求发给备用模型（留空不启用）
+    llm_hedge_provider = ""
+    llm_hedge_model = ""  # 留空则与 model_name 相同
     
     # 微信与行为
     master_wxid = "voodooq"
@@ -36,6 +39,7 @@ class ConfigTemplate:
     reply_delay_min = 2.0
     reply_delay_max = 5.0
     max_message_length = 500
+    stream_replies = False  # 流式回复：首段生成后立即发送，无需等待完整回复
     listen_interval = 1.0
     
     # 语音功能增强 (TTS)
@@ -49,6 +53,17 @@ class ConfigTemplate:
     summary_time = "22:00"
     summary_receiver = "文件传输助手"
     memory_window_size = 10
+    memory_token_budget = 1500      # 每个会话注入提示的最近对话 Token 上限
+    memory_summary_tokens = 300     # 更早对话的滚动摘要 Token 上限
+    memory_db_path = "data/memory.db"
+    memory_summary_slice = 0.2      # 两条消息之间推进后台摘要的最长时间（秒），未完成的留到之后继续
+
+    # 回复缓存（问候、身份、常见问题直接返回缓存的回复）
+    response_cache_enabled = True
+    response_cache_db_path = "data/response_cache.db"
+    response_cache_ttl_greeting = 86400     # 问候（秒，0 表示不缓存该分类）
+    response_cache_ttl_identity = 604800    # “你是谁”一类
+    response_cache_ttl_faq = 3600           # 常见问题
     
     # 稳定性
     retry_delay = 5.0
@@ -0,0 +1,334 @@
+"""
+OpenClaw 连接器故障转移链 (Connector Chain)
+
+按顺序配置多个通信模式，例如 OPENCLAW_CHAIN=http,bridge,file：
+
+- 每个模式单独统计 EWMA 延迟与 EWMA 错误率（错误率随时间半衰，故障恢复后通道会重新被选中）
+- 每次请求按“熔断状态 → 后台探测结果 → 错误率加权后的延迟 → 配置顺序”排序，
+  优先走最健康、最快的通道
+- 请求没有送达（熔断中、连接被拒绝、下游过载拒收）时自动尝试下一个，无需改配置或重启；
+  超时或下游报错时请求可能已被处理，换通道重发会产生重复回复，直接返回该错误
+
+- OPENCLAW_HEDGE=true 时启用对冲（非流式请求）：首选通道超过其 p95 仍未返回，
+  同一消息再发给次选通道，先成功者胜出（见 utils.hedging）。
+  落败的一方被取消，但只有能撤回请求的通道取消才有意义：HTTP Bridge 在客户端断开时
+  把尚未被 Worker 领取的消息移出队列；file/bridge/uds 的消息写入 inbox 后照样会被处理并回复。
+  因此只有排在前两位的通道都在 OPENCLAW_HEDGE_MODES（默认只有 http）中时才对冲，
+  能容忍重复处理的部署可以显式加入其他通道。
+  典型配置是两台 HTTP Bridge 服务器互为对冲：OPENCLAW_CHAIN=http,http@http://10.0.0.2:9848
+
+链中的名称：http（HTTP Bridge 服务器）、bridge、file、uds、moltbook、webhook。
+名称后可用 @ 指定该通道的通信目标（覆盖 .env 中该模式的地址），同一模式可出现多次；
+file 与 moltbook 不支持指定目标。
+未配置 OPENCLAW_CHAIN 时只包含 OPENCLAW_MODE 指定的单个模式，行为与原先一致。
+"""
+import asyncio
+import os
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, Tuple, Union
+
+from core.config import conf
+from core.openclaw_connector import ConnectorMode, OpenClawConnector, get_connector
+from utils.circuit_breaker import OPEN
+from utils.hedging import Hedger
+from utils.logger import logger
+
+# EWMA 平滑系数（越大越偏向最近的样本）
+EWMA_ALPHA = float(os.getenv("OPENCLAW_CHAIN_EWMA_ALPHA", "0.3"))
+# 错误率对排序的惩罚倍数：有效延迟 = 延迟 × (1 + 倍数 × 错误率)
+ERROR_PENALTY = float(os.getenv("OPENCLAW_CHAIN_ERROR_PENALTY", "4"))
+# 错误率半衰期（秒）
+ERROR_HALF_LIFE = float(os.getenv("OPENCLAW_CHAIN_ERROR_HALF_LIFE", "60"))
+# 尚无延迟样本的通道，错误率衰减到此值以下时优先试探一次
+EXPLORE_ERROR_RATE = 0.05
+# 是否对冲非流式请求
+HEDGE_ENABLED = os.getenv("OPENCLAW_HEDGE", "false").lower() == "true"
+
+# 链中名称到连接模式的映射（http 与 agent 的 OPENCLAW_MODE=http 含义一致，指 HTTP Bridge）
+CHAIN_NAMES = {
+    "http": ConnectorMode.HTTP_BRIDGE,
+    "http_bridge": ConnectorMode.HTTP_BRIDGE,
+    "bridge": ConnectorMode.BRIDGE,
+    "file": ConnectorMode.FILE,
+    "uds": ConnectorMode.UDS,
+    "moltbook": ConnectorMode.MOLTBOOK,
+    "webhook": ConnectorMode.HTTP,
+}
+
+# 可以参与对冲的通道（取消后请求能撤回，或部署方接受重复处理）
+HEDGE_MODES = os.getenv("OPENCLAW_HEDGE_MODES", "http")
+
+# 计为失败（错误率、对冲判负）的回复前缀
+_FAILURE_PREFIXES = ("[Error]", "[Unavailable]", "[Timeout]", "[HTTP Error]", "[Bridge Error]", "[Busy]")
+# 请求没有送达、可以换下一个通道重发的回复前缀（熔断中或连接被拒绝、下游过载拒收）
+_FAILOVER_PREFIXES = ("[Unavailable]", "[Busy]")
+
+
+def _is_failure(reply: Optional[str]) -> bool:
+    return not reply or reply.startswith(_FAILURE_PREFIXES)
+
+
+def _can_failover(reply: Optional[str]) -> bool:
+    return bool(reply) and reply.startswith(_FAILOVER_PREFIXES)
+
+
+# 链中的一个通道：连接模式 + 通信目标（None 表示使用 .env 中该模式的地址）
+ChainTarget = Tuple[ConnectorMode, Optional[str]]
+
+
+def parse_chain(spec: str) -> List[ChainTarget]:
+    """解析 "http,http@http://10.0.0.2:9848,bridge" 形式的链配置（忽略未知与重复的通道）"""
+    targets: List[ChainTarget] = []
+    for item in spec.split(","):
+        name, _, endpoint = item.strip().partition("@")
+        name = name.strip().lower()
+        if not name:
+            continue
+        mode = CHAIN_NAMES.get(name)
+        target = (mode, endpoint.strip() or None)
+        if mode is None:
+            logger.warning(f"[ConnectorChain] 未知的连接模式: {name}，已忽略")
+        elif target not in targets:
+            targets.append(target)
+    return targets
+
+
+class ChainMember:
+    """链中的一个通道及其 EWMA 统计"""
+
+    def __init__(self, connector: OpenClawConnector, index: int, alpha: float = EWMA_ALPHA, endpoint: Optional[str] = None):
+        self.connector = connector
+        self.index = index
+        self.endpoint = endpoint
+        self.alpha = alpha
+        self.latency: Optional[float] = None  # EWMA 延迟（秒），尚无样本时为 None
+        self._error_rate = 0.0  # EWMA 错误率（记录时刻的值）
+        self._updated = time.monotonic()
+        self.hedger = Hedger()  # 本通道作为首选时的对冲器（延迟分位数、预算）
+        self.stats = {"calls": 0, "failures": 0, "cancelled": 0}
+
+    @property
+    def name(self) -> str:
+        return self.connector.get_mode()
+
+    @property
+    def label(self) -> str:
+        """日志与描述中的名称（指定了通信目标时带上目标）"""
+        return f"{self.name}@{self.endpoint}" if self.endpoint else self.name
+
+    @property
+    def available(self) -> bool:
+        """熔断器未断开（半开状态允许试探）"""
+        return self.connector.health.breaker.state != OPEN
+
+    @property
+    def probe_down(self) -> bool:
+        """后台探测最近一次报告下游不可用"""
+        return self.connector.health.healthy is False
+
+    @property
+    def error_rate(self) -> float:
+        """按半衰期衰减后的错误率"""
+        if ERROR_HALF_LIFE <= 0:
+            return self._error_rate
+        age = time.monotonic() - self._updated
+        return self._error_rate * 0.5 ** (age / ERROR_HALF_LIFE)
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        """记录一次请求；失败只计入错误率，不污染延迟统计"""
+        self.stats["calls"] += 1
+        if ok:
+            self.latency = elapsed if self.latency is None else (
+                self.alpha * elapsed + (1 - self.alpha) * self.latency
+            )
+        else:
+            self.stats["failures"] += 1
+        self._error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+        self._updated = time.monotonic()
+
+    def cost(self, default_latency: float) -> float:
+        """
+        排序用的有效延迟
+
+        尚无延迟样本、错误率也已衰减的通道记为 0，下次请求先试探它一次，
+        拿到真实延迟后再参与比较。
+        """
+        error_rate = self.error_rate
+        if self.latency is None:
+            if error_rate < EXPLORE_ERROR_RATE:
+                return 0.0
+            return default_latency * (1 + ERROR_PENALTY * error_rate)
+        return self.latency * (1 + ERROR_PENALTY * error_rate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": self.name,
+            "endpoint": self.endpoint,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "circuit": self.connector.health.breaker.state,
+            **self.stats,
+            **({"hedge": self.hedger.snapshot()} if HEDGE_ENABLED else {}),
+        }
+
+
+class ConnectorChain:
+    """按健康度与延迟排序、自动故障转移的连接器链"""
+
+    def __init__(
+        self,
+        targets: List[Union[ConnectorMode, ChainTarget]],
+        hedge: bool = HEDGE_ENABLED,
+        hedge_modes: str = HEDGE_MODES,
+    ):
+        self.members: List[ChainMember] = []
+        for target in targets:
+            mode, endpoint = target if isinstance(target, tuple) else (target, None)
+            try:
+                connector = get_connector(mode, endpoint)
+            except ValueError as e:
+                logger.warning(f"[ConnectorChain] {e}，已忽略 {mode.value}@{endpoint}")
+                continue
+            self.members.append(ChainMember(connector, len(self.members), endpoint=endpoint))
+        if not self.members:
+            self.members.append(ChainMember(get_connector(ConnectorMode.BRIDGE), 0))
+        self.hedge = hedge
+        self.hedge_modes = {mode.value for mode, _ in parse_chain(hedge_modes)}
+        if hedge and sum(member.name in self.hedge_modes for member in self.members) < 2:
+            logger.warning(
+                f"[ConnectorChain] 对冲需要至少两个可撤回请求的通道（OPENCLAW_HEDGE_MODES={hedge_modes}），"
+                f"{self.describe()} 不会对冲；可用 http@<地址> 再加入一台 HTTP Bridge 服务器"
+            )
+        self.version = conf.version
+
+    def describe(self) -> str:
+        """链的可读描述，如 http_bridge→bridge→file"""
+        return "→".join(member.label for member in self.members)
+
+    def ranked(self) -> List[ChainMember]:
+        """
+        本次请求的尝试顺序
+
+        失败过但尚无延迟样本的通道按已知最快的延迟估计，
+        成本相同时保持配置顺序，因此启动后先走首选通道。
+        """
+        known = [m.latency for m in self.members if m.latency is not None]
+        default_latency = min(known) if known else 0.0
+        return sorted(
+            self.members,
+            key=lambda m: (not m.available, m.probe_down, m.cost(default_latency), m.index),
+        )
+
+    async def _attempt(
+        self, member: ChainMember, tried: Set[int], message: str, sender: str, context: Dict[str, Any]
+    ) -> str:
+        """经由一个通道发送并记录统计（被对冲取消时不计成败）"""
+        tried.add(member.index)
+        started = time.monotonic()
+        try:
+            reply = await member.connector.send_message(message, sender, **context)
+        except asyncio.CancelledError:
+            # 对冲落败：连接器已归还熔断器的半开试探名额，这里只计数
+            member.stats["cancelled"] += 1
+            raise
+        ok = not _is_failure(reply)
+        member.record(time.monotonic() - started, ok)
+        if not ok:
+            logger.warning(f"[ConnectorChain] {member.label} failed: {str(reply)[:80]}")
+        return reply
+
+    async def send_message(self, message: str, sender: str = "wechat-user", **context) -> str:
+        """
+        依次尝试各通道，返回第一个成功的回复
+
+        只在请求没有送达时换下一个通道；其他错误直接返回，全部未送达时返回最后一个错误
+        """
+        last_error = "[Error] OpenClaw 没有可用的连接通道"
+        ranked = self.ranked()
+        tried: Set[int] = set()
+        
+        available = [member for member in ranked if member.available]
+        if self.hedge and len(available) >= 2 and all(m.name in self.hedge_modes for m in available[:2]):
+            primary, secondary = available[0], available[1]
+            reply = await primary.hedger.call(
+                lambda: self._attempt(primary, tried, message, sender, context),
+                lambda: self._attempt(secondary, tried, message, sender, context),
+                is_failure=_is_failure,
+            )
+            if not _can_failover(reply):
+                return reply
+            last_error = reply
+        
+        for member in ranked:
+            if member.index in tried:
+                continue
+            if not member.available:
+                last_error = member.connector.circuit_open_reply()
+                continue
+            reply = await self._attempt(member, tried, message, sender, context)
+            if not _can_failover(reply):
+                return reply
+            last_error = reply
+        return last_error
+
+    async def send_message_stream(
+        self, message: str, sender: str = "wechat-user", **context
+    ) -> AsyncGenerator[str, None]:
+        """
+        流式发送：首个片段表明请求没有送达时换下一个通道
+
+        已开始输出后不再切换（避免重复内容），其他错误原样产出；
+        延迟按首个片段到达的时间统计。全部未送达时产出最后一个错误。
+        """
+        last_error = "[Error] OpenClaw 没有可用的连接通道"
+        for member in self.ranked():
+            if not member.available:
+                last_error = member.connector.circuit_open_reply()
+                continue
+            started = time.monotonic()
+            stream = member.connector.send_message_stream(message, sender, **context)
+            first = True
+            async for chunk in stream:
+                if first:
+                    first = False
+                    member.record(time.monotonic() - started, not _is_failure(chunk))
+                    if _can_failover(chunk):
+                        logger.warning(f"[ConnectorChain] {member.label} stream failed, trying next: {chunk[:80]}")
+                        last_error = chunk
+                        await stream.aclose()
+                        break
+                yield chunk
+            else:
+                if first:
+                    # 没有任何输出：请求可能已被处理，不再换通道
+                    member.record(time.monotonic() - started, False)
+                    yield f"[Error] OpenClaw {member.label} 没有返回内容"
+                return
+        yield last_error
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """各通道的统计（按配置顺序）"""
+        return [member.snapshot() for member in self.members]
+
+
+_chains: Dict[str, ConnectorChain] = {}
+
+
+def get_connector_chain(spec: Optional[str] = None) -> ConnectorChain:
+    """
+    取得进程内共享的连接器链（统计需要跨消息累积）
+
+    配置重新加载（conf.reload()）后整体重建，成员连接器同样取自新配置。
+
+    @param spec 链配置，默认读取 OPENCLAW_CHAIN，未配置时使用 OPENCLAW_MODE
+    """
+    if spec is None:
+        spec = os.getenv("OPENCLAW_CHAIN", "") or os.getenv("OPENCLAW_MODE", "bridge")
+    if any(chain.version != conf.version for chain in _chains.values()):
+        _chains.clear()
+    chain = _chains.get(spec)
+    if chain is None:
+        chain = ConnectorChain(parse_chain(spec))
+        _chains[spec] = chain
+        logger.info(f"[ConnectorChain] {chain.describe()}")
+    return chain
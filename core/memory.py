@@ -3,74 +3,188 @@
 
 按联系人/群维护独立上下文窗口，
 避免不同会话的信息混淆，同时控制 Token 消耗。
+
+- 最近的对话按 Token 预算保留（环形缓冲），而不是按消息条数
+- 超出预算的旧对话在后台折叠进每个会话的滚动摘要，提示长度不随对话轮数线性增长
+- 消息与摘要持久化到 SQLite，重启后记忆延续
 """
-from langchain_core.chat_history import InMemoryChatMessageHistory
-from langchain_core.messages import BaseMessage
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
 from core.config import conf
+from utils.conversation_store import ConversationStore
+from utils.token_window import TokenWindow, Turn, estimate_tokens, truncate_tokens
 from utils.logger import logger
 
+# 同时缓存在内存中的会话数（超出的会话仍在 SQLite 中，下次访问时重新加载）
+MAX_CACHED_SESSIONS = 256
+
+# 摘要器：(已有摘要, 被淘汰的消息) -> 新摘要
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+def _extractiveSummary(previous: str, turns: List[Turn]) -> str:
+    """没有可用摘要器（或调用失败）时的退路：按行追加消息摘录"""
+    lines = [previous] if previous else []
+    for turn in turns:
+        speaker = "用户" if turn.role == "user" else "助手"
+        text = " ".join(turn.content.split())
+        lines.append(f"{speaker}: {text[:80]}{'…' if len(text) > 80 else ''}")
+    return "\n".join(lines)
+
 
 class MemoryManager:
     """
     多会话记忆管理器
 
-    为每个联系人/群维护独立的对话历史，
-    使用滑动窗口限制保留的消息轮数。
+    为每个联系人/群维护独立的对话历史：
+    最近的消息保留在 Token 预算内，更早的消息折叠进滚动摘要。
     """
 
-    def __init__(self, windowSize: int | None = None):
+    def __init__(
+        self,
+        tokenBudget: int | None = None,
+        summaryTokens: int | None = None,
+        store: Optional[ConversationStore] = None,
+        summarizer: Optional[Summarizer] = None,
+    ):
         """
-        @param windowSize 每个会话保留的最大消息轮数（一问一答算2条）
+        @param tokenBudget 每个会话保留的最近消息 Token 上限
+        @param summaryTokens 滚动摘要的 Token 上限
+        @param store 持久化存储，默认使用 memory_db_path
+        @param summarizer 摘要器（通常由 Agent 注入 LLM 摘要），为空时使用摘录式摘要
         """
-        self._histories: dict[str, InMemoryChatMessageHistory] = {}
-        # [v12.2] 严格控制窗口大小，防止上下文污染
-        base_size = windowSize or getattr(conf, 'memory_window_size', 4) or 4
-        self._window_size = int(base_size) * 2
-
-    def getHistory(self, sessionId: str) -> InMemoryChatMessageHistory:
-        """
-        获取指定会话的历史记录，不存在则自动创建
-        """
-        if sessionId not in self._histories:
-            self._histories[sessionId] = InMemoryChatMessageHistory()
-            logger.info(f"创建新会话记忆: {sessionId} (Window: {self._window_size})")
-        return self._histories[sessionId]
+        self._budget = int(tokenBudget or getattr(conf, 'memory_token_budget', 1500) or 1500)
+        self._summary_budget = int(summaryTokens or getattr(conf, 'memory_summary_tokens', 300) or 300)
+        self._store = store or ConversationStore(
+            conf.project_root / (getattr(conf, 'memory_db_path', None) or "data/memory.db")
+        )
+        self.summarizer = summarizer
+        self._windows: "OrderedDict[str, TokenWindow]" = OrderedDict()
+        self._summaries: Dict[str, str] = {}
+        self._pending: Dict[str, List[Turn]] = {}  # 待折叠进摘要的消息
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _window(self, sessionId: str) -> TokenWindow:
+        """获取会话窗口，不在内存中时从 SQLite 加载"""
+        window = self._windows.get(sessionId)
+        if window is not None:
+            self._windows.move_to_end(sessionId)
+            return window
+
+        recent, older = self._store.load(sessionId, self._budget)
+        window = TokenWindow(self._budget, recent)
+        self._windows[sessionId] = window
+        self._summaries[sessionId] = self._store.get_summary(sessionId)
+        if older:
+            # 上次退出前没来得及折叠的消息
+            self._pending.setdefault(sessionId, []).extend(older)
+            self._scheduleSummary(sessionId)
+        logger.info(f"加载会话记忆: {sessionId} ({len(window)} 条, {window.tokens}/{self._budget} tokens)")
+
+        while len(self._windows) > MAX_CACHED_SESSIONS:
+            evicted, _ = self._windows.popitem(last=False)
+            if evicted not in self._pending:
+                self._summaries.pop(evicted, None)
+        return window
 
     def getMessages(self, sessionId: str) -> list[BaseMessage]:
         """
-        获取指定会话的历史消息列表（已截断到窗口大小）
+        获取指定会话的上下文消息：滚动摘要（如有）+ 预算内的最近消息
         """
-        history = self.getHistory(sessionId)
-        messages = list(history.messages)
-
-        # [v12.2] 增强滑动窗口：仅保留最近 N 条消息
-        if len(messages) > self._window_size:
-            trimmed = messages[-self._window_size:]
-            history.clear()
-            for msg in trimmed:
-                history.add_message(msg)
-            return trimmed
-
+        window = self._window(sessionId)
+        messages: list[BaseMessage] = []
+        summary = self._summaries.get(sessionId)
+        if summary:
+            messages.append(SystemMessage(content=f"【之前的对话摘要】\n{summary}"))
+        for turn in window:
+            if turn.role == "user":
+                messages.append(HumanMessage(content=turn.content))
+            else:
+                messages.append(AIMessage(content=turn.content))
         return messages
 
+    def _add(self, sessionId: str, role: str, content: str) -> None:
+        window = self._window(sessionId)
+        turn = self._store.append(sessionId, role, content, estimate_tokens(content))
+        evicted = window.append(turn)
+        if evicted:
+            self._pending.setdefault(sessionId, []).extend(evicted)
+            self._scheduleSummary(sessionId)
+
     def addUserMessage(self, sessionId: str, content: str) -> None:
         """记录用户消息"""
-        self.getHistory(sessionId).add_user_message(content)
+        self._add(sessionId, "user", content)
 
     def addAiMessage(self, sessionId: str, content: str) -> None:
         """记录 AI 回复消息"""
-        self.getHistory(sessionId).add_ai_message(content)
+        self._add(sessionId, "ai", content)
+
+    def _scheduleSummary(self, sessionId: str) -> None:
+        """在当前事件循环中后台折叠；没有运行中的事件循环时直接摘录"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._foldSync(sessionId)
+            return
+        task = self._tasks.get(sessionId)
+        if task is None or task.done():
+            self._tasks[sessionId] = loop.create_task(self._summarize(sessionId))
+
+    def _foldSync(self, sessionId: str) -> None:
+        turns = self._pending.pop(sessionId, [])
+        if turns:
+            self._commitSummary(sessionId, _extractiveSummary(self._summaries.get(sessionId, ""), turns), turns)
+
+    async def _summarize(self, sessionId: str) -> None:
+        """把待折叠的消息并入摘要（摘要期间新淘汰的消息在下一轮处理）"""
+        while self._pending.get(sessionId):
+            turns = self._pending.pop(sessionId)
+            previous = self._summaries.get(sessionId, "")
+            summary = ""
+            if self.summarizer is not None:
+                try:
+                    summary = (await self.summarizer(previous, turns) or "").strip()
+                except Exception as e:
+                    logger.warning(f"会话摘要生成失败，改用摘录: {e}")
+            self._commitSummary(sessionId, summary or _extractiveSummary(previous, turns), turns)
+        self._tasks.pop(sessionId, None)
+
+    def _commitSummary(self, sessionId: str, summary: str, turns: List[Turn]) -> None:
+        summary = truncate_tokens(summary, self._summary_budget)
+        self._summaries[sessionId] = summary
+        self._store.set_summary(sessionId, summary)
+        self._store.delete_through(sessionId, turns[-1].seq)
+        logger.debug(f"会话 {sessionId} 已折叠 {len(turns)} 条消息进摘要")
+
+    @property
+    def busy(self) -> bool:
+        """是否有进行中的摘要任务"""
+        return any(not task.done() for task in self._tasks.values())
+
+    async def flush(self, timeout: float = 30.0) -> None:
+        """等待进行中的摘要任务完成（超时后留待下次继续）"""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
 
     def clearSession(self, sessionId: str) -> None:
-        """清除指定会话的历史记录"""
-        if sessionId in self._histories:
-            self._histories[sessionId].clear()
-            logger.info(f"已清除会话记忆: {sessionId}")
+        """清除指定会话的历史记录与摘要"""
+        self._windows.pop(sessionId, None)
+        self._summaries.pop(sessionId, None)
+        self._pending.pop(sessionId, None)
+        self._store.clear(sessionId)
+        logger.info(f"已清除会话记忆: {sessionId}")
 
     def clearAll(self) -> None:
         """清除所有会话历史"""
-        self._histories.clear()
+        self._windows.clear()
+        self._summaries.clear()
+        self._pending.clear()
+        self._store.clear()
         logger.info("已清除全部会话记忆")
 
 
@@ -10,13 +10,50 @@ import aiohttp
 from typing import Optional, Dict, Any, AsyncGenerator
 from dataclasses import dataclass
 from utils.logger import logger
+from utils.session_key import derive_session_key
+
+
+def retry_after_seconds(headers, default: float = 1.0) -> float:
+    """解析 429/503 响应的 Retry-After 头（秒数格式），缺失或无法解析时返回默认值"""
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return default
+
+
+async def iter_sse_content(response: aiohttp.ClientResponse) -> AsyncGenerator[str, None]:
+    """
+    解析 Bridge 返回的 SSE 流，逐个产出 content 片段
+    
+    事件格式: data: {"content": "..."} / data: {"error": "..."} / data: [DONE]
+    没有收到 [DONE] 就断开的流以错误结尾，不会被当作完整的回复。
+    """
+    async for line in response.content:
+        line = line.decode('utf-8').strip()
+        if not line.startswith('data: '):
+            continue
+        data = line[6:]
+        if data == '[DONE]':
+            break
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        if chunk.get('error'):
+            yield f"[Error] {chunk['error']}"
+            break
+        content = chunk.get('content', '')
+        if content:
+            yield content
+    else:
+        yield "[Error] Bridge 流在 [DONE] 之前中断"
 
 
 @dataclass
 class OpenClawConfig:
     """OpenClaw 配置"""
     api_base: str = "http://localhost:9847"  # OpenClaw 网关地址
-    session_key: str = ""  # 会话密钥
+    session_key: str = ""  # 会话密钥（作为各会话键的命名空间）
     timeout: int = 120  # 超时时间（秒）
     
     @classmethod
@@ -71,7 +108,7 @@ class OpenClawBridge:
                 "message": message,
                 "sender": sender,
                 "context": context or {},
-                "session_key": self.config.session_key,
+                "session_key": self._session_key(sender, context),
             }
             
             logger.info(f"Sending message to OpenClaw: {message[:50]}...")
@@ -122,7 +159,7 @@ class OpenClawBridge:
                 "message": message,
                 "sender": sender,
                 "context": context or {},
-                "session_key": self.config.session_key,
+                "session_key": self._session_key(sender, context),
                 "stream": True,
             }
             
@@ -132,19 +169,8 @@ class OpenClawBridge:
                 headers={"Content-Type": "application/json"}
             ) as response:
                 if response.status == 200:
-                    async for line in response.content:
-                        line = line.decode('utf-8').strip()
-                        if line.startswith('data: '):
-                            data = line[6:]
-                            if data == '[DONE]':
-                                break
-                            try:
-                                chunk = json.loads(data)
-                                content = chunk.get('content', '')
-                                if content:
-                                    yield content
-                            except json.JSONDecodeError:
-                                continue
+                    async for content in iter_sse_content(response):
+                        yield content
                 else:
                     error_text = await response.text()
                     yield f"[OpenClaw Error] HTTP {response.status}"
@@ -153,6 +179,13 @@ class OpenClawBridge:
             logger.error(f"Stream error: {e}")
             yield f"[Error] {str(e)}"
     
+    def _session_key(self, sender: str, context: Optional[Dict[str, Any]]) -> str:
+        """会话键：context 中显式指定的优先，否则按 (群, 发送者) 派生（配置的 session_key 作为命名空间）"""
+        context = context or {}
+        return context.get("session_key") or derive_session_key(
+            sender, context.get("group_name"), namespace=self.config.session_key
+        )
+    
     async def health_check(self) -> bool:
         """检查 OpenClaw 服务是否可用"""
         try:
@@ -6,16 +6,33 @@ Universal OpenClaw Connector - 通用 OpenClaw 连接管理器
 2. http    - HTTP 轮询（实时性好）
 3. moltbook - Moltbook 私信（跨平台）
 4. bridge  - 本地 Bridge 服务器（兼容性最好）
+5. uds     - Unix 域套接字直连同机 Bridge（开销最低）
+6. http_bridge - HTTP Bridge 服务器（http_bridge_server.py）
+
+多种模式可以组成故障转移链，见 core.connector_chain。
 """
 import os
-import json
+import re
+import time
 import asyncio
 import aiohttp
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any, Callable, AsyncGenerator
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, AsyncGenerator, List, Set, Tuple
+from dataclasses import dataclass, replace
 from enum import Enum
+from core.openclaw_bridge import iter_sse_content, retry_after_seconds
+from core.config import conf
+from core.openclaw_http_client import OpenClawHTTPClient
+from utils.file_watcher import FileWatcher
+from utils.jsonl_segments import SegmentedLog
+from utils.spool import Spool, iter_spool_reply
+from utils.framing import FrameError, encode_frame, read_frame
+from utils.http_pool import get_session
+from utils.circuit_breaker import CircuitBreaker
+from utils.retry import RetryableError, RetryPolicy, retry_budget
+from utils.session_key import derive_session_key
 from utils.logger import logger
 
 
@@ -25,6 +42,17 @@ class ConnectorMode(Enum):
     HTTP = "http"           # HTTP 轮询
     MOLTBOOK = "moltbook"   # Moltbook 私信
     BRIDGE = "bridge"       # 本地 Bridge（默认）
+    UDS = "uds"             # Unix 域套接字（同机部署）
+    HTTP_BRIDGE = "http_bridge"  # HTTP Bridge 服务器
+
+
+# 各模式表示通信目标的配置字段
+_ENDPOINT_FIELDS = {
+    ConnectorMode.BRIDGE: "bridge_api_base",
+    ConnectorMode.UDS: "uds_path",
+    ConnectorMode.HTTP: "http_webhook_url",
+    ConnectorMode.HTTP_BRIDGE: "http_bridge_api",
+}
 
 
 @dataclass
@@ -35,11 +63,20 @@ class ConnectorConfig:
     # Bridge 模式配置
     bridge_api_base: str = "http://localhost:9847"
     bridge_timeout: int = 120
+    bridge_busy_retries: int = 3  # Bridge 返回 429/503 或拒绝连接时的重试次数（退避至少 Retry-After）
     
     # File 模式配置
     file_inbox_path: str = "~/.openclaw/inbox"
     file_outbox_path: str = "~/.openclaw/outbox"
-    file_poll_interval: float = 0.5  # 秒
+    file_poll_interval: float = 0.5  # 秒（inotify 不可用、回退轮询时的最长间隔）
+    file_layout: str = "jsonl"  # jsonl: 追加到 wechat_*.jsonl；spool: 每条消息/回复一个文件
+    
+    # UDS 模式配置
+    uds_path: str = "~/.openclaw/bridge.sock"
+    uds_timeout: int = 120
+    
+    # HTTP Bridge 模式配置
+    http_bridge_api: str = "http://localhost:9848"
     
     # HTTP 模式配置
     http_webhook_url: str = ""
@@ -50,6 +87,11 @@ class ConnectorConfig:
     moltbook_agent_name: str = "xiaohuge"
     moltbook_poll_interval: float = 5.0
     
+    # 健康探测与熔断
+    health_interval: float = 15.0  # 后台健康探测间隔（秒），0 表示不探测
+    breaker_failures: int = 3  # 连续失败多少次后熔断
+    breaker_reset: float = 30.0  # 熔断后多久放行试探请求（秒）
+    
     @classmethod
     def from_env(cls) -> "ConnectorConfig":
         """从环境变量加载配置"""
@@ -65,15 +107,146 @@ class ConnectorConfig:
             mode=mode,
             bridge_api_base=os.getenv("OPENCLAW_BRIDGE_API_BASE", "http://localhost:9847"),
             bridge_timeout=int(os.getenv("OPENCLAW_BRIDGE_TIMEOUT", "120")),
+            bridge_busy_retries=int(os.getenv("OPENCLAW_BRIDGE_BUSY_RETRIES", "3")),
             file_inbox_path=os.getenv("OPENCLAW_FILE_INBOX", "~/.openclaw/inbox"),
             file_outbox_path=os.getenv("OPENCLAW_FILE_OUTBOX", "~/.openclaw/outbox"),
             file_poll_interval=float(os.getenv("OPENCLAW_FILE_POLL_INTERVAL", "0.5")),
+            file_layout=os.getenv("OPENCLAW_FILE_LAYOUT", "jsonl").lower(),
+            uds_path=os.getenv("OPENCLAW_UDS_PATH", "~/.openclaw/bridge.sock"),
+            uds_timeout=int(os.getenv("OPENCLAW_UDS_TIMEOUT", "120")),
+            http_bridge_api=os.getenv("OPENCLAW_HTTP_API", "http://localhost:9848"),
             http_webhook_url=os.getenv("OPENCLAW_HTTP_WEBHOOK_URL", ""),
             http_poll_interval=float(os.getenv("OPENCLAW_HTTP_POLL_INTERVAL", "1.0")),
             moltbook_api_key=os.getenv("MOLTBOOK_API_KEY", ""),
             moltbook_agent_name=os.getenv("OPENCLAW_MOLTBOOK_AGENT", "xiaohuge"),
             moltbook_poll_interval=float(os.getenv("OPENCLAW_MOLTBOOK_POLL_INTERVAL", "5.0")),
+            health_interval=float(os.getenv("OPENCLAW_HEALTH_INTERVAL", "15")),
+            breaker_failures=int(os.getenv("OPENCLAW_BREAKER_FAILURES", "3")),
+            breaker_reset=float(os.getenv("OPENCLAW_BREAKER_RESET", "30")),
         )
+    
+    def with_endpoint(self, endpoint: str) -> "ConnectorConfig":
+        """
+        换用指定的通信目标（如同一模式的第二个 HTTP Bridge 服务器）
+
+        file 与 moltbook 模式没有单一的目标地址，不支持指定。
+        """
+        field = _ENDPOINT_FIELDS.get(self.mode)
+        if field is None:
+            raise ValueError(f"{self.mode.value} 模式不支持指定通信目标")
+        return replace(self, **{field: endpoint})
+    
+    def endpoint(self) -> str:
+        """当前模式下的通信目标（区分不同的健康状态）"""
+        if self.mode == ConnectorMode.FILE:
+            return f"{self.file_inbox_path}|{self.file_outbox_path}"
+        if self.mode == ConnectorMode.UDS:
+            return self.uds_path
+        if self.mode == ConnectorMode.HTTP:
+            return self.http_webhook_url
+        if self.mode == ConnectorMode.HTTP_BRIDGE:
+            return self.http_bridge_api
+        if self.mode == ConnectorMode.MOLTBOOK:
+            return self.moltbook_agent_name
+        return self.bridge_api_base
+
+
+class OutboxIndex:
+    """
+    outbox 回复索引（进程内共享）
+    
+    - 内存映射 outbox，只扫描上次之后追加的字节
+    - 记录 reply_to → (段序号, 偏移)，命中后才按偏移读取并解析该行
+    - 同一进程内并发等待的消息共用一份索引，新增内容只扫描一次
+    - 进程只登记一个读取位置：取扫描位置与仍有等待方、尚未取走的回复位置中的最小值，
+      快的等待方不会把位置推过慢的等待方还没读到的回复，分段清理不会删掉它们
+    """
+    
+    _REPLY_TO = re.compile(rb'"reply_to":\s*"([^"\\]*)"')
+    _PARTIAL = re.compile(rb'"partial":\s*true')
+    
+    def __init__(self, log: SegmentedLog, max_entries: int = 10000, checkpoint_interval: float = 5.0):
+        self.log = log
+        self.max_entries = max_entries
+        self.checkpoint_interval = checkpoint_interval
+        self._cursor = log.end_cursor()
+        self._index: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._waiting: Set[str] = set()
+        self._committed = None
+        self._last_commit = 0.0
+    
+    def refresh(self) -> int:
+        """
+        扫描新追加的回复
+        
+        @returns 新索引的回复数
+        """
+        lines, self._cursor = self.log.read_lines(self._cursor)
+        added = 0
+        for seq, offset, raw in lines:
+            # JSON 字符串内的引号都会被转义，按字节匹配不会误中回复正文
+            if self._PARTIAL.search(raw):
+                continue
+            match = self._REPLY_TO.search(raw)
+            if match:
+                reply_to = match.group(1).decode("utf-8", "replace")
+            else:
+                entry = self.log.parse_line(raw)
+                if not entry or entry.get("partial") or not entry.get("reply_to"):
+                    continue
+                reply_to = str(entry["reply_to"])
+            self._index[reply_to] = (seq, offset)
+            added += 1
+        while len(self._index) > self.max_entries:
+            self._index.popitem(last=False)
+        
+        # 定期登记读取位置，供监听器清理已读过的 outbox 分段
+        now = time.monotonic()
+        floor = self.floor()
+        if floor != self._committed and now - self._last_commit >= self.checkpoint_interval:
+            try:
+                self.log.commit("connector", floor)
+                self._committed, self._last_commit = floor, now
+            except OSError as e:
+                logger.warning(f"[FileBridge] Failed to save checkpoint: {e}")
+        return added
+    
+    def watch(self, msg_id: str) -> None:
+        """登记一个等待中的消息（其回复被取走前，登记的位置不会越过它）"""
+        self._waiting.add(msg_id)
+    
+    def unwatch(self, msg_id: str) -> None:
+        self._waiting.discard(msg_id)
+    
+    def floor(self) -> Tuple[int, int]:
+        """可以登记的读取位置：扫描位置与等待中回复位置的最小值"""
+        pending = [self._index[msg_id] for msg_id in self._waiting if msg_id in self._index]
+        return min([self._cursor, *pending])
+    
+    def pop(self, msg_id: str) -> Optional[Dict[str, Any]]:
+        """取出指定消息的回复（未到达或所在分段已被清理时返回 None）"""
+        position = self._index.pop(msg_id, None)
+        if position is None:
+            return None
+        entry = self.log.read_at(*position)
+        if not entry or entry.get("reply_to") != msg_id:
+            logger.warning(f"[FileBridge] Indexed reply #{msg_id} is no longer at {position}")
+            return None
+        return entry
+
+
+# 每个 outbox 目录一份索引，进程内所有连接器共享
+_outbox_indexes: Dict[str, OutboxIndex] = {}
+
+
+def get_outbox_index(outbox_path: Path) -> OutboxIndex:
+    """获取（或创建）指定 outbox 目录的共享回复索引"""
+    key = str(Path(outbox_path).resolve())
+    index = _outbox_indexes.get(key)
+    if index is None:
+        index = OutboxIndex(SegmentedLog(outbox_path, "wechat_replies"))
+        _outbox_indexes[key] = index
+    return index
 
 
 class FileBridgeConnector:
@@ -85,12 +258,32 @@ class FileBridgeConnector:
         self.outbox_path = Path(config.file_outbox_path).expanduser()
         self._ensure_directories()
         self._last_reply_time = 0
+        self.spool = config.file_layout == "spool"
+        if self.spool:
+            # spool 布局：消息写入 inbox/<id>.json，回复按 ID 读取 outbox/<id>.json
+            self.inbox_spool = Spool(self.inbox_path)
+            self.outbox_spool = Spool(self.outbox_path)
+        else:
+            # inbox/outbox 分段日志（按大小/时间轮转，已读分段自动清理）
+            self.inbox_log = SegmentedLog(self.inbox_path, "wechat_messages")
+            # 回复索引须在发出第一条消息前创建，从当前 outbox 末尾开始扫描
+            self.outbox_index = get_outbox_index(self.outbox_path)
+        # outbox 变更监听；file_poll_interval 作为轮询回退时的最长间隔
+        self._watcher = FileWatcher(
+            self.outbox_path,
+            names=None if self.spool else ["wechat_replies.jsonl"],
+            max_interval=config.file_poll_interval,
+        )
     
     def _ensure_directories(self):
         """确保目录存在"""
         self.inbox_path.mkdir(parents=True, exist_ok=True)
         self.outbox_path.mkdir(parents=True, exist_ok=True)
     
+    async def close(self):
+        """停止 outbox 监听"""
+        self._watcher.close()
+    
     async def send_message(
         self, 
         message: str, 
@@ -99,22 +292,28 @@ class FileBridgeConnector:
     ) -> str:
         """发送消息（写入 inbox）"""
         try:
-            msg_file = self.inbox_path / "wechat_messages.jsonl"
-            
             entry = {
                 "timestamp": datetime.now().isoformat(),
                 "sender": sender,
                 "message": message,
                 "context": context,
+                "session_key": context.get("session_key"),
                 "id": f"{datetime.now().timestamp()}"
             }
             
-            with open(msg_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            try:
+                if self.spool:
+                    self.inbox_spool.put(entry["id"], entry)
+                else:
+                    self.inbox_log.append(entry)
+            except OSError as e:
+                # 没写进 inbox：消息未送达
+                logger.error(f"[FileBridge] Failed to write inbox: {e}")
+                return f"[Unavailable] FileBridge: {str(e)}"
             
             logger.info(f"[FileBridge] Message written to inbox: {sender}")
             
-            # 等待回复（轮询 outbox）
+            # 等待回复（监听 outbox）
             return await self._wait_for_reply(entry["id"])
             
         except Exception as e:
@@ -122,29 +321,35 @@ class FileBridgeConnector:
             return f"[Error] FileBridge: {str(e)}"
     
     async def _wait_for_reply(self, msg_id: str, timeout: int = 60) -> str:
-        """等待回复"""
-        reply_file = self.outbox_path / "wechat_replies.jsonl"
-        start_time = datetime.now()
+        """等待回复（outbox 变化时刷新共享索引，按 reply_to 直接定位）"""
+        if self.spool:
+            reply = "[Timeout] 等待回复超时，OpenClaw 代理可能未响应"
+            async for kind, text in iter_spool_reply(self.outbox_spool, self._watcher, msg_id, timeout):
+                if kind == "done":
+                    logger.info(f"[FileBridge] Reply found for {msg_id}")
+                    reply = text
+            return reply
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
         
-        while (datetime.now() - start_time).seconds < timeout:
-            if reply_file.exists():
+        self.outbox_index.watch(msg_id)
+        try:
+            while loop.time() < deadline:
+                token = self._watcher.mark()
                 try:
-                    with open(reply_file, "r", encoding="utf-8") as f:
-                        lines = f.readlines()
-                    
-                    for line in reversed(lines):
-                        try:
-                            entry = json.loads(line)
-                            if entry.get("reply_to") == msg_id:
-                                logger.info(f"[FileBridge] Reply found for {msg_id}")
-                                return entry.get("reply", "[Empty reply]")
-                        except json.JSONDecodeError:
-                            continue
-                            
+                    self.outbox_index.refresh()
+                    entry = self.outbox_index.pop(msg_id)
+                    if entry is not None:
+                        logger.info(f"[FileBridge] Reply found for {msg_id}")
+                        return entry.get("reply", "[Empty reply]")
                 except Exception as e:
                     logger.warning(f"[FileBridge] Error reading reply: {e}")
-            
-            await asyncio.sleep(self.config.file_poll_interval)
+                
+                # 等待 outbox 变化；兜底至少每 5 秒重读一次
+                await self._watcher.wait(token, timeout=min(5.0, max(0.0, deadline - loop.time())))
+        finally:
+            self.outbox_index.unwatch(msg_id)
         
         return "[Timeout] 等待回复超时，OpenClaw 代理可能未响应"
 
@@ -168,35 +373,65 @@ class MoltbookConnector:
     ) -> str:
         """通过 Moltbook 私信发送"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # 构建完整消息
-                full_message = f"【{sender}】{message}"
-                if context.get("is_voice"):
-                    full_message = "[语音] " + full_message
+            session = get_session(self.api_base)
+            # 构建完整消息
+            full_message = f"【{sender}】{message}"
+            if context.get("is_voice"):
+                full_message = "[语音] " + full_message
                 
-                payload = {
-                    "recipient": self.config.moltbook_agent_name,
-                    "content": full_message
-                }
+            payload = {
+                "recipient": self.config.moltbook_agent_name,
+                "content": full_message
+            }
                 
-                async with session.post(
-                    f"{self.api_base}/dms",
-                    headers=self.headers,
-                    json=payload
-                ) as resp:
-                    if resp.status == 200:
-                        logger.info(f"[Moltbook] DM sent to {self.config.moltbook_agent_name}")
-                        return "[消息已通过 Moltbook 发送给 OpenClaw 代理]"
-                    else:
-                        error = await resp.text()
-                        logger.error(f"[Moltbook] API error: {resp.status} - {error}")
-                        return f"[Moltbook Error] {resp.status}"
+            async with session.post(
+                f"{self.api_base}/dms",
+                headers=self.headers,
+                json=payload
+            ) as resp:
+                if resp.status == 200:
+                    logger.info(f"[Moltbook] DM sent to {self.config.moltbook_agent_name}")
+                    return "[消息已通过 Moltbook 发送给 OpenClaw 代理]"
+                else:
+                    error = await resp.text()
+                    logger.error(f"[Moltbook] API error: {resp.status} - {error}")
+                    return f"[Moltbook Error] {resp.status}"
                         
+        except _NOT_DELIVERED as e:
+            logger.error(f"[Moltbook] Unreachable: {e}")
+            return f"[Unavailable] Moltbook: {str(e)}"
         except Exception as e:
             logger.error(f"[Moltbook] Failed to send: {e}")
             return f"[Error] Moltbook: {str(e)}"
 
 
+class HTTPBridgeConnector:
+    """HTTP Bridge 连接器（http_bridge_server.py，复用 OpenClawHTTPClient）"""
+    
+    def __init__(self, config: ConnectorConfig):
+        self.config = config
+        self.client = OpenClawHTTPClient(config.http_bridge_api, config.bridge_busy_retries)
+    
+    async def send_message(
+        self, 
+        message: str, 
+        sender: str, 
+        context: Dict[str, Any]
+    ) -> str:
+        """通过 HTTP Bridge 发送"""
+        return await self.client.send_message(message, sender, **context)
+    
+    async def send_message_stream(
+        self, 
+        message: str, 
+        sender: str, 
+        context: Dict[str, Any]
+    ) -> AsyncGenerator[str, None]:
+        """通过 HTTP Bridge 的 SSE 接口流式获取回复"""
+        async for content in self.client.send_message_stream(message, sender, **context):
+            yield content
+
+
 class HTTPConnector:
     """HTTP 连接器"""
     
@@ -215,30 +450,54 @@ class HTTPConnector:
             return "[Error] HTTP webhook URL not configured"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "message": message,
-                    "sender": sender,
-                    "context": context,
-                    "timestamp": datetime.now().isoformat()
-                }
+            session = get_session(self.webhook_url)
+            payload = {
+                "message": message,
+                "sender": sender,
+                "context": context,
+                "session_key": context.get("session_key"),
+                "timestamp": datetime.now().isoformat()
+            }
                 
-                async with session.post(
-                    self.webhook_url,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data.get("reply", "[No reply]")
-                    else:
-                        return f"[HTTP Error] {resp.status}"
+            async with session.post(
+                self.webhook_url,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    return data.get("reply", "[No reply]")
+                else:
+                    return f"[HTTP Error] {resp.status}"
                         
+        except _NOT_DELIVERED as e:
+            logger.error(f"[HTTP] Unreachable: {e}")
+            return f"[Unavailable] HTTP: {str(e)}"
         except Exception as e:
             logger.error(f"[HTTP] Failed: {e}")
             return f"[Error] HTTP: {str(e)}"
 
 
+# 可安全重试的错误：下游过载，或连接未建立（请求尚未送达）。
+# 超时与连接中途断开时请求可能已被处理，重试会产生重复回复，因此不重试
+_RETRYABLE = (RetryableError, aiohttp.ClientConnectorError, ConnectionRefusedError)
+# 连接未能建立（对方未监听、套接字文件不存在）：请求肯定没有送达，
+# 回复以 [Unavailable] 开头，连接器链据此放心换下一个通道重发
+_NOT_DELIVERED = (aiohttp.ClientConnectorError, ConnectionRefusedError, FileNotFoundError)
+
+
+def _busy_retry_policy(name: str, retries: int, deadline: float) -> RetryPolicy:
+    """连接器的重试策略：指数退避 + 抖动，共享进程级重试预算"""
+    return RetryPolicy(
+        max_attempts=retries + 1,
+        base_delay=0.5,
+        deadline=deadline,
+        retry_on=_RETRYABLE,
+        budget=retry_budget,
+        on_retry=lambda attempt, delay, e: logger.info(f"[{name}] {e}, retrying in {delay:.1f}s"),
+    )
+
+
 class BridgeConnector:
     """本地 Bridge 连接器（默认）"""
     
@@ -246,6 +505,7 @@ class BridgeConnector:
         self.config = config
         self.api_base = config.bridge_api_base
         self.timeout = config.bridge_timeout
+        self.retry = _busy_retry_policy("Bridge", config.bridge_busy_retries, self.timeout)
     
     async def send_message(
         self, 
@@ -253,44 +513,380 @@ class BridgeConnector:
         sender: str, 
         context: Dict[str, Any]
     ) -> str:
-        """通过本地 Bridge 发送"""
+        """
+        通过本地 Bridge 发送
+        
+        Bridge 过载返回 429/503 或连接被拒绝时，在总超时内退避重试（至少等待 Retry-After）
+        """
+        session = get_session(self.api_base)
+        payload = {
+            "message": message,
+            "sender": sender,
+            "context": context,
+            "session_key": context.get("session_key")
+        }
+        
+        async def attempt() -> str:
+            async with session.post(
+                f"{self.api_base}/api/v1/chat",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    return data.get("reply", "[Empty reply]")
+                if resp.status in (429, 503):
+                    raise RetryableError(
+                        f"[Busy] Bridge overloaded ({resp.status})", retry_after_seconds(resp.headers)
+                    )
+                error = await resp.text()
+                return f"[Bridge Error] {resp.status}: {error}"
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "message": message,
-                    "sender": sender,
-                    "context": context
-                }
-                
-                async with session.post(
-                    f"{self.api_base}/api/v1/chat",
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=self.timeout)
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data.get("reply", "[Empty reply]")
-                    else:
-                        error = await resp.text()
-                        return f"[Bridge Error] {resp.status}: {error}"
-                        
+            return await self.retry.call_async(attempt)
+        except RetryableError as e:
+            logger.warning(f"[Bridge] {e}, giving up")
+            return str(e)
         except asyncio.TimeoutError:
             return "[Timeout] Bridge 响应超时"
+        except _NOT_DELIVERED as e:
+            logger.error(f"[Bridge] Unreachable: {e}")
+            return f"[Unavailable] Bridge: {str(e)}"
         except Exception as e:
             logger.error(f"[Bridge] Failed: {e}")
             return f"[Error] Bridge: {str(e)}"
+    
+    async def send_message_stream(
+        self, 
+        message: str, 
+        sender: str, 
+        context: Dict[str, Any]
+    ) -> AsyncGenerator[str, None]:
+        """通过本地 Bridge 的 SSE 接口流式获取回复"""
+        try:
+            session = get_session(self.api_base)
+            payload = {
+                "message": message,
+                "sender": sender,
+                "context": context,
+                "session_key": context.get("session_key"),
+                "stream": True
+            }
+                
+            async with session.post(
+                f"{self.api_base}/api/v1/chat/stream",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as resp:
+                if resp.status == 200:
+                    async for content in iter_sse_content(resp):
+                        yield content
+                elif resp.status in (429, 503):
+                    yield f"[Busy] Bridge overloaded ({resp.status})"
+                else:
+                    error = await resp.text()
+                    yield f"[Bridge Error] {resp.status}: {error}"
+                        
+        except asyncio.TimeoutError:
+            yield "[Timeout] Bridge 响应超时"
+        except _NOT_DELIVERED as e:
+            logger.error(f"[Bridge] Unreachable: {e}")
+            yield f"[Unavailable] Bridge: {str(e)}"
+        except Exception as e:
+            logger.error(f"[Bridge] Stream failed: {e}")
+            yield f"[Error] Bridge: {str(e)}"
+
+
+class UnixSocketConnector:
+    """
+    Unix 域套接字连接器
+    
+    与 Bridge 同机部署时使用：一条持久连接上以长度前缀 JSON 帧收发，
+    每个请求带自增 id，多个请求可同时在途，由读取任务按 id 分发响应。
+    
+    请求帧: {"id", "message", "sender", "context", "stream"}
+    响应帧: {"id", "chunk"}（流式片段）/ {"id", "reply", "done": true}
+           / {"id", "error", "status", "retry_after", "done": true}
+    """
+    
+    def __init__(self, config: ConnectorConfig):
+        self.config = config
+        self.path = str(Path(config.uds_path).expanduser())
+        self.timeout = config.uds_timeout
+        self.retry = _busy_retry_policy("UDS", config.bridge_busy_retries, self.timeout)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[int, Tuple[asyncio.Queue, asyncio.StreamWriter]] = {}
+        self._next_id = 0
+    
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        """建立（或复用）持久连接；事件循环更换后重新连接"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._writer = None
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+        
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                self._writer = writer
+                loop.create_task(self._read_loop(reader, writer))
+                logger.info(f"[UDS] Connected to {self.path}")
+            return self._writer
+    
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """按 id 把响应帧分发给等待中的请求；连接断开时通知该连接上的所有请求"""
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                pending = self._pending.get(frame.get("id"))
+                if pending is not None:
+                    pending[0].put_nowait(frame)
+        except (FrameError, ConnectionError, OSError) as e:
+            logger.warning(f"[UDS] Connection error: {e}")
+        finally:
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+            for queue, owner in list(self._pending.values()):
+                if owner is writer:
+                    queue.put_nowait({"error": "connection closed", "done": True})
+    
+    async def _request(self, payload: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        """发送一个请求，逐个产出它的响应帧，直到 done"""
+        writer = await self._ensure_connected()
+        self._next_id += 1
+        request_id = self._next_id
+        queue: asyncio.Queue = asyncio.Queue()
+        self._pending[request_id] = (queue, writer)
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            async with self._write_lock:
+                writer.write(encode_frame({**payload, "id": request_id}))
+                await writer.drain()
+            
+            while True:
+                frame = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - loop.time()))
+                yield frame
+                if frame.get("done"):
+                    return
+        finally:
+            self._pending.pop(request_id, None)
+    
+    @staticmethod
+    def _error_text(frame: Dict[str, Any]) -> str:
+        status = frame.get("status")
+        if status in (429, 503):
+            return f"[Busy] Bridge overloaded ({status})"
+        return f"[Bridge Error] {frame.get('error')}"
+    
+    async def send_message(
+        self, 
+        message: str, 
+        sender: str, 
+        context: Dict[str, Any]
+    ) -> str:
+        """通过 Unix 域套接字发送（过载或连接被拒绝时退避重试）"""
+        payload = {"message": message, "sender": sender, "context": context,
+                   "session_key": context.get("session_key")}
+        
+        async def attempt() -> str:
+            reply = "[Empty reply]"
+            async for frame in self._request(payload):
+                if "error" in frame:
+                    reply = self._error_text(frame)
+                    if reply.startswith("[Busy]"):
+                        raise RetryableError(reply, frame.get("retry_after"))
+                elif frame.get("done"):
+                    reply = frame.get("reply", "[Empty reply]")
+            return reply
+        
+        try:
+            return await self.retry.call_async(attempt)
+        except RetryableError as e:
+            logger.warning(f"[UDS] {e}, giving up")
+            return str(e)
+        except asyncio.TimeoutError:
+            return "[Timeout] Bridge 响应超时"
+        except _NOT_DELIVERED as e:
+            logger.error(f"[UDS] Unreachable: {e}")
+            return f"[Unavailable] UDS: {str(e)}"
+        except (OSError, FrameError) as e:
+            logger.error(f"[UDS] Failed: {e}")
+            return f"[Error] UDS: {str(e)}"
+    
+    async def send_message_stream(
+        self, 
+        message: str, 
+        sender: str, 
+        context: Dict[str, Any]
+    ) -> AsyncGenerator[str, None]:
+        """通过 Unix 域套接字流式获取回复（最终帧只补发尚未产出的部分）"""
+        payload = {"message": message, "sender": sender, "context": context,
+                   "session_key": context.get("session_key"), "stream": True}
+        streamed = ""
+        try:
+            async for frame in self._request(payload):
+                if "error" in frame:
+                    yield self._error_text(frame)
+                elif "chunk" in frame:
+                    streamed += frame["chunk"]
+                    yield frame["chunk"]
+                elif frame.get("done"):
+                    reply = frame.get("reply", "")
+                    rest = reply[len(streamed):] if reply.startswith(streamed) else ("" if streamed else reply)
+                    if rest:
+                        yield rest
+        except asyncio.TimeoutError:
+            yield "[Timeout] Bridge 响应超时"
+        except _NOT_DELIVERED as e:
+            logger.error(f"[UDS] Unreachable: {e}")
+            yield f"[Unavailable] UDS: {str(e)}"
+        except (OSError, FrameError) as e:
+            logger.error(f"[UDS] Stream failed: {e}")
+            yield f"[Error] UDS: {str(e)}"
+    
+    async def close(self):
+        """关闭持久连接"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# 视为下游故障的回复前缀（[Busy] 表示下游在线但过载，不计入熔断）
+_FAILURE_PREFIXES = ("[Error]", "[Unavailable]", "[Timeout]", "[HTTP Error]", "[Bridge Error]")
+
+
+class ConnectorHealth:
+    """
+    连接器健康状态（同一模式与目标在进程内共享一份）
+    
+    - 后台任务按 interval 定期探测，结果缓存，并驱动熔断器
+    - 发送路径只读熔断器状态，不再为每条消息额外发起探测
+    - 实际请求的成败同样计入熔断器：下游宕机时连续失败几次即熔断，
+      之后的消息立即返回错误（交给上层降级），不必逐条等满超时
+    """
+    
+    def __init__(self, probe: Callable[[], Any], interval: float, breaker: CircuitBreaker):
+        self.probe = probe
+        self.interval = interval
+        self.breaker = breaker
+        self.healthy: Optional[bool] = None
+        self.checked_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def ensure_probing(self):
+        """在当前事件循环中启动后台探测（已在运行则忽略）"""
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+    
+    def stop(self):
+        """停止后台探测（下次发送时按需重新启动）"""
+        if self._task is not None and not self._task.done() and not self._loop.is_closed():
+            self._task.cancel()
+        self._task = None
+    
+    def rebind(self, probe: Callable[[], Any], interval: float, breaker_failures: int, breaker_reset: float):
+        """
+        改为探测重建后的连接器并采用新配置
+        
+        熔断阈值未变时保留熔断器状态（同一目标的故障不因重建而被遗忘），
+        阈值变化时换用新的熔断器。
+        """
+        self.stop()
+        self.probe = probe
+        self.interval = interval
+        breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        if (breaker.failure_threshold, breaker.reset_timeout) != (self.breaker.failure_threshold, self.breaker.reset_timeout):
+            self.breaker = breaker
+    
+    async def check(self) -> bool:
+        """立即探测一次并更新缓存"""
+        try:
+            healthy = bool(await self.probe())
+        except Exception:
+            healthy = False
+        if healthy != self.healthy:
+            logger.info(f"[OpenClawConnector] Health: {'up' if healthy else 'down'}")
+        self.healthy = healthy
+        self.checked_at = time.monotonic()
+        if healthy:
+            self.breaker.record_probe_success()
+        else:
+            self.breaker.record_failure()
+        return healthy
+    
+    @property
+    def fresh(self) -> bool:
+        """缓存的探测结果是否仍在有效期内"""
+        return self.healthy is not None and time.monotonic() - self.checked_at < max(self.interval, 1.0)
+    
+    def record_reply(self, reply: Optional[str]):
+        """按回复内容记录一次请求的成败（[Busy] 不计成败，归还半开试探名额）"""
+        if not reply or reply.startswith(_FAILURE_PREFIXES):
+            self.breaker.record_failure()
+        elif reply.startswith("[Busy]"):
+            self.breaker.release()
+        else:
+            self.breaker.record_success()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {"healthy": self.healthy, "circuit": self.breaker.snapshot()}
+
+
+_health_registry: Dict[Tuple[str, str], ConnectorHealth] = {}
+
+
+def _get_health(config: "ConnectorConfig", probe: Callable[[], Any]) -> ConnectorHealth:
+    """按 (模式, 目标) 取得共享的健康状态；已存在时改为探测新建的连接器"""
+    key = (config.mode.value, config.endpoint())
+    health = _health_registry.get(key)
+    if health is None:
+        breaker = CircuitBreaker(config.breaker_failures, config.breaker_reset)
+        health = ConnectorHealth(probe, config.health_interval, breaker)
+        _health_registry[key] = health
+    else:
+        health.rebind(probe, config.health_interval, config.breaker_failures, config.breaker_reset)
+    return health
 
 
 class OpenClawConnector:
     """
     通用 OpenClaw 连接器
     
-    根据 .env 配置自动选择通信模式
+    根据 .env 配置自动选择通信模式；指定 mode 时覆盖 OPENCLAW_MODE，
+    指定 endpoint 时覆盖该模式的通信目标
     """
     
-    def __init__(self):
+    def __init__(self, mode: Optional[ConnectorMode] = None, endpoint: Optional[str] = None):
         self.config = ConnectorConfig.from_env()
+        if mode is not None:
+            self.config = replace(self.config, mode=mode)
+        if endpoint:
+            self.config = self.config.with_endpoint(endpoint)
         self._connector = self._create_connector()
+        self.health = _get_health(self.config, self._probe)
+        # 最近一次使用的事件循环（文件监听、持久套接字等资源挂在这个循环上）
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         logger.info(f"[OpenClawConnector] Mode: {self.config.mode.value}")
     
     def _create_connector(self):
@@ -301,6 +897,10 @@ class OpenClawConnector:
             return MoltbookConnector(self.config)
         elif self.config.mode == ConnectorMode.HTTP:
             return HTTPConnector(self.config)
+        elif self.config.mode == ConnectorMode.UDS:
+            return UnixSocketConnector(self.config)
+        elif self.config.mode == ConnectorMode.HTTP_BRIDGE:
+            return HTTPBridgeConnector(self.config)
         else:  # BRIDGE (default)
             return BridgeConnector(self.config)
     
@@ -310,28 +910,117 @@ class OpenClawConnector:
         sender: str = "wechat-user",
         **context
     ) -> str:
-        """发送消息到 OpenClaw"""
-        return await self._connector.send_message(message, sender, context)
+        """发送消息到 OpenClaw（熔断期间立即返回错误）"""
+        self._activate()
+        if not self.health.breaker.allow():
+            return self.circuit_open_reply()
+        self._ensure_session_key(sender, context)
+        try:
+            reply = await self._connector.send_message(message, sender, context)
+        except asyncio.CancelledError:
+            # 被取消（如对冲落败）：没有结果，归还半开试探名额
+            self.health.breaker.release()
+            raise
+        except Exception:
+            self.health.record_reply(None)
+            raise
+        self.health.record_reply(reply)
+        return reply
+    
+    async def send_message_stream(
+        self, 
+        message: str, 
+        sender: str = "wechat-user",
+        **context
+    ) -> AsyncGenerator[str, None]:
+        """
+        流式发送消息到 OpenClaw
+        
+        不支持流式的模式（file/moltbook/http webhook）一次性产出完整回复；
+        熔断期间立即产出错误，首个片段决定本次请求计为成功还是失败。
+        首个片段之前被取消或关闭时不计成败，归还半开试探名额。
+        """
+        self._activate()
+        if not self.health.breaker.allow():
+            yield self.circuit_open_reply()
+            return
+        self._ensure_session_key(sender, context)
+        
+        recorded = False
+        try:
+            if hasattr(self._connector, "send_message_stream"):
+                async for content in self._connector.send_message_stream(message, sender, context):
+                    if not recorded:
+                        self.health.record_reply(content)
+                        recorded = True
+                    yield content
+                if not recorded:
+                    self.health.record_reply(None)
+                    recorded = True
+            else:
+                reply = await self._connector.send_message(message, sender, context)
+                self.health.record_reply(reply)
+                recorded = True
+                yield reply
+        finally:
+            if not recorded:
+                self.health.breaker.release()
+    
+    def _activate(self):
+        """记录所用的事件循环并启动后台探测"""
+        self.loop = asyncio.get_running_loop()
+        self.health.ensure_probing()
+    
+    @staticmethod
+    def _ensure_session_key(sender: str, context: Dict[str, Any]) -> None:
+        """未显式指定会话键时按 (群, 发送者) 派生，各连接器随请求一并发送"""
+        if not context.get("session_key"):
+            context["session_key"] = derive_session_key(sender, context.get("group_name"))
+    
+    async def close(self):
+        """停止后台探测（已改为探测重建后的连接器时保留）并关闭底层连接（文件监听、持久套接字等）"""
+        if self.health.probe == self._probe:
+            self.health.stop()
+        close = getattr(self._connector, "close", None)
+        if close is not None:
+            await close()
+    
+    def circuit_open_reply(self) -> str:
+        retry_after = self.health.breaker.retry_after
+        logger.warning(f"[OpenClawConnector] Circuit open, skipping {self.config.mode.value} for {retry_after:.0f}s")
+        return f"[Unavailable] OpenClaw {self.config.mode.value} 暂不可用（熔断中，{retry_after:.0f}s 后重试）"
     
     def get_mode(self) -> str:
         """获取当前模式"""
         return self.config.mode.value
     
     async def health_check(self) -> bool:
-        """健康检查"""
+        """健康检查（优先返回后台探测的缓存结果）"""
+        self._activate()
+        if self.health.fresh:
+            return self.health.healthy
+        return await self.health.check()
+    
+    async def _probe(self) -> bool:
+        """实际探测一次下游"""
         try:
             if self.config.mode == ConnectorMode.BRIDGE:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        f"{self.config.bridge_api_base}/health",
-                        timeout=aiohttp.ClientTimeout(total=5)
-                    ) as resp:
-                        return resp.status == 200
+                session = get_session(self.config.bridge_api_base)
+                async with session.get(
+                    f"{self.config.bridge_api_base}/health",
+                    timeout=aiohttp.ClientTimeout(total=5)
+                ) as resp:
+                    return resp.status == 200
             elif self.config.mode == ConnectorMode.FILE:
                 return (
                     Path(self.config.file_inbox_path).expanduser().exists() and
                     Path(self.config.file_outbox_path).expanduser().exists()
                 )
+            elif self.config.mode == ConnectorMode.UDS:
+                await self._connector._ensure_connected()
+                return True
+            elif self.config.mode == ConnectorMode.HTTP_BRIDGE:
+                return await self._connector.client.health_check()
             elif self.config.mode == ConnectorMode.MOLTBOOK:
                 return bool(self.config.moltbook_api_key)
             else:
@@ -340,21 +1029,106 @@ class OpenClawConnector:
             return False
 
 
+class ConnectorRegistry:
+    """
+    进程级 OpenClaw 连接器注册表
+    
+    每个模式的连接器只创建一次，读取配置、创建 inbox/outbox 目录、
+    建立文件监听等工作不再出现在每条消息的路径上。
+    conf.reload() 使配置版本变化后，下次获取时按新配置重建，
+    被替换的旧连接器随即在其所用的事件循环中关闭；
+    无法立即关闭的（如所在循环已关闭）留到 close() 时一起关闭。
+    """
+    
+    def __init__(self):
+        self._connectors: Dict[Tuple[Optional[ConnectorMode], Optional[str]], OpenClawConnector] = {}
+        self._retired: List[OpenClawConnector] = []
+        self._closing: Set[asyncio.Task] = set()
+        self.version = conf.version
+    
+    def _sync(self):
+        """配置已重新加载时淘汰并关闭现有连接器"""
+        if conf.version == self.version:
+            return
+        retired = list(self._connectors.values())
+        self._connectors.clear()
+        self.version = conf.version
+        logger.info(f"[OpenClawConnector] Config reloaded (v{self.version}), connectors will be rebuilt")
+        for connector in retired:
+            self._retire(connector)
+    
+    def _retire(self, connector: OpenClawConnector):
+        """在旧连接器所用的事件循环中关闭它"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        loop = connector.loop or running
+        if loop is None or loop.is_closed():
+            self._retired.append(connector)
+        elif loop is running:
+            task = loop.create_task(self._close(connector))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(self._close(connector), loop)
+    
+    @staticmethod
+    async def _close(connector: OpenClawConnector):
+        try:
+            await connector.close()
+        except Exception as e:
+            logger.warning(f"[OpenClawConnector] Close failed ({connector.get_mode()}): {e}")
+    
+    def get(self, mode: Optional[ConnectorMode] = None, endpoint: Optional[str] = None) -> OpenClawConnector:
+        """获取共享连接器；mode 为空时使用 OPENCLAW_MODE，endpoint 为空时使用该模式配置的目标"""
+        self._sync()
+        key = (mode, endpoint or None)
+        connector = self._connectors.get(key)
+        if connector is None:
+            connector = OpenClawConnector(mode, endpoint)
+            self._connectors[key] = connector
+        return connector
+    
+    async def close(self):
+        """关闭全部连接器（须在连接器所用的事件循环中调用）"""
+        connectors = list(self._connectors.values()) + self._retired
+        self._connectors.clear()
+        self._retired.clear()
+        for connector in connectors:
+            await self._close(connector)
+        loop = asyncio.get_running_loop()
+        closing = [task for task in self._closing if task.get_loop() is loop]
+        if closing:
+            await asyncio.gather(*closing, return_exceptions=True)
+
+
+# 进程级连接器注册表
+connector_registry = ConnectorRegistry()
+
+
+def get_connector(mode: Optional[ConnectorMode] = None, endpoint: Optional[str] = None) -> OpenClawConnector:
+    """获取进程内共享的连接器"""
+    return connector_registry.get(mode, endpoint)
+
+
 # 便捷函数
 async def ask_openclaw(message: str, sender: str = "wechat-user", **context) -> str:
     """快速询问 OpenClaw"""
-    connector = OpenClawConnector()
-    return await connector.send_message(message, sender, **context)
+    return await get_connector().send_message(message, sender, **context)
 
 
 def get_connector_info() -> Dict[str, Any]:
     """获取连接器信息"""
     config = ConnectorConfig.from_env()
+    health = _health_registry.get((config.mode.value, config.endpoint()))
     return {
         "mode": config.mode.value,
         "bridge_api_base": config.bridge_api_base,
+        "uds_path": config.uds_path,
         "file_inbox": config.file_inbox_path,
         "file_outbox": config.file_outbox_path,
         "moltbook_agent": config.moltbook_agent_name,
         "http_webhook": "已配置" if config.http_webhook_url else "未配置",
+        "health": health.snapshot() if health else None,
     }
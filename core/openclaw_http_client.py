@@ -7,16 +7,31 @@ OpenClaw HTTP Client - 连接 HTTP Bridge Server
 import os
 import asyncio
 import aiohttp
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncGenerator
 from datetime import datetime
 
+from core.openclaw_bridge import iter_sse_content, retry_after_seconds
+from utils.http_pool import get_session
+from utils.retry import RetryableError, RetryPolicy, retry_budget
+
+# 服务端返回 429/503 或拒绝连接时的重试次数（与 Bridge 连接器共用配置）
+BUSY_RETRIES = int(os.getenv("OPENCLAW_BRIDGE_BUSY_RETRIES", "3"))
+
 
 class OpenClawHTTPClient:
     """HTTP 客户端连接器"""
     
-    def __init__(self, api_base: str = "http://localhost:9848"):
+    def __init__(self, api_base: str = "http://localhost:9848", max_busy_retries: Optional[int] = None):
         self.api_base = api_base
         self.timeout = 60  # 60秒超时，匹配服务器端
+        self.max_busy_retries = BUSY_RETRIES if max_busy_retries is None else max_busy_retries
+        self.retry = RetryPolicy(
+            max_attempts=self.max_busy_retries + 1,
+            base_delay=0.5,
+            deadline=self.timeout,
+            retry_on=(RetryableError, aiohttp.ClientConnectorError),
+            budget=retry_budget,
+        )
     
     async def send_message(
         self, 
@@ -24,50 +39,109 @@ class OpenClawHTTPClient:
         sender: str = "wechat-user",
         **context
     ) -> str:
-        """发送消息并获取回复"""
+        """
+        发送消息并获取回复
+        
+        服务端过载返回 429/503 或拒绝连接时，在总超时内退避重试（至少等待 Retry-After）
+        """
+        session = get_session(self.api_base)
+        payload = {
+            "message": message,
+            "sender": sender,
+            "context": context,
+            "session_key": context.get("session_key")
+        }
+        
+        async def attempt() -> str:
+            async with session.post(
+                f"{self.api_base}/api/v1/chat",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    return data.get("reply", "[Empty reply]")
+                if resp.status in (429, 503):
+                    raise RetryableError(
+                        f"[Busy] OpenClaw HTTP bridge overloaded ({resp.status})",
+                        retry_after_seconds(resp.headers)
+                    )
+                if resp.status == 504:
+                    return "[Timeout] OpenClaw HTTP bridge timeout"
+                error = await resp.text()
+                return f"[HTTP Error] {resp.status}: {error}"
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "message": message,
-                    "sender": sender,
-                    "context": context
-                }
-                
-                async with session.post(
-                    f"{self.api_base}/api/v1/chat",
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=self.timeout)
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data.get("reply", "[Empty reply]")
-                    elif resp.status == 504:
-                        return "[Timeout] OpenClaw HTTP bridge timeout"
-                    else:
-                        error = await resp.text()
-                        return f"[HTTP Error] {resp.status}: {error}"
-                        
+            return await self.retry.call_async(attempt)
+        except RetryableError as e:
+            return str(e)
         except asyncio.TimeoutError:
             return "[Timeout] 抱歉，响应超时了，请稍后再试~\n\n---\n🤖 AI 生成"
+        except aiohttp.ClientConnectorError as e:
+            return f"[Unavailable] HTTP client: {str(e)}"
         except Exception as e:
             return f"[Error] HTTP client: {str(e)}"
     
+    async def send_message_stream(
+        self,
+        message: str,
+        sender: str = "wechat-user",
+        **context
+    ) -> AsyncGenerator[str, None]:
+        """发送消息并以流式方式逐段获取回复"""
+        try:
+            session = get_session(self.api_base)
+            payload = {
+                "message": message,
+                "sender": sender,
+                "context": context,
+                "session_key": context.get("session_key"),
+                "stream": True
+            }
+                
+            async with session.post(
+                f"{self.api_base}/api/v1/chat/stream",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as resp:
+                if resp.status == 200:
+                    async for content in iter_sse_content(resp):
+                        yield content
+                elif resp.status in (429, 503):
+                    yield f"[Busy] OpenClaw HTTP bridge overloaded ({resp.status})"
+                else:
+                    error = await resp.text()
+                    yield f"[HTTP Error] {resp.status}: {error}"
+                        
+        except asyncio.TimeoutError:
+            yield "[Timeout] 抱歉，响应超时了，请稍后再试~\n\n---\n🤖 AI 生成"
+        except aiohttp.ClientConnectorError as e:
+            yield f"[Unavailable] HTTP client: {str(e)}"
+        except Exception as e:
+            yield f"[Error] HTTP client: {str(e)}"
+    
     async def health_check(self) -> bool:
         """健康检查"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_base}/health",
-                    timeout=aiohttp.ClientTimeout(total=2)
-                ) as resp:
-                    return resp.status == 200
+            session = get_session(self.api_base)
+            async with session.get(
+                f"{self.api_base}/health",
+                timeout=aiohttp.ClientTimeout(total=2)
+            ) as resp:
+                return resp.status == 200
         except:
             return False
 
 
+# 按地址共享的客户端（重试策略与预算统计跨调用累积）
+_clients: Dict[str, OpenClawHTTPClient] = {}
+
+
 # 便捷函数
 async def ask_openclaw_http(message: str, sender: str = "wechat-user", **context) -> str:
     """快速询问 OpenClaw（HTTP模式）"""
     api_base = os.getenv("OPENCLAW_HTTP_API", "http://localhost:9848")
-    client = OpenClawHTTPClient(api_base)
+    client = _clients.get(api_base)
+    if client is None:
+        client = _clients[api_base] = OpenClawHTTPClient(api_base)
     return await client.send_message(message, sender, **context)
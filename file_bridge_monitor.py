@@ -10,12 +10,17 @@ OpenClaw File Bridge Monitor - 文件桥接监听器
 """
 
 import os
-import json
 import asyncio
-import aiofiles
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncGenerator, Deque, List, Tuple
+
+from utils.file_watcher import FileWatcher
+from utils.jsonl_segments import SegmentedLog
+from utils.recent_ids import RecentIds
+from utils.spool import FILE_LAYOUT, Spool
+from utils.session_key import session_key_of
 
 # 桥接路径（与 Bridge Server 共享）
 # 使用环境变量或默认值
@@ -23,6 +28,22 @@ PROJECT_ROOT = Path("/home/node/openclaw/wechat-agent")
 INBOX_PATH = Path(os.getenv("OPENCLAW_INBOX", PROJECT_ROOT / ".openclaw" / "inbox"))
 OUTBOX_PATH = Path(os.getenv("OPENCLAW_OUTBOX", PROJECT_ROOT / ".openclaw" / "outbox"))
 
+# 兜底重读间隔（秒）：正常情况下由文件变更通知唤醒
+RESCAN_INTERVAL = float(os.getenv("OPENCLAW_RESCAN_INTERVAL", "2"))
+
+# 消息去重窗口：时间（秒）与最多记录的 ID 数
+DEDUP_TTL = float(os.getenv("OPENCLAW_DEDUP_TTL", "3600"))
+DEDUP_MAX_SIZE = int(os.getenv("OPENCLAW_DEDUP_MAX_SIZE", "10000"))
+
+# 同时处理的消息数上限（同一发送者的消息始终按顺序处理）
+MAX_CONCURRENCY = int(os.getenv("OPENCLAW_MONITOR_CONCURRENCY", "8"))
+
+# inbox 检查点的消费者名
+CHECKPOINT_CONSUMER = "monitor"
+
+# spool 布局下清理遗留文件的间隔（秒）
+SPOOL_PURGE_INTERVAL = 600
+
 
 class FileBridgeMonitor:
     """文件桥接监听器"""
@@ -30,18 +51,77 @@ class FileBridgeMonitor:
     def __init__(self):
         self.inbox_file = INBOX_PATH / "wechat_messages.jsonl"
         self.outbox_file = OUTBOX_PATH / "wechat_replies.jsonl"
-        self.processed_ids = set()
-        self.last_position = 0
+        self.processed_ids = RecentIds(ttl=DEDUP_TTL, max_size=DEDUP_MAX_SIZE)
         
         # 确保目录存在
         INBOX_PATH.mkdir(parents=True, exist_ok=True)
         OUTBOX_PATH.mkdir(parents=True, exist_ok=True)
+        
+        # 分段日志：inbox 按 (段序号, 偏移) 读取，outbox 写入时按需轮转
+        self.inbox_log = SegmentedLog(INBOX_PATH, "wechat_messages")
+        self.outbox_log = SegmentedLog(OUTBOX_PATH, "wechat_replies")
+        
+        # spool 布局：inbox 中每条消息一个文件，回复写入 outbox/<msg_id>.json
+        self.spool = FILE_LAYOUT == "spool"
+        self.inbox_spool = Spool(INBOX_PATH) if self.spool else None
+        self.outbox_spool = Spool(OUTBOX_PATH) if self.spool else None
+        self._part_seq: Dict[str, int] = {}
+        self._last_purge = 0.0
+        
+        # 从检查点恢复读取位置；最近已回复的消息计入去重窗口，
+        # 上次在提交检查点前退出时，重读的消息不会被再次回复
+        # （spool 布局下未处理的消息文件仍留在 inbox，无需检查点）
+        checkpoint = self.inbox_log.load_checkpoint(CHECKPOINT_CONSUMER)
+        self.position = checkpoint or self.inbox_log.start_cursor()
+        if not self.spool:
+            self._seed_processed_ids()
+        
+        # inbox 变更监听（inotify，不支持时自适应轮询）
+        self.watcher = FileWatcher(INBOX_PATH, names=None if self.spool else [self.inbox_file.name])
+        
+        # 并发处理：信号量限制同时处理数，outbox 追加统一交给单个写入任务
+        self._semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENCY))
+        self._outbox_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        
+        # 按会话排队：消息读到即开始处理，不等前一批完成；同一会话按到达顺序串行
+        self._session_queues: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._session_tasks: Dict[str, asyncio.Task] = {}
+        # 已读取但回复尚未落盘的消息位置：检查点不越过其中最早的一条
+        self._unfinished: Dict[str, Tuple[int, int]] = {}
+        self._committed = checkpoint
+    
+    def _seed_processed_ids(self):
+        """把最近两个 outbox 分段中的最终回复登记为已处理"""
+        segments = self.outbox_log.segments()
+        cursor = (segments[-1], 0) if segments else self.outbox_log.start_cursor()
+        try:
+            replies, _ = self.outbox_log.read(cursor)
+        except OSError as e:
+            print(f"Error loading recent replies: {e}")
+            return
+        
+        for reply in replies:
+            if reply.get("partial") or not reply.get("reply_to"):
+                continue
+            try:
+                replied_at = datetime.fromisoformat(reply["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                replied_at = None
+            self.processed_ids.add(reply["reply_to"], now=replied_at)
     
     async def process_message(self, entry: Dict[str, Any]) -> str:
         """
-        处理消息并生成回复
+        处理消息并生成完整回复（非流式请求，由流式结果拼接）
+        """
+        return "".join([part async for part in self.process_message_stream(entry)])
+    
+    async def process_message_stream(self, entry: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        """
+        流式处理消息，逐段产出回复
         
-        这里调用我的实际处理能力
+        这里调用我的实际处理能力；每个段落生成后立即产出，
+        以 partial 行写入 outbox，Bridge Server 可以边读边转发
         """
         msg_id = entry.get("id", "unknown")
         sender = entry.get("sender", "unknown")
@@ -49,85 +129,219 @@ class FileBridgeMonitor:
         context = entry.get("context", {})
         
         print(f"\n[{datetime.now().strftime('%H:%M:%S')}] New message #{msg_id}")
-        print(f"  From: {sender}")
+        print(f"  From: {sender} (session {session_key_of(entry)})")
         print(f"  Content: {message[:100]}{'...' if len(message) > 100 else ''}")
         
         # TODO: 这里调用我的实际处理能力
-        # 现在返回一个模拟回复
+        # 现在逐段产出一个模拟回复
         
-        reply = f"""你好！我是 OpenClaw 代理小虎哥 (xiaohuge)。
-
-收到了你的消息："{message[:50]}{'...' if len(message) > 50 else ''}"
-
-当前状态：
+        yield "你好！我是 OpenClaw 代理小虎哥 (xiaohuge)。\n\n"
+        yield f"收到了你的消息：\"{message[:50]}{'...' if len(message) > 50 else ''}\"\n\n"
+        yield """当前状态：
 ✅ 文件桥接：正常工作
 ✅ 消息接收：成功
 ⏳ 智能回复：开发中
 
-我是通过文件桥接与你通信的，这意味着：
+"""
+        yield f"""我是通过文件桥接与你通信的，这意味着：
 1. 你的消息写入 {self.inbox_file}
 2. 我读取并处理
 3. 回复写入 {self.outbox_file}
 4. Bridge Server 读取并返回
 
-时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
-        
-        return reply
+"""
+        yield f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
     
-    async def write_reply(self, msg_id: str, reply: str):
-        """写入回复到 outbox"""
+    async def write_reply_chunk(self, msg_id: str, chunk: str):
+        """写入流式回复片段到 outbox（partial 行，最终回复仍需 write_reply）"""
+        try:
+            entry = {
+                "reply_to": msg_id,
+                "timestamp": datetime.now().isoformat(),
+                "chunk": chunk,
+                "partial": True
+            }
+            if self.spool:
+                entry["seq"] = self._part_seq[msg_id] = self._part_seq.get(msg_id, 0) + 1
+            
+            self._enqueue_write(entry)
+            
+        except Exception as e:
+            print(f"  Error writing reply chunk: {e}")
+    
+    async def write_reply(self, msg_id: str, reply: str) -> bool:
+        """写入回复到 outbox，返回是否已落盘"""
         try:
             entry = {
                 "reply_to": msg_id,
                 "timestamp": datetime.now().isoformat(),
                 "reply": reply
             }
+            self._part_seq.pop(msg_id, None)
             
-            async with aiofiles.open(self.outbox_file, "a", encoding="utf-8") as f:
-                await f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            await self._enqueue_write(entry)
             
             print(f"  Reply written to outbox")
+            return True
             
         except Exception as e:
             print(f"  Error writing reply: {e}")
+            return False
     
-    async def check_messages(self):
-        """检查新消息"""
-        if not self.inbox_file.exists():
+    def _enqueue_write(self, entry: Dict[str, Any]) -> asyncio.Future:
+        """把一行回复交给 outbox 写入任务，返回写入完成的 Future"""
+        if self._writer_task is None or self._writer_task.done():
+            self._outbox_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._outbox_writer())
+        done = asyncio.get_running_loop().create_future()
+        # 片段写入不等待结果，标记异常已读取以免告警（写入任务已记录）
+        done.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._outbox_queue.put_nowait((entry, done))
+        return done
+    
+    def _append_outbox(self, entry: Dict[str, Any]):
+        """按当前布局写入一条回复或片段"""
+        if not self.spool:
+            self.outbox_log.append(entry)
+        elif entry.get("partial"):
+            self.outbox_spool.put_part(entry["reply_to"], entry["seq"], entry)
+        else:
+            self.outbox_spool.put(entry["reply_to"], entry)
+    
+    async def _outbox_writer(self):
+        """唯一的 outbox 写入任务：按入队顺序逐行追加，避免并发写入交错"""
+        while True:
+            entry, done = await self._outbox_queue.get()
+            try:
+                await asyncio.to_thread(self._append_outbox, entry)
+                if not done.done():
+                    done.set_result(None)
+            except Exception as e:
+                print(f"  Error appending to outbox: {e}")
+                if not done.done():
+                    done.set_exception(e)
+            finally:
+                self._outbox_queue.task_done()
+    
+    async def handle_message(self, entry: Dict[str, Any]) -> bool:
+        """处理一条消息并写入回复（受并发上限约束），返回回复是否已落盘"""
+        msg_id = entry["id"]
+        async with self._semaphore:
+            try:
+                # 处理消息（流式请求逐段写入 partial 行）
+                if entry.get("stream"):
+                    parts = []
+                    async for part in self.process_message_stream(entry):
+                        parts.append(part)
+                        await self.write_reply_chunk(msg_id, part)
+                    reply = "".join(parts)
+                else:
+                    reply = await self.process_message(entry)
+            except Exception as e:
+                print(f"  Error processing message #{msg_id}: {e}")
+                reply = f"[Error] {e}"
+            
+            # 写入回复；没写进 outbox 时保留 inbox 中的消息，重启后重新处理
+            if not await self.write_reply(msg_id, reply):
+                return False
+            if self.spool:
+                self.inbox_spool.remove(msg_id)
+            return True
+    
+    def _dispatch(self, entry: Dict[str, Any]):
+        """把消息放入所属会话的队列，该会话没有处理任务时立即启动一个"""
+        key = session_key_of(entry)
+        self._session_queues.setdefault(key, deque()).append(entry)
+        if key not in self._session_tasks:
+            self._session_tasks[key] = asyncio.create_task(self._drain_session(key))
+    
+    async def _drain_session(self, key: str):
+        """
+        按顺序处理同一会话的消息，队列清空后退出
+        
+        回复写入失败的消息留在未完成集合中，检查点不越过它，重启后从它开始重新读取
+        """
+        queue = self._session_queues[key]
+        try:
+            while queue:
+                entry = queue.popleft()
+                if not await self.handle_message(entry):
+                    print(f"  Reply for #{entry['id']} not written, checkpoint held before it")
+                    continue
+                self._unfinished.pop(entry["id"], None)
+                self._commit_position()
+        finally:
+            self._session_tasks.pop(key, None)
+            self._session_queues.pop(key, None)
+    
+    def _commit_position(self):
+        """
+        提交读取位置：已读消息的回复全部落盘之前不越过它们
+        
+        重启后从这里继续，写入方也据此清理已处理的 inbox 分段
+        """
+        if self.spool:
             return
+        position = min(self._unfinished.values(), default=self.position)
+        if position != self._committed:
+            try:
+                self.inbox_log.commit(CHECKPOINT_CONSUMER, position)
+                self._committed = position
+            except OSError as e:
+                print(f"Error saving checkpoint: {e}")
+    
+    def _pending_spool_messages(self) -> List[Dict[str, Any]]:
+        """列出 spool inbox 中待处理的消息（已有回复的直接清掉）"""
+        entries = []
+        for msg_id, entry in self.inbox_spool.pending():
+            if self.outbox_spool.exists(msg_id):
+                self.inbox_spool.remove(msg_id)
+                continue
+            entry.setdefault("id", msg_id)
+            entries.append(entry)
+        return entries
+    
+    async def check_messages(self):
+        """
+        检查新消息并立即派发
         
+        不等待处理完成：慢消息处理期间到达的新消息在下一次检查时就开始处理。
+        不同会话并发（受信号量限制），同一会话按到达顺序串行
+        （会话键由 (群, 发送者) 派生，旧消息没有会话键时按发送者分组）。
+        """
         try:
-            # 读取文件
-            async with aiofiles.open(self.inbox_file, "r", encoding="utf-8") as f:
-                await f.seek(self.last_position)
-                new_lines = await f.readlines()
-                self.last_position = await f.tell()
+            if self.spool:
+                for entry in self._pending_spool_messages():
+                    # 处理中的消息文件仍在 inbox，靠去重窗口避免重复派发
+                    if self.processed_ids.add(entry["id"]):
+                        self._dispatch(entry)
+                return
             
-            for line in new_lines:
-                line = line.strip()
-                if not line:
-                    continue
+            # 读取上次位置之后的新消息（跨越已轮转的分段）
+            lines, self.position = self.inbox_log.read_lines(self.position)
+            for seq, offset, raw in lines:
+                entry = self.inbox_log.parse_line(raw)
+                msg_id = entry.get("id") if entry else None
                 
-                try:
-                    entry = json.loads(line)
-                    msg_id = entry.get("id")
-                    
-                    # 避免重复处理
-                    if msg_id and msg_id not in self.processed_ids:
-                        self.processed_ids.add(msg_id)
-                        
-                        # 处理消息
-                        reply = await self.process_message(entry)
-                        
-                        # 写入回复
-                        await self.write_reply(msg_id, reply)
-                        
-                except json.JSONDecodeError:
-                    continue
+                # 避免重复处理（有界时间窗口）
+                if msg_id and self.processed_ids.add(msg_id):
+                    self._unfinished[msg_id] = (seq, offset)
+                    self._dispatch(entry)
+            self._commit_position()
                     
         except Exception as e:
             print(f"Error checking messages: {e}")
     
+    def _purge_spool(self):
+        """定期清理无人取走的过期回复与消息文件"""
+        now = asyncio.get_running_loop().time()
+        if now - self._last_purge < SPOOL_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        removed = self.outbox_spool.purge() + self.inbox_spool.purge()
+        if removed:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Purged {removed} stale spool files")
+    
     async def run(self):
         """主循环"""
         print(f"""
@@ -136,6 +350,9 @@ class FileBridgeMonitor:
 ╠════════════════════════════════════════════════╣
 ║  Agent:  xiaohuge                              ║
 ║  Mode:   File Bridge                           ║
+║  Layout: {FILE_LAYOUT:<36} ║
+║  Watch:  {self.watcher.mode:<36} ║
+║  Workers: {MAX_CONCURRENCY:<35} ║
 ╠════════════════════════════════════════════════╣
 ║  Inbox:  {str(INBOX_PATH):<36} ║
 ║  Outbox: {str(OUTBOX_PATH):<36} ║
@@ -147,11 +364,20 @@ Press Ctrl+C to stop
         
         try:
             while True:
+                token = self.watcher.mark()
                 await self.check_messages()
-                await asyncio.sleep(0.5)  # 每0.5秒检查一次
+                if self.spool:
+                    self._purge_spool()
+                await self.watcher.wait(token, timeout=RESCAN_INTERVAL)
                 
         except KeyboardInterrupt:
             print("\n\nStopping monitor...")
+        finally:
+            self.watcher.close()
+            for task in list(self._session_tasks.values()):
+                task.cancel()
+            if self._writer_task is not None:
+                self._writer_task.cancel()
 
 
 def main():
@@ -18,13 +18,19 @@ OpenClaw 端配置:
 import os
 import sys
 import json
+import time
 import asyncio
+import hashlib
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.session_key import session_key_of
 
 try:
-    from fastapi import FastAPI, HTTPException
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import StreamingResponse
     from pydantic import BaseModel
     import uvicorn
 except ImportError:
@@ -39,6 +45,39 @@ app = FastAPI(title="OpenClaw HTTP Bridge", version="3.0.0")
 message_queue: list = []
 reply_cache: Dict[str, str] = {}
 processed_messages: set = set()  # 已处理的消息 ID
+stream_queues: Dict[str, asyncio.Queue] = {}  # 流式请求的片段队列
+
+# 在线 Worker（worker_id -> 最近一次轮询或心跳的单调时间）
+# Worker 处理耗时消息期间由后台任务定期发送心跳；超过 WORKER_TTL 既未轮询也无心跳的 Worker 视为已离线
+WORKER_TTL = float(os.getenv("HTTP_BRIDGE_WORKER_TTL", "15"))
+workers: Dict[str, float] = {}
+
+# 准入控制：限制同时等待回复的请求数与排队长度，超出时快速返回 429/503
+admission = AdmissionController(
+    max_inflight=int(os.getenv("HTTP_BRIDGE_MAX_INFLIGHT", "32")),
+    max_queue=int(os.getenv("HTTP_BRIDGE_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("HTTP_BRIDGE_QUEUE_TIMEOUT", "5")),
+    retry_after=float(os.getenv("HTTP_BRIDGE_RETRY_AFTER", "2")),
+)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    结束时调用 on_close 的流式响应
+
+    生成器的 finally 只有在生成器启动后才会执行；客户端在生成器启动前断开时，
+    准入槽位等资源由这里统一释放（正常完成、断开、发送失败都会调用）。
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
 
 # 统计数据
 stats = {
@@ -53,12 +92,14 @@ class ChatRequest(BaseModel):
     message: str
     sender: str = "wechat-user"
     context: dict = {}
+    session_key: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     """聊天响应"""
     reply: str
     timestamp: str
+    session_key: Optional[str] = None
 
 
 class ReplyRequest(BaseModel):
@@ -67,61 +108,160 @@ class ReplyRequest(BaseModel):
     reply: str
 
 
-@app.get("/health")
-async def health_check():
-    """健康检查"""
-    return {
-        "status": "healthy",
-        "mode": "openclaw-direct",
-        "pending_messages": len(message_queue),
-        "stats": stats,
-        "timestamp": datetime.now().isoformat()
-    }
+class ChunkRequest(BaseModel):
+    """流式回复片段"""
+    content: str
 
 
-@app.post("/api/v1/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+class StatusBatchRequest(BaseModel):
+    """批量状态更新请求"""
+    msg_ids: List[str]
+    status: str
+
+
+class ReplyBatchRequest(BaseModel):
+    """批量回复提交请求"""
+    replies: List[ReplyRequest]
+
+
+def _owner_of(session_key: str, worker_ids: List[str]) -> Optional[str]:
     """
-    接收消息并等待 OpenClaw 回复
+    Rendezvous 哈希：为会话选出固定的 Worker
     
-    这是同步接口，会等待 OpenClaw 的回复（最多 120 秒）
+    Worker 加入或离开时，只有归属于变动 Worker 的会话会被重新分配，
+    其余会话的状态和缓存仍留在原 Worker 中。
     """
+    if not worker_ids:
+        return None
+    return max(
+        worker_ids,
+        key=lambda worker_id: hashlib.md5(f"{worker_id}|{session_key}".encode("utf-8")).digest()
+    )
+
+
+def _rebalance(reason: str):
+    """Worker 集合变化后，把离线 Worker 名下未完成的消息退回队列"""
+    requeued = 0
+    for msg in message_queue:
+        if msg["status"] == "processing" and msg.get("worker") and msg["worker"] not in workers:
+            msg["status"] = "pending"
+            msg["worker"] = None
+            requeued += 1
+    print(f"  ⚖️  Worker 集合变化 ({reason})，在线: {sorted(workers)}，退回 {requeued} 条消息")
+
+
+def _heartbeat(worker_id: str):
+    """记录 Worker 心跳并清理超时的 Worker"""
+    now = time.monotonic()
+    expired = [w for w, seen in workers.items() if w != worker_id and now - seen > WORKER_TTL]
+    for w in expired:
+        del workers[w]
+    
+    joined = worker_id not in workers
+    workers[worker_id] = now
+    
+    if expired or joined:
+        reason = f"+{worker_id}" if joined else ""
+        if expired:
+            reason += f" -{','.join(expired)}"
+        _rebalance(reason.strip())
+
+
+def _store_reply(msg_id: str, reply: str):
+    """缓存回复并将消息标记为已完成"""
+    reply_cache[msg_id] = reply
+    
+    for msg in message_queue:
+        if msg["id"] == msg_id:
+            msg["status"] = "completed"
+            break
+    
+    queue = stream_queues.get(msg_id)
+    if queue is not None:
+        queue.put_nowait(("done", reply))
+
+
+def _enqueue_message(request: ChatRequest, stream: bool = False) -> str:
+    """将消息加入待处理队列，返回消息 ID"""
     import uuid
     msg_id = str(uuid.uuid4())[:8]
     
-    # 检查是否已处理过（去重）
-    if msg_id in processed_messages:
-        return ChatResponse(
-            reply="[Duplicate] 消息已处理",
-            timestamp=datetime.now().isoformat()
-        )
-    
-    # 添加消息到队列
     message_entry = {
         "id": msg_id,
         "timestamp": datetime.now().isoformat(),
         "sender": request.sender,
         "message": request.message,
         "context": request.context,
+        "stream": stream,
         "status": "pending"  # pending, processing, completed
     }
+    # 会话键：Worker 按它保存对话状态，Bridge 按它固定路由
+    message_entry["session_key"] = request.session_key or session_key_of(message_entry)
     message_queue.append(message_entry)
     stats["total_received"] += 1
     
-    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 📥 收到消息 #{msg_id}")
+    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 📥 收到消息 #{msg_id}{' (stream)' if stream else ''}")
     print(f"  From: {request.sender}")
     print(f"  Content: {request.message[:60]}{'...' if len(request.message) > 60 else ''}")
     print(f"  等待 OpenClaw 处理...")
+    return msg_id
+
+
+@app.get("/health")
+async def health_check():
+    """健康检查"""
+    return {
+        "status": "healthy",
+        "mode": "openclaw-direct",
+        "pending_messages": len(message_queue),
+        "admission": admission.snapshot(),
+        "stats": stats,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post("/api/v1/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    """
+    接收消息并等待 OpenClaw 回复
+    
+    这是同步接口，会等待 OpenClaw 的回复（最多 120 秒）
+    超出准入上限时立即返回 429/503 并附带 Retry-After；
+    客户端提前断开（如对冲落败被取消）时撤回消息
+    """
+    try:
+        await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers=e.headers)
+    
+    try:
+        return await _wait_for_reply(request, http_request)
+    finally:
+        admission.release()
+
+
+async def _wait_for_reply(request: ChatRequest, http_request: Optional[Request] = None) -> ChatResponse:
+    """入队并等待 Worker 提交回复"""
+    # 添加消息到队列
+    msg_id = _enqueue_message(request)
     
     # 等待回复（最多 120 秒）
     max_wait = 1200  # 1200 * 0.1s = 120 秒
     for i in range(max_wait):
+        # 每 0.5 秒检查一次客户端是否已断开：尚未被 Worker 领取的消息随之撤回，不会再被处理
+        if http_request is not None and i % 5 == 0 and await http_request.is_disconnected():
+            pending = any(m["id"] == msg_id and m["status"] == "pending" for m in message_queue)
+            message_queue[:] = [m for m in message_queue if m["id"] != msg_id]
+            reply_cache.pop(msg_id, None)
+            print(f"  ↩️  消息 #{msg_id} 的客户端已断开{'，已撤回' if pending else ''}")
+            return ChatResponse(reply="", timestamp=datetime.now().isoformat())
         if msg_id in reply_cache:
             reply = reply_cache.pop(msg_id)
+            message_queue[:] = [m for m in message_queue if m["id"] != msg_id]
             processed_messages.add(msg_id)
             stats["total_replied"] += 1
             print(f"  ✅ 消息 #{msg_id} 已完成")
-            return ChatResponse(reply=reply, timestamp=datetime.now().isoformat())
+            return ChatResponse(reply=reply, timestamp=datetime.now().isoformat(), session_key=request.session_key)
         await asyncio.sleep(0.1)
     
     # 超时
@@ -130,14 +270,105 @@ async def chat(request: ChatRequest):
     return ChatResponse(reply=timeout_reply, timestamp=datetime.now().isoformat())
 
 
+@app.post("/api/v1/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    流式聊天接口
+    
+    Worker 通过 /api/v1/reply/{msg_id}/chunk 推送的片段会立即以 SSE 转发，
+    最终回复到达后补发尚未推送的部分并结束流（最多等待 120 秒）
+    """
+    try:
+        release = await admission.hold()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers=e.headers)
+    
+    state: Dict[str, str] = {}
+    
+    async def generate():
+        # 响应开始发送后才入队：客户端在此之前断开时，消息不会留在队列里被 Worker 处理
+        msg_id = state["msg_id"] = _enqueue_message(request, stream=True)
+        queue: asyncio.Queue = asyncio.Queue()
+        stream_queues[msg_id] = queue
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 120
+        streamed = ""
+        while True:
+            try:
+                kind, text = await asyncio.wait_for(queue.get(), timeout=deadline - loop.time())
+            except asyncio.TimeoutError:
+                if not streamed:
+                    timeout_reply = "抱歉，响应超时了，请稍后再试~\n\n---\n🤖 AI 生成"
+                    yield f"data: {json.dumps({'content': timeout_reply})}\n\n"
+                break
+            
+            if kind == "chunk":
+                streamed += text
+                yield f"data: {json.dumps({'content': text})}\n\n"
+                continue
+            
+            # 最终回复：只补发尚未推送的部分
+            rest = text[len(streamed):] if text.startswith(streamed) else ("" if streamed else text)
+            if rest:
+                yield f"data: {json.dumps({'content': rest})}\n\n"
+            processed_messages.add(msg_id)
+            stats["total_replied"] += 1
+            print(f"  ✅ 消息 #{msg_id} 已完成 (stream)")
+            break
+        
+        yield "data: [DONE]\n\n"
+    
+    def close():
+        release()
+        msg_id = state.get("msg_id")
+        if msg_id is not None:
+            stream_queues.pop(msg_id, None)
+            reply_cache.pop(msg_id, None)
+            message_queue[:] = [m for m in message_queue if m["id"] != msg_id]
+    
+    return ClosingStreamingResponse(generate(), on_close=close, media_type="text/event-stream")
+
+
 @app.get("/api/v1/messages")
-async def get_messages():
+async def get_messages(claim: bool = False, limit: int = 0, worker_id: Optional[str] = None):
     """
     获取待处理的消息列表（供 OpenClaw 轮询）
     
     OpenClaw 应该定期调用此接口获取新消息
+    
+    Args:
+        claim: 为 True 时在同一请求内将返回的消息标记为 processing，
+               省去逐条调用状态接口的往返
+        limit: 单次最多返回的消息数（0 表示不限制）
+        worker_id: 多 Worker 部署时的 Worker 标识，只返回按会话键哈希
+                   归属于该 Worker 的消息
     """
+    if worker_id:
+        # 先记录心跳：本次轮询清理掉的离线 Worker 退回的消息在同一次响应中即可领取
+        _heartbeat(worker_id)
     pending = [m for m in message_queue if m["status"] == "pending"]
+    
+    if worker_id:
+        live = list(workers)
+        # 会话仍有消息在其他 Worker 上处理时暂不下发，保证同一会话的顺序
+        busy_elsewhere = {
+            m["session_key"] for m in message_queue
+            if m["status"] == "processing" and m.get("worker") not in (None, worker_id)
+        }
+        pending = [
+            m for m in pending
+            if m["session_key"] not in busy_elsewhere and _owner_of(m["session_key"], live) == worker_id
+        ]
+    
+    if limit > 0:
+        pending = pending[:limit]
+    for msg in pending:
+        msg["worker"] = worker_id
+    if claim:
+        for msg in pending:
+            msg["status"] = "processing"
+        if pending:
+            print(f"  🔄 批量领取 {len(pending)} 条消息")
     return {
         "messages": pending,
         "count": len(pending),
@@ -156,6 +387,24 @@ async def update_message_status(msg_id: str, status: str):
     return {"status": "error", "message": "Message not found"}
 
 
+@app.post("/api/v1/messages/status/batch")
+async def update_message_status_batch(request: StatusBatchRequest):
+    """批量更新消息状态"""
+    wanted = set(request.msg_ids)
+    updated = []
+    for msg in message_queue:
+        if msg["id"] in wanted:
+            msg["status"] = request.status
+            updated.append(msg["id"])
+    
+    print(f"  🔄 批量更新 {len(updated)} 条消息状态为: {request.status}")
+    return {
+        "status": "ok",
+        "updated": updated,
+        "missing": sorted(wanted - set(updated))
+    }
+
+
 @app.post("/api/v1/reply")
 async def post_reply(request: ReplyRequest):
     """
@@ -163,18 +412,78 @@ async def post_reply(request: ReplyRequest):
     
     OpenClaw 处理完消息后，调用此接口提交回复
     """
-    reply_cache[request.msg_id] = request.reply
-    
-    # 更新消息状态
-    for msg in message_queue:
-        if msg["id"] == request.msg_id:
-            msg["status"] = "completed"
-            break
+    _store_reply(request.msg_id, request.reply)
     
     print(f"  📤 收到回复 #{request.msg_id} (长度: {len(request.reply)})")
     return {"status": "ok", "msg_id": request.msg_id}
 
 
+@app.post("/api/v1/reply/{msg_id}/chunk")
+async def post_reply_chunk(msg_id: str, request: ChunkRequest):
+    """
+    推送流式回复片段（供 OpenClaw 调用）
+    
+    仅对通过 /api/v1/chat/stream 发起的消息有效，完成后仍需提交最终回复
+    """
+    queue = stream_queues.get(msg_id)
+    if queue is None:
+        return {"status": "error", "message": "No active stream"}
+    queue.put_nowait(("chunk", request.content))
+    return {"status": "ok"}
+
+
+@app.post("/api/v1/reply/batch")
+async def post_reply_batch(request: ReplyBatchRequest):
+    """
+    批量提交回复（供 OpenClaw 调用）
+    
+    Worker 在合并窗口内攒下的多条回复通过一次请求提交
+    """
+    for item in request.replies:
+        _store_reply(item.msg_id, item.reply)
+    
+    print(f"  📤 批量收到 {len(request.replies)} 条回复")
+    return {
+        "status": "ok",
+        "msg_ids": [item.msg_id for item in request.replies]
+    }
+
+
+@app.get("/api/v1/workers")
+async def get_workers():
+    """查看在线 Worker 及其正在处理的消息数"""
+    now = time.monotonic()
+    return {
+        "workers": [
+            {
+                "worker_id": worker_id,
+                "last_seen_seconds": round(now - seen, 2),
+                "processing": sum(
+                    1 for m in message_queue
+                    if m["status"] == "processing" and m.get("worker") == worker_id
+                )
+            }
+            for worker_id, seen in workers.items()
+        ],
+        "ttl": WORKER_TTL
+    }
+
+
+@app.post("/api/v1/workers/{worker_id}/heartbeat")
+async def worker_heartbeat(worker_id: str):
+    """Worker 后台定期调用，处理耗时消息、不轮询期间同样保持在线"""
+    _heartbeat(worker_id)
+    return {"status": "ok", "ttl": WORKER_TTL}
+
+
+@app.post("/api/v1/workers/{worker_id}/leave")
+async def worker_leave(worker_id: str):
+    """Worker 正常退出时调用，立即触发重新分配"""
+    if workers.pop(worker_id, None) is not None:
+        _rebalance(f"-{worker_id}")
+    return {"status": "ok"}
+
+
 @app.delete("/api/v1/messages/{msg_id}")
 async def delete_message(msg_id: str):
     """删除已处理的消息"""
@@ -201,8 +510,8 @@ def main():
    
 🔄 工作流:
    1. wechat-agent 发送消息到 /api/v1/chat
-   2. OpenClaw 轮询 /api/v1/messages 获取消息
-   3. OpenClaw 处理完成后 POST /api/v1/reply
+   2. OpenClaw 轮询 /api/v1/messages 获取消息 (?claim=true 批量领取)
+   3. OpenClaw 处理完成后 POST /api/v1/reply (或 /api/v1/reply/batch)
    4. wechat-agent 收到回复
 
 Press Ctrl+C to stop
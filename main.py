@@ -20,6 +20,7 @@ except Exception as e:
     print(f"环境初始化异常: {e}")
 
 from utils.logger import logger
+from utils.http_pool import http_pool
 
 from utils.stability import setupGlobalExceptionHandler
 from utils.self_test import get_self_test_report
@@ -69,6 +70,7 @@ def _gracefulShutdown(signum, frame):
     listener.stop()
     processor.stop()
     scheduler.stop()
+    logger.info(f"HTTP 连接复用统计: {http_pool.snapshot()}")
     logger.info("所有模块已停止，程序退出")
     sys.exit(0)
 
@@ -9,20 +9,40 @@ OpenClaw Bridge Worker - HTTP 桥接工作器
     设置环境变量后运行:
     export OPENCLAW_BRIDGE_URL=http://host.docker.internal:9848
     python openclaw_bridge_worker.py
+
+多 Worker 部署:
+    每个 Worker 设置不同的 OPENCLAW_WORKER_ID（默认为 主机名-进程号），
+    Bridge 按会话键哈希把同一会话的消息固定路由到同一个 Worker
+
+批量模式:
+    export OPENCLAW_BATCH_WINDOW=0.2
+    拉取时批量领取消息（省去逐条状态更新），回复在合并窗口内
+    攒批后通过 /api/v1/reply/batch 一次提交
 """
 
 import os
 import sys
 import re
 import time
+import socket
 import asyncio
+import hashlib
+import unicodedata
 import aiohttp
 from datetime import datetime
 from pathlib import Path
+from typing import AsyncGenerator
+
+from utils.singleflight import SingleFlight
+from utils.session_key import session_key_of
 
 # HTTP Bridge Server 地址
 BRIDGE_URL = os.getenv("OPENCLAW_BRIDGE_URL", "http://host.docker.internal:9848")
 POLL_INTERVAL = float(os.getenv("OPENCLAW_POLL_INTERVAL", "1.0"))  # 轮询间隔
+WORKER_ID = os.getenv("OPENCLAW_WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+BATCH_WINDOW = float(os.getenv("OPENCLAW_BATCH_WINDOW", "0"))  # 回复合并窗口（秒），0 表示关闭批量模式
+BATCH_SIZE = int(os.getenv("OPENCLAW_BATCH_SIZE", "20"))  # 批量模式单次领取的最大消息数
+HEARTBEAT_INTERVAL = float(os.getenv("OPENCLAW_HEARTBEAT_INTERVAL", "5"))  # 心跳间隔，须小于 Bridge 的 HTTP_BRIDGE_WORKER_TTL
 
 
 class BridgeWorker:
@@ -30,11 +50,21 @@ class BridgeWorker:
     
     def __init__(self):
         self.bridge_url = BRIDGE_URL
+        self.worker_id = WORKER_ID
         self.session: aiohttp.ClientSession = None
         self.running = False
+        self.batch_mode = BATCH_WINDOW > 0
+        self._reply_buffer: list = []
+        self._flush_task: asyncio.Task = None
+        self._heartbeat_task: asyncio.Task = None
+        # 合并同时到达的相同问题（群聊/广播场景），只执行一次搜索，
+        # 搜索结果分发给每条消息，回复的开头与流式片段仍按各自的消息生成与推送
+        self.singleflight = SingleFlight()
         self.stats = {
             "processed": 0,
             "errors": 0,
+            "coalesced": 0,
+            "http_requests": 0,
             "start_time": datetime.now().isoformat()
         }
     
@@ -47,10 +77,15 @@ class BridgeWorker:
             await self.session.close()
     
     async def get_pending_messages(self) -> list:
-        """获取待处理的消息"""
+        """获取待处理的消息（批量模式下同时领取）"""
+        params = {"worker_id": self.worker_id}
+        if self.batch_mode:
+            params.update({"claim": "true", "limit": str(BATCH_SIZE)})
         try:
+            self.stats["http_requests"] += 1
             async with self.session.get(
                 f"{self.bridge_url}/api/v1/messages",
+                params=params,
                 timeout=aiohttp.ClientTimeout(total=10)
             ) as resp:
                 if resp.status == 200:
@@ -61,9 +96,39 @@ class BridgeWorker:
             print(f"  ⚠️  获取消息失败: {e}")
             return []
     
+    async def leave(self):
+        """通知 Bridge 本 Worker 退出，让其名下的发送者立即重新分配"""
+        try:
+            async with self.session.post(
+                f"{self.bridge_url}/api/v1/workers/{self.worker_id}/leave",
+                timeout=aiohttp.ClientTimeout(total=5)
+            ):
+                pass
+        except:
+            pass
+    
+    async def heartbeat(self) -> bool:
+        """向 Bridge 发送心跳，处理耗时消息期间不被判定为离线"""
+        try:
+            async with self.session.post(
+                f"{self.bridge_url}/api/v1/workers/{self.worker_id}/heartbeat",
+                timeout=aiohttp.ClientTimeout(total=5)
+            ) as resp:
+                return resp.status == 200
+        except Exception as e:
+            print(f"  ⚠️  心跳失败: {e}")
+            return False
+    
+    async def _heartbeat_loop(self):
+        """独立于轮询周期性发送心跳（轮询可能被一批耗时的搜索阻塞）"""
+        while self.running:
+            await self.heartbeat()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+    
     async def update_status(self, msg_id: str, status: str):
         """更新消息状态"""
         try:
+            self.stats["http_requests"] += 1
             async with self.session.post(
                 f"{self.bridge_url}/api/v1/messages/{msg_id}/status",
                 params={"status": status},
@@ -76,6 +141,7 @@ class BridgeWorker:
     async def submit_reply(self, msg_id: str, reply: str) -> bool:
         """提交回复"""
         try:
+            self.stats["http_requests"] += 1
             async with self.session.post(
                 f"{self.bridge_url}/api/v1/reply",
                 json={"msg_id": msg_id, "reply": reply},
@@ -86,14 +152,113 @@ class BridgeWorker:
             print(f"  ⚠️  提交回复失败: {e}")
             return False
     
-    async def process_message(self, message: dict) -> str:
+    async def submit_replies(self, replies: list) -> bool:
+        """批量提交回复"""
+        try:
+            self.stats["http_requests"] += 1
+            async with self.session.post(
+                f"{self.bridge_url}/api/v1/reply/batch",
+                json={"replies": replies},
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as resp:
+                return resp.status == 200
+        except Exception as e:
+            print(f"  ⚠️  批量提交回复失败: {e}")
+            return False
+    
+    async def queue_reply(self, msg_id: str, reply: str):
+        """将回复放入合并缓冲区，由 flush 循环统一提交"""
+        self._reply_buffer.append({"msg_id": msg_id, "reply": reply})
+    
+    async def flush_replies(self):
+        """提交缓冲区中的全部回复，失败时保留到下一轮重试"""
+        if not self._reply_buffer:
+            return
+        
+        batch, self._reply_buffer = self._reply_buffer, []
+        if await self.submit_replies(batch):
+            self.stats["processed"] += len(batch)
+            print(f"  ✅ 批量提交 {len(batch)} 条回复")
+        else:
+            self.stats["errors"] += 1
+            self._reply_buffer = batch + self._reply_buffer
+    
+    async def _flush_loop(self):
+        """按合并窗口周期性提交回复"""
+        while self.running:
+            await asyncio.sleep(BATCH_WINDOW)
+            await self.flush_replies()
+    
+    async def _search_parts(self, content: str, urls: list) -> AsyncGenerator[str, None]:
+        """按获取顺序逐个产出搜索/网页提取结果"""
+        # 1. 如果有 URL，使用 Tavily Extract 或 Browser 工具
+        if urls:
+            print(f"  🌐 检测到 URL，提取内容...")
+            
+            # 尝试使用 MCP Tavily Extract
+            try:
+                from mcp_client import TavilyMCPClient
+                async with TavilyMCPClient() as mcp:
+                    for url in urls[:2]:
+                        extract_result = await mcp.extract(url, include_images=False)
+                        yield f"【网页摘要】\n{extract_result[:1500]}"
+            except Exception as e:
+                print(f"  ⚠️  Tavily Extract 失败，使用 Browser: {e}")
+                # 回退到 Browser 工具
+                for url in urls[:2]:
+                    try:
+                        from tools.browser_tool import browseWebpage
+                        page_content = await browseWebpage(url)
+                        yield f"【网页内容】\n{page_content[:1500]}"
+                    except Exception as be:
+                        yield f"【网页浏览失败】{url}: {str(be)}"
+            return
+        
+        # 2. 执行 MCP Tavily 搜索
+        print(f"  🔍 使用 MCP Tavily 搜索: {content[:30]}...")
+        try:
+            from mcp_client import TavilyMCPClient
+            
+            async with TavilyMCPClient() as mcp:
+                # 使用 MCP 进行深度搜索
+                search_result = await mcp.search(
+                    content,
+                    search_depth="advanced",
+                    max_results=5
+                )
+                yield f"【Tavily MCP 搜索结果】\n{search_result[:2000]}"
+                
+                # 尝试访问第一个结果获取更多信息
+                url_matches = re.findall(r'https?://[^\s\)]+', search_result)
+                if url_matches:
+                    print(f"  🌐 提取首个结果详情...")
+                    try:
+                        extract_result = await mcp.extract(url_matches[0])
+                        yield f"【详细内容】\n{extract_result[:1500]}"
+                    except:
+                        pass
+                    
+        except Exception as e:
+            print(f"  ⚠️  MCP 搜索失败，使用传统搜索: {e}")
+            # 回退到传统搜索
+            try:
+                from tools.web_search_tool import searchWeb
+                search_results = await searchWeb(content)
+                yield f"【搜索结果】\n{search_results[:1500]}"
+            except Exception as e2:
+                yield f"【搜索失败】{str(e2)}"
+    
+    async def process_message_stream(self, message: dict) -> AsyncGenerator[str, None]:
         """
-        处理消息 - 使用 MCP Tavily 搜索和 Browser 工具
+        流式处理消息 - 使用 MCP Tavily 搜索和 Browser 工具
         
         支持:
         • MCP Tavily 搜索 (增强版)
         • 网页浏览 (Playwright)
         • 数据提取和分析
+        
+        每拿到一段结果就立即产出，调用方可以边生成边转发。
+        相同问题正在搜索时共享同一次搜索的结果，不重复执行。
         """
         sender = message.get("sender", "unknown")
         content = message.get("message", "")
@@ -113,7 +278,6 @@ class BridgeWorker:
         
         if not need_search:
             # 简单对话回复
-            content_lower = content.lower()
             if "你好" in content or "你是谁" in content:
                 reply = f"""你好！我是小虎哥 (xiaohuge) 🦞
 
@@ -128,108 +292,160 @@ class BridgeWorker:
             else:
                 reply = f"收到你的消息：{content}\n\n我在听，请继续说说你的需求。"
             
-            if "🤖 AI 生成" not in reply:
-                reply = f"{reply}\n\n---\n🤖 AI 生成"
-            return reply
+            yield f"{reply}\n\n---\n🤖 AI 生成"
+            return
         
-        # 需要搜索或浏览网页
+        # 需要搜索或浏览网页：先发出开头段落，再逐段输出结果
+        yield f"根据您的询问 \"{content[:50]}\"，我通过 Tavily MCP 为您找到了以下信息：\n\n"
+        
+        budget = 2800
+        first = True
+        key = self.coalesce_key(message)
+        if key in self.singleflight:
+            self.stats["coalesced"] += 1
+            print(f"  🔗 与进行中的相同问题合并搜索")
         try:
-            result_parts = []
-            
-            # 1. 如果有 URL，使用 Tavily Extract 或 Browser 工具
-            if urls:
-                print(f"  🌐 检测到 URL，提取内容...")
-                
-                # 尝试使用 MCP Tavily Extract
-                try:
-                    from mcp_client import TavilyMCPClient
-                    async with TavilyMCPClient() as mcp:
-                        for url in urls[:2]:
-                            extract_result = await mcp.extract(url, include_images=False)
-                            result_parts.append(f"【网页摘要】\n{extract_result[:1500]}")
-                except Exception as e:
-                    print(f"  ⚠️  Tavily Extract 失败，使用 Browser: {e}")
-                    # 回退到 Browser 工具
-                    for url in urls[:2]:
-                        try:
-                            from tools.browser_tool import browseWebpage
-                            page_content = await browseWebpage(url)
-                            result_parts.append(f"【网页内容】\n{page_content[:1500]}")
-                        except Exception as be:
-                            result_parts.append(f"【网页浏览失败】{url}: {str(be)}")
-            
-            # 2. 执行 MCP Tavily 搜索
-            else:
-                print(f"  🔍 使用 MCP Tavily 搜索: {content[:30]}...")
-                try:
-                    from mcp_client import TavilyMCPClient
-                    
-                    async with TavilyMCPClient() as mcp:
-                        # 使用 MCP 进行深度搜索
-                        search_result = await mcp.search(
-                            content,
-                            search_depth="advanced",
-                            max_results=5
-                        )
-                        result_parts.append(f"【Tavily MCP 搜索结果】\n{search_result[:2000]}")
-                        
-                        # 尝试访问第一个结果获取更多信息
-                        url_matches = re.findall(r'https?://[^\s\)]+', search_result)
-                        if url_matches:
-                            print(f"  🌐 提取首个结果详情...")
-                            try:
-                                extract_result = await mcp.extract(url_matches[0])
-                                result_parts.append(f"\n【详细内容】\n{extract_result[:1500]}")
-                            except:
-                                pass
-                            
-                except Exception as e:
-                    print(f"  ⚠️  MCP 搜索失败，使用传统搜索: {e}")
-                    # 回退到传统搜索
-                    try:
-                        from tools.web_search_tool import searchWeb
-                        search_results = await searchWeb(content)
-                        result_parts.append(f"【搜索结果】\n{search_results[:1500]}")
-                    except Exception as e2:
-                        result_parts.append(f"【搜索失败】{str(e2)}")
-            
-            # 生成回复
-            search_summary = "\n\n".join(result_parts)
+            async for part in self.singleflight.stream(key, lambda: self._search_parts(content, urls)):
+                piece = part if first else f"\n\n{part}"
+                first = False
+                piece = piece[:budget]
+                budget -= len(piece)
+                if piece:
+                    yield piece
             
-            # 使用 AI 总结（简化版）
-            reply = f"""根据您的询问 "{content[:50]}"，我通过 Tavily MCP 为您找到了以下信息：
-
-{search_summary[:2800]}
-
-💡 信息来源：Tavily MCP 搜索引擎
-如果您需要更详细的信息或特定方面的分析，请告诉我！"""
+            yield "\n\n💡 信息来源：Tavily MCP 搜索引擎\n如果您需要更详细的信息或特定方面的分析，请告诉我！"
             
         except Exception as e:
             print(f"  ⚠️  处理失败: {e}")
             import traceback
             traceback.print_exc()
-            reply = f"抱歉，处理时发生错误: {str(e)[:80]}\n\n您可以尝试简化问题，或稍后再试。"
+            yield f"\n\n抱歉，处理时发生错误: {str(e)[:80]}\n\n您可以尝试简化问题，或稍后再试。"
         
         # 确保有 AI 标记
-        if "🤖 AI 生成" not in reply:
-            reply = f"{reply}\n\n---\n🤖 AI 生成"
+        yield "\n\n---\n🤖 AI 生成"
+    
+    @staticmethod
+    def coalesce_key(message: dict) -> str:
+        """
+        请求合并键：规范化后的消息文本 + 影响回复的上下文
         
-        return reply
+        忽略全半角、大小写、多余空白和句末标点的差异，
+        "今天天气？" 与 "今天天气" 视为同一问题。
+        不含会话键：同一会话的消息本就逐条处理，不会同时在途；合并共享的只是公开的搜索结果，
+        开头与引用的原话仍按每条消息各自生成。
+        """
+        text = unicodedata.normalize("NFKC", message.get("message", "")).lower()
+        text = re.sub(r"(?<=[\u4e00-\u9fff])\s+(?=[\u4e00-\u9fff])", "", text)
+        text = re.sub(r"\s+", " ", text).strip().rstrip("?!.。？！~～ ")
+        context = message.get("context") or {}
+        raw = f"{text}|{context.get('role_level', '')}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    
+    async def process_message(self, message: dict) -> str:
+        """处理消息，返回完整回复"""
+        return "".join([part async for part in self.process_message_stream(message)])
+    
+    async def submit_chunk(self, msg_id: str, content: str) -> bool:
+        """推送流式回复片段"""
+        try:
+            self.stats["http_requests"] += 1
+            async with self.session.post(
+                f"{self.bridge_url}/api/v1/reply/{msg_id}/chunk",
+                json={"content": content},
+                timeout=aiohttp.ClientTimeout(total=5)
+            ) as resp:
+                return resp.status == 200
+        except Exception as e:
+            print(f"  ⚠️  推送回复片段失败: {e}")
+            return False
+    
+    async def stream_message(self, msg: dict) -> str:
+        """边生成边推送片段，返回完整回复"""
+        msg_id = msg.get("id")
+        parts = []
+        async for part in self.process_message_stream(msg):
+            parts.append(part)
+            await self.submit_chunk(msg_id, part)
+        return "".join(parts)
+    
+    async def handle_message(self, msg: dict):
+        """处理单条消息并提交回复（批量模式下进入合并缓冲区）"""
+        msg_id = msg.get("id")
+        sender = msg.get("sender")
+        content = msg.get("message", "")[:50]
+        
+        print(f"  处理消息 #{msg_id} from {sender}: {content}...")
+        
+        # 更新状态为处理中（批量模式下拉取时已领取）
+        if not self.batch_mode:
+            await self.update_status(msg_id, "processing")
+        
+        # 处理消息（流式请求边生成边推送片段；相同问题的搜索在 process_message_stream 中合并）
+        try:
+            if msg.get("stream"):
+                reply = await self.stream_message(msg)
+            else:
+                reply = await self.process_message(msg)
+            
+            if self.batch_mode:
+                await self.queue_reply(msg_id, reply)
+                return
+            
+            # 提交回复
+            success = await self.submit_reply(msg_id, reply)
+            if success:
+                self.stats["processed"] += 1
+                print(f"  ✅ 消息 #{msg_id} 处理完成")
+            else:
+                self.stats["errors"] += 1
+                print(f"  ❌ 消息 #{msg_id} 提交失败")
+                
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"  ❌ 消息 #{msg_id} 处理异常: {e}")
+            # 提交错误回复
+            error_reply = f"抱歉，处理时发生错误: {str(e)[:80]}\n\n---\n🤖 AI 生成"
+            if self.batch_mode:
+                await self.queue_reply(msg_id, error_reply)
+            else:
+                await self.submit_reply(msg_id, error_reply)
+    
+    async def handle_batch(self, messages: list):
+        """
+        并发处理一批消息
+        
+        同一会话的消息按顺序处理，不同会话之间并发执行。
+        """
+        by_session: dict = {}
+        for msg in messages:
+            by_session.setdefault(session_key_of(msg), []).append(msg)
+        
+        async def _run_session(session_messages: list):
+            for msg in session_messages:
+                await self.handle_message(msg)
+        
+        await asyncio.gather(*(_run_session(group) for group in by_session.values()))
     
     async def run(self):
         """主循环"""
+        mode = f"batch ({BATCH_WINDOW}s)" if self.batch_mode else "single"
         print(f"""
 ╔════════════════════════════════════════════════╗
 ║     OpenClaw Bridge Worker v1.0.0             ║
 ╠════════════════════════════════════════════════╣
 ║  Bridge URL: {self.bridge_url:<35} ║
+║  Worker ID: {self.worker_id:<36} ║
 ║  Poll Interval: {POLL_INTERVAL}s{'':<30} ║
+║  Mode: {mode:<40} ║
 ╚════════════════════════════════════════════════╝
 
 🔄 开始轮询消息...
         """)
         
         self.running = True
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        if self.batch_mode:
+            self._flush_task = asyncio.create_task(self._flush_loop())
         
         while self.running:
             try:
@@ -239,37 +455,7 @@ class BridgeWorker:
                 if messages:
                     print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 发现 {len(messages)} 条新消息")
                     
-                    for msg in messages:
-                        msg_id = msg.get("id")
-                        sender = msg.get("sender")
-                        content = msg.get("message", "")[:50]
-                        
-                        print(f"  处理消息 #{msg_id} from {sender}: {content}...")
-                        
-                        # 更新状态为处理中
-                        await self.update_status(msg_id, "processing")
-                        
-                        # 处理消息
-                        try:
-                            reply = await self.process_message(msg)
-                            
-                            # 提交回复
-                            success = await self.submit_reply(msg_id, reply)
-                            if success:
-                                self.stats["processed"] += 1
-                                print(f"  ✅ 消息 #{msg_id} 处理完成")
-                            else:
-                                self.stats["errors"] += 1
-                                print(f"  ❌ 消息 #{msg_id} 提交失败")
-                                
-                        except Exception as e:
-                            self.stats["errors"] += 1
-                            print(f"  ❌ 消息 #{msg_id} 处理异常: {e}")
-                            # 提交错误回复
-                            await self.submit_reply(
-                                msg_id, 
-                                f"抱歉，处理时发生错误: {str(e)[:80]}\n\n---\n🤖 AI 生成"
-                            )
+                    await self.handle_batch(messages)
                 
                 # 等待下一轮
                 await asyncio.sleep(POLL_INTERVAL)
@@ -281,9 +467,17 @@ class BridgeWorker:
                 print(f"  ⚠️  主循环异常: {e}")
                 await asyncio.sleep(5)
         
+        if self._flush_task:
+            self._flush_task.cancel()
+            await self.flush_replies()
+        self._heartbeat_task.cancel()
+        await self.leave()
+        
         print(f"\n📊 统计:")
         print(f"  处理消息: {self.stats['processed']}")
         print(f"  错误: {self.stats['errors']}")
+        print(f"  合并请求: {self.stats['coalesced']}")
+        print(f"  HTTP 请求: {self.stats['http_requests']}")
 
 
 async def main():
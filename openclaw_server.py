@@ -6,8 +6,9 @@ OpenClaw Gateway Server - 与 wechat-agent 对接的 HTTP 服务
 import os
 import json
 import asyncio
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Optional
+from typing import Optional, AsyncGenerator
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -15,8 +16,29 @@ import uvicorn
 
 app = FastAPI(title="OpenClaw Gateway", version="1.0.0")
 
-# 存储会话状态
-sessions = {}
+# 每个会话保留的最近对话轮数
+SESSION_TURNS = int(os.getenv("OPENCLAW_SESSION_TURNS", "10"))
+# 最多保留的会话数（超出时淘汰最久未活动的会话）
+MAX_SESSIONS = int(os.getenv("OPENCLAW_MAX_SESSIONS", "1000"))
+
+# 存储会话状态：会话键 → {"turns": 最近若干轮 (用户消息, 回复), "updated": 最后活动时间}
+sessions: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def get_session(session_key: Optional[str], sender: str) -> dict:
+    """
+    取得（或创建）会话状态
+
+    wechat-agent 按 (群, 发送者) 派生会话键，同一对话的消息落到同一会话，
+    不必每条消息都重建上下文；旧客户端不带会话键时按发送者区分。
+    """
+    key = session_key or f"sender:{sender}"
+    session = sessions.pop(key, None) or {"turns": deque(maxlen=SESSION_TURNS)}
+    session["updated"] = datetime.now().isoformat()
+    sessions[key] = session
+    while len(sessions) > MAX_SESSIONS:
+        sessions.popitem(last=False)
+    return session
 
 
 class ChatRequest(BaseModel):
@@ -35,12 +57,18 @@ class ChatResponse(BaseModel):
     session_key: Optional[str] = None
 
 
-async def process_with_openclaw(message: str, sender: str, context: dict) -> str:
+async def process_with_openclaw_stream(
+    message: str, sender: str, context: dict, session_key: Optional[str] = None
+) -> AsyncGenerator[str, None]:
     """
-    处理消息并返回回复
+    处理消息并逐段产出回复
     
-    这里是我（OpenClaw 代理）实际处理消息的地方
+    这里是我（OpenClaw 代理）实际处理消息的地方，
+    每生成一个段落就立即产出，供流式接口实时转发。
+    同一会话的最近几轮对话随消息一起交给处理逻辑。
     """
+    session = get_session(session_key, sender)
+    
     # 构建上下文信息
     context_info = f"""
 【微信消息上下文】
@@ -55,6 +83,11 @@ async def process_with_openclaw(message: str, sender: str, context: dict) -> str
     if context.get("group_name"):
         context_info += f"- 群组: {context['group_name']}\n"
     
+    if session["turns"]:
+        context_info += "\n【最近对话】\n" + "\n".join(
+            f"用户: {question}\n助手: {answer}" for question, answer in session["turns"]
+        ) + "\n"
+    
     # 组合完整消息
     full_message = f"{context_info}\n【用户消息】\n{message}"
     
@@ -73,7 +106,20 @@ async def process_with_openclaw(message: str, sender: str, context: dict) -> str
 
 你可以尝试问我任何问题，我会尽力帮助你。"""
     
-    return reply
+    paragraphs = reply.split("\n\n")
+    for i, paragraph in enumerate(paragraphs):
+        yield paragraph if i == len(paragraphs) - 1 else f"{paragraph}\n\n"
+    
+    session["turns"].append((message, reply))
+
+
+async def process_with_openclaw(
+    message: str, sender: str, context: dict, session_key: Optional[str] = None
+) -> str:
+    """处理消息并返回完整回复"""
+    return "".join([
+        part async for part in process_with_openclaw_stream(message, sender, context, session_key)
+    ])
 
 
 @app.get("/health")
@@ -95,7 +141,8 @@ async def chat(request: ChatRequest):
         reply = await process_with_openclaw(
             message=request.message,
             sender=request.sender,
-            context=request.context
+            context=request.context,
+            session_key=request.session_key
         )
         
         return ChatResponse(
@@ -115,18 +162,15 @@ async def chat_stream(request: ChatRequest):
     """
     async def generate():
         try:
-            # 获取完整回复
-            reply = await process_with_openclaw(
+            # 每产出一段立即转发
+            async for part in process_with_openclaw_stream(
                 message=request.message,
                 sender=request.sender,
-                context=request.context
-            )
-            
-            # 模拟流式输出（按字符分割）
-            for char in reply:
-                chunk = json.dumps({"content": char})
+                context=request.context,
+                session_key=request.session_key
+            ):
+                chunk = json.dumps({"content": part})
                 yield f"data: {chunk}\n\n"
-                await asyncio.sleep(0.01)  # 模拟打字效果
             
             yield "data: [DONE]\n\n"
             
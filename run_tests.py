@@ -23,7 +23,33 @@ def run_all_tests():
         'tests.test_auto_voice_processor', 
         'tests.test_wechat_account_manager',
         'tests.test_one_click_voice',
-        'tests.test_binary_manager'
+        'tests.test_binary_manager',
+        'tests.test_singleflight',
+        'tests.test_reply_tailer',
+        'tests.test_file_watcher',
+        'tests.test_jsonl_segments',
+        'tests.test_recent_ids',
+        'tests.test_latency',
+        'tests.test_spool',
+        'tests.test_framing',
+        'tests.test_http_pool',
+        'tests.test_circuit_breaker',
+        'tests.test_hedging',
+        'tests.test_reply_segmenter',
+        'tests.test_retry',
+        'tests.test_session_key',
+        'tests.test_token_window',
+        'tests.test_conversation_store',
+        'tests.test_response_cache',
+        'tests.test_bridge_worker',
+        'tests.test_admission',
+        'tests.test_file_bridge_monitor',
+        'tests.test_bridge_server',
+        'tests.test_connector_chain',
+        'tests.test_connector_registry',
+        'tests.test_openclaw_bridge',
+        'tests.test_http_bridge_server',
+        'tests.test_stability'
     ]
     
     for module in test_modules:
@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+
+from utils.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmission(unittest.IsolatedAsyncioTestCase):
+    """准入控制测试"""
+
+    async def test_queue_full_rejected(self):
+        """测试处理槽位与等待队列都满时立即返回 429"""
+        admission = AdmissionController(max_inflight=1, max_queue=1, queue_timeout=1)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(admission.waiting, 1)
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            await admission.acquire()
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(ctx.exception.headers, {"Retry-After": "2"})
+
+        admission.release()
+        await waiter
+        self.assertEqual((admission.inflight, admission.waiting), (1, 0))
+
+    async def test_queue_timeout_rejected(self):
+        """测试排队超时返回 503，且不占用槽位"""
+        admission = AdmissionController(max_inflight=1, max_queue=4, queue_timeout=0.01)
+        await admission.acquire()
+        with self.assertRaises(AdmissionRejected) as ctx:
+            await admission.acquire()
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual((admission.inflight, admission.waiting), (1, 0))
+        self.assertEqual(admission.stats["rejected_timeout"], 1)
+
+    async def test_hold_releases_once(self):
+        """测试 hold() 返回的释放函数多次调用只释放一次槽位"""
+        admission = AdmissionController(max_inflight=1, max_queue=0)
+        release = await admission.hold()
+        release()
+        release()
+        self.assertEqual(admission.inflight, 0)
+
+        await admission.acquire()
+        with self.assertRaises(AdmissionRejected):
+            await admission.acquire()
+
+    async def test_unlimited(self):
+        """测试 max_inflight 为 0 时不限制"""
+        admission = AdmissionController()
+        async with admission:
+            async with admission:
+                self.assertEqual(admission.inflight, 2)
+        self.assertEqual(admission.inflight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
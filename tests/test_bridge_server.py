@@ -0,0 +1,56 @@
+import unittest
+
+from bridge_server import _split_chunks
+
+SAMPLES = [
+    "你好！\n\n今天有什么可以帮你？\n\n再见。",
+    "第一段。\n\n\n\n第二段前多了空行\n\n",
+    "\n\n开头就是空行",
+    "Hello world. This is a test! Is it? Yes; done…",
+    "没有任何段落分隔也没有标点的一整段很长的文字",
+    "单行\n换行但不是空行\n最后一行",
+]
+
+
+class TestSplitChunks(unittest.TestCase):
+    """Bridge Server 流式分片测试"""
+
+    def test_join_restores_text(self):
+        """测试各种切分方式下拼接所有片段等于原文"""
+        for text in SAMPLES:
+            for chunk_size in (None, 0, 1, 3, 8, 1000):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    self.assertEqual("".join(_split_chunks(text, chunk_size)), text)
+
+    def test_paragraphs_keep_their_breaks(self):
+        """测试不指定 chunk_size 时按段落切分，空行留在段落末尾"""
+        self.assertEqual(
+            _split_chunks("你好！\n\n今天有什么可以帮你？\n\n再见。"),
+            ["你好！\n\n", "今天有什么可以帮你？\n\n", "再见。"],
+        )
+        self.assertEqual(_split_chunks("结尾有空行\n\n"), ["结尾有空行\n\n"])
+
+    def test_chunk_size_smaller_than_paragraph(self):
+        """测试 chunk_size 小于段落时按句子合并，超长单句硬切，片段都不超过上限"""
+        text = "第一句很短。第二句也短！这是一个明显超过上限的长句子没有标点\n\n尾段。"
+        chunks = _split_chunks(text, 8)
+
+        self.assertEqual("".join(chunks), text)
+        self.assertTrue(all(0 < len(chunk) <= 8 for chunk in chunks))
+        self.assertEqual(chunks[0], "第一句很短。")
+
+    def test_text_without_paragraph_breaks(self):
+        """测试没有段落分隔时整段作为一个片段，指定 chunk_size 时按句子合并"""
+        text = "Hello world. This is a test! Is it? Yes."
+
+        self.assertEqual(_split_chunks(text), [text])
+        self.assertEqual(_split_chunks(text, 16), ["Hello world.", " This is a test!", " Is it? Yes."])
+
+    def test_empty_text(self):
+        """测试空文本没有片段"""
+        self.assertEqual(_split_chunks(""), [])
+        self.assertEqual(_split_chunks("", 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
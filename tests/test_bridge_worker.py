@@ -0,0 +1,117 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import openclaw_bridge_worker
+from openclaw_bridge_worker import BridgeWorker
+
+
+class _Worker(BridgeWorker):
+    """搜索与推送替换为本地实现的 Worker"""
+
+    def __init__(self):
+        super().__init__()
+        self.searches = 0
+        self.chunks = {}
+        self.replies = {}
+
+    async def _search_parts(self, content, urls):
+        self.searches += 1
+        for part in ("结果一", "结果二"):
+            await asyncio.sleep(0.02)
+            yield part
+
+    async def submit_chunk(self, msg_id, content):
+        self.chunks.setdefault(msg_id, []).append(content)
+        return True
+
+    async def update_status(self, msg_id, status):
+        return True
+
+    async def submit_reply(self, msg_id, reply):
+        self.replies[msg_id] = reply
+        return True
+
+
+class TestBridgeWorker(unittest.IsolatedAsyncioTestCase):
+    """Bridge Worker 请求合并测试"""
+
+    async def test_coalesced_stream_reaches_every_message(self):
+        """测试不同发送者的相同问题只搜索一次，每条消息都收到自己的片段与开头"""
+        worker = _Worker()
+        first = {"id": "m1", "sender": "a", "message": "搜索 Python？", "stream": True}
+        second = {"id": "m2", "sender": "b", "message": "搜索 python", "stream": True}
+
+        replies = await asyncio.gather(worker.stream_message(first), worker.stream_message(second))
+
+        self.assertEqual(worker.searches, 1)
+        self.assertEqual(worker.stats["coalesced"], 1)
+        for msg, reply in zip((first, second), replies):
+            self.assertEqual("".join(worker.chunks[msg["id"]]), reply)
+            self.assertIn(f"\"{msg['message']}\"", reply)
+            self.assertIn("结果二", reply)
+
+    async def test_batch_coalesces_across_senders(self):
+        """测试同一批次里不同发送者的相同问题只搜索一次"""
+        worker = _Worker()
+        await worker.handle_batch([
+            {"id": "m1", "sender": "a", "message": "搜索 Python", "stream": True},
+            {"id": "m2", "sender": "b", "message": "搜索 python？", "stream": True},
+        ])
+
+        self.assertEqual(worker.searches, 1)
+        self.assertEqual(worker.stats["coalesced"], 1)
+        self.assertEqual(sorted(worker.replies), ["m1", "m2"])
+
+    async def test_flush_retries_failed_batch(self):
+        """测试批量提交失败时回复留在缓冲区，下一轮与新回复一起提交"""
+        worker = _Worker()
+        batches = []
+        results = [False, True]
+
+        async def submit_replies(replies):
+            batches.append([r["msg_id"] for r in replies])
+            return results.pop(0)
+
+        worker.submit_replies = submit_replies
+        await worker.queue_reply("m1", "回复一")
+        await worker.flush_replies()
+        await worker.queue_reply("m2", "回复二")
+        await worker.flush_replies()
+        await worker.flush_replies()
+
+        self.assertEqual(batches, [["m1"], ["m1", "m2"]])
+        self.assertEqual(worker.stats["processed"], 2)
+
+    async def test_heartbeat_continues_during_slow_batch(self):
+        """测试处理耗时消息、不轮询期间后台仍按间隔发送心跳"""
+        worker = _Worker()
+        beats = []
+
+        async def heartbeat():
+            beats.append(asyncio.get_running_loop().time())
+            return True
+
+        worker.heartbeat = heartbeat
+        worker.running = True
+        with mock.patch.object(openclaw_bridge_worker, "HEARTBEAT_INTERVAL", 0.01):
+            task = asyncio.create_task(worker._heartbeat_loop())
+            await worker.handle_batch([{"id": "m1", "sender": "a", "message": "搜索 Python", "stream": True}])
+            worker.running = False
+            await task
+
+        self.assertGreaterEqual(len(beats), 3)
+
+    async def test_simple_reply_echoes_own_message(self):
+        """测试简单回复引用的是每条消息自己的内容"""
+        worker = _Worker()
+        replies = await asyncio.gather(
+            worker.process_message({"id": "m1", "sender": "a", "message": "在干嘛"}),
+            worker.process_message({"id": "m2", "sender": "b", "message": "在干嘛~"}),
+        )
+        self.assertIn("收到你的消息：在干嘛\n", replies[0])
+        self.assertIn("收到你的消息：在干嘛~\n", replies[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """熔断器测试"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        """测试连续失败达到阈值后断开，成功会清零计数"""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after, 10)
+
+    def test_half_open_trial(self):
+        """测试冷却期后只放行一次试探，试探结果决定恢复或重新断开"""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 10
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats["opened"], 2)
+
+    def test_probe_ends_cooldown_early(self):
+        """测试探测到恢复时提前进入半开状态"""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 1
+        self.breaker.half_open()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+    def _trip_and_take_trial(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_release_returns_trial(self):
+        """测试试探请求被取消或结果不计成败（[Busy]）时归还名额"""
+        self._trip_and_take_trial()
+        self.breaker.release()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+    def test_stale_trial_times_out(self):
+        """测试试探请求一直没有结果时，超时后重新放行"""
+        self._trip_and_take_trial()
+        self.clock.now = 15
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 1000
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+    def test_probe_success_resets_stale_half_open(self):
+        """测试半开状态下探测成功会重新放行卡住的试探"""
+        self._trip_and_take_trial()
+        self.breaker.record_probe_success()
+        self.assertTrue(self.breaker.allow())
+
+    def test_probe_success_clears_failures_when_closed(self):
+        """测试闭合状态下探测成功清零失败计数"""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_probe_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.snapshot()["failures"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from core import connector_chain
+from core.connector_chain import ConnectorChain, parse_chain
+from core.openclaw_connector import ConnectorMode
+from utils.circuit_breaker import CircuitBreaker
+from utils.hedging import HedgeBudget, Hedger
+
+
+class _Connector:
+    """按预设顺序回复的连接器，记录收到的消息"""
+
+    def __init__(self, mode, replies=()):
+        self.mode = mode
+        self.replies = list(replies)
+        self.sent = []
+        self.delay = 0
+        self.health = SimpleNamespace(breaker=CircuitBreaker(3, 30), healthy=None)
+
+    def get_mode(self):
+        return self.mode.value
+
+    async def send_message(self, message, sender, **context):
+        self.sent.append(message)
+        await asyncio.sleep(self.delay)
+        return self.replies.pop(0) if self.replies else f"来自 {self.mode.value} 的回复"
+
+    async def send_message_stream(self, message, sender, **context):
+        yield await self.send_message(message, sender, **context)
+
+    def circuit_open_reply(self):
+        return f"[Unavailable] OpenClaw {self.mode.value} 暂不可用"
+
+
+MODES = [ConnectorMode.HTTP_BRIDGE, ConnectorMode.BRIDGE, ConnectorMode.FILE]
+
+
+class TestConnectorChain(unittest.IsolatedAsyncioTestCase):
+    """连接器故障转移链测试"""
+
+    def setUp(self):
+        self.connectors = {mode: _Connector(mode) for mode in MODES}
+        self.remote = {}
+        self._get_connector = connector_chain.get_connector
+        connector_chain.get_connector = self._connector_for
+        self.chain = ConnectorChain(MODES, hedge=False)
+        self.http, self.bridge, self.file = (self.connectors[mode] for mode in MODES)
+
+    def tearDown(self):
+        connector_chain.get_connector = self._get_connector
+
+    def _connector_for(self, mode, endpoint=None):
+        if endpoint is None:
+            return self.connectors[mode]
+        if mode == ConnectorMode.FILE:
+            raise ValueError("file 模式不支持指定通信目标")
+        return self.remote.setdefault(endpoint, _Connector(mode))
+
+    def _names(self):
+        return [member.name for member in self.chain.ranked()]
+
+    def test_ranking_prefers_healthy_fast_members(self):
+        """测试排序：熔断与探测失败的通道靠后，其余按延迟，成本相同时保持配置顺序"""
+        self.assertEqual(self._names(), ["http_bridge", "bridge", "file"])
+
+        http, bridge, file = self.chain.members
+        http.record(0.5, True)
+        bridge.record(0.1, True)
+        file.record(0.2, True)
+        self.assertEqual(self._names(), ["bridge", "file", "http_bridge"])
+
+        self.bridge.health.healthy = False
+        self.assertEqual(self._names(), ["file", "http_bridge", "bridge"])
+
+        for _ in range(3):
+            self.file.health.breaker.record_failure()
+        self.assertEqual(self._names(), ["http_bridge", "bridge", "file"])
+
+    def test_error_rate_decays_with_half_life(self):
+        """测试错误率按半衰期衰减，故障恢复后通道重新排到前面"""
+        http, bridge, file = self.chain.members
+        http.record(0.1, True)
+        bridge.record(0.2, True)
+        file.record(0.3, True)
+        http.record(0.1, False)
+        self.assertAlmostEqual(http.error_rate, connector_chain.EWMA_ALPHA, places=3)
+        self.assertEqual(self._names()[0], "bridge")
+
+        http._updated -= 3 * connector_chain.ERROR_HALF_LIFE
+        self.assertAlmostEqual(http.error_rate, connector_chain.EWMA_ALPHA / 8, places=3)
+        self.assertEqual(self._names()[0], "http_bridge")
+
+    def test_latency_ignores_failures(self):
+        """测试失败的请求只计入错误率，不改变延迟"""
+        http = self.chain.members[0]
+        http.record(0.1, True)
+        http.record(5.0, False)
+        http.record(0.2, True)
+        self.assertAlmostEqual(http.latency, 0.1 + connector_chain.EWMA_ALPHA * 0.1)
+        self.assertEqual(http.stats, {"calls": 3, "failures": 1, "cancelled": 0})
+
+    async def test_fails_over_when_not_delivered(self):
+        """测试连接被拒绝或过载拒收时换下一个通道"""
+        self.http.replies = ["[Unavailable] HTTP client: Cannot connect"]
+        self.bridge.replies = ["[Busy] Bridge overloaded (503)"]
+
+        reply = await self.chain.send_message("你好")
+
+        self.assertEqual(reply, "来自 file 的回复")
+        self.assertEqual([len(c.sent) for c in (self.http, self.bridge, self.file)], [1, 1, 1])
+
+    async def test_no_failover_after_delivery(self):
+        """测试超时或下游报错时直接返回错误，不把同一消息再发给下一个通道"""
+        for error in ("[Timeout] Bridge 响应超时", "[Bridge Error] 500: boom", "[Error] Bridge: reset"):
+            self.http.replies = [error]
+            self.assertEqual(await self.chain.send_message("你好"), error)
+        self.assertEqual(self.bridge.sent, [])
+        self.assertEqual(self.file.sent, [])
+
+    async def test_skips_open_circuit(self):
+        """测试熔断中的通道不发送，全部不可用时返回最后一个错误"""
+        for connector in self.connectors.values():
+            for _ in range(3):
+                connector.health.breaker.record_failure()
+
+        reply = await self.chain.send_message("你好")
+
+        self.assertTrue(reply.startswith("[Unavailable]"))
+        self.assertEqual(sum(len(c.sent) for c in self.connectors.values()), 0)
+
+    async def test_hedges_only_cancellable_members(self):
+        """测试只有排在前两位的通道都能撤回请求时才对冲"""
+        chain = ConnectorChain(MODES, hedge=True)
+        await chain.send_message("你好")
+        self.assertEqual(chain.members[0].hedger.stats["calls"], 0)
+
+        chain = ConnectorChain(MODES, hedge=True, hedge_modes="http,bridge")
+        await chain.send_message("你好")
+        self.assertEqual(chain.members[0].hedger.stats["calls"], 1)
+
+    def test_parse_chain_endpoints(self):
+        """测试链配置中同一模式可以按不同目标出现多次，重复与不支持的目标被忽略"""
+        targets = parse_chain("http, http@http://b:9848, http@http://b:9848, file")
+        self.assertEqual(targets, [
+            (ConnectorMode.HTTP_BRIDGE, None),
+            (ConnectorMode.HTTP_BRIDGE, "http://b:9848"),
+            (ConnectorMode.FILE, None),
+        ])
+
+        chain = ConnectorChain(parse_chain("http,file@/tmp/x,http@http://b:9848"), hedge=False)
+        self.assertEqual(chain.describe(), "http_bridge→http_bridge@http://b:9848")
+
+    async def test_hedges_across_bridge_servers(self):
+        """测试两台 HTTP Bridge 服务器互为对冲：首选超过 p95 未返回时发给另一台，先返回者胜出"""
+        chain = ConnectorChain(parse_chain("http,http@http://b:9848,file"), hedge=True)
+        primary, secondary, file = chain.members
+        primary.hedger = Hedger(HedgeBudget(ratio=1.0, burst=1.0), min_samples=1)
+        primary.hedger.latency.record(0.01)
+        primary.record(0.01, True)
+        secondary.record(0.02, True)
+        file.record(0.5, True)
+        self.http.delay = 10
+
+        reply = await chain.send_message("你好")
+        await asyncio.sleep(0)  # 让落败的首选请求处理取消
+
+        self.assertEqual(reply, "来自 http_bridge 的回复")
+        self.assertEqual(self.remote["http://b:9848"].sent, ["你好"])
+        self.assertEqual(primary.hedger.stats["secondary_wins"], 1)
+        self.assertEqual(primary.stats["cancelled"], 1)
+        self.assertEqual(self.file.sent, [])
+
+    async def test_cancelled_attempt_records_no_outcome(self):
+        """测试被取消的请求只计入取消数，不计成败"""
+        self.http.delay = 10
+        member = self.chain.members[0]
+        task = asyncio.create_task(self.chain._attempt(member, set(), "你好", "a", {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(member.stats, {"calls": 0, "failures": 0, "cancelled": 1})
+        self.assertEqual(member.error_rate, 0.0)
+
+    async def test_stream_fails_over_only_before_delivery(self):
+        """测试流式请求同样只在未送达时换通道"""
+        self.http.replies = ["[Unavailable] HTTP client: Cannot connect"]
+        chunks = [chunk async for chunk in self.chain.send_message_stream("你好")]
+        self.assertEqual(chunks, ["来自 bridge 的回复"])
+
+        first = self.chain.ranked()[0].connector
+        first.replies = ["[Timeout] Bridge 响应超时"]
+        sent = sum(len(c.sent) for c in self.connectors.values())
+        chunks = [chunk async for chunk in self.chain.send_message_stream("你好")]
+        self.assertEqual(chunks, ["[Timeout] Bridge 响应超时"])
+        self.assertEqual(sum(len(c.sent) for c in self.connectors.values()), sent + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from core import openclaw_connector
+from core.config import conf
+from core.openclaw_connector import ConnectorMode, ConnectorRegistry, OpenClawConnector
+
+
+class _Connector:
+    """只记录是否被关闭的底层连接器"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def send_message(self, message, sender, context):
+        return "好的"
+
+    async def close(self):
+        self.closed = True
+
+
+class TestConnectorRegistry(unittest.IsolatedAsyncioTestCase):
+    """连接器注册表测试"""
+
+    def setUp(self):
+        patches = (
+            mock.patch.object(OpenClawConnector, "_create_connector", lambda self: _Connector()),
+            mock.patch.dict(openclaw_connector._health_registry, clear=True),
+            mock.patch.dict(os.environ, {"OPENCLAW_HEALTH_INTERVAL": "0"}),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.registry = ConnectorRegistry()
+
+    def _reload(self, **env):
+        os.environ.update(env)
+        conf._version += 1
+
+    async def test_get_reuses_connector_per_mode(self):
+        """测试同一模式只创建一次连接器，不同模式各自独立"""
+        file = self.registry.get(ConnectorMode.FILE)
+        self.assertIs(self.registry.get(ConnectorMode.FILE), file)
+        self.assertIsNot(self.registry.get(ConnectorMode.UDS), file)
+
+    async def test_endpoint_gets_own_connector_and_health(self):
+        """测试指定通信目标时得到独立的连接器与健康状态，file 模式不支持指定"""
+        default = self.registry.get(ConnectorMode.HTTP_BRIDGE)
+        other = self.registry.get(ConnectorMode.HTTP_BRIDGE, "http://b:9848")
+
+        self.assertIsNot(other, default)
+        self.assertIs(self.registry.get(ConnectorMode.HTTP_BRIDGE, "http://b:9848"), other)
+        self.assertEqual(other.config.http_bridge_api, "http://b:9848")
+        self.assertIsNot(other.health, default.health)
+        with self.assertRaises(ValueError):
+            self.registry.get(ConnectorMode.FILE, "/tmp/inbox")
+
+    async def test_reload_rebuilds_and_closes_retired(self):
+        """测试配置重新加载后重建连接器，旧连接器在其事件循环中关闭，健康状态改为探测新连接器"""
+        old = self.registry.get(ConnectorMode.FILE)
+        await old.send_message("你好")
+
+        self._reload(OPENCLAW_BREAKER_FAILURES="5")
+        new = self.registry.get(ConnectorMode.FILE)
+        await asyncio.sleep(0)
+
+        self.assertIsNot(new, old)
+        self.assertTrue(old._connector.closed)
+        self.assertFalse(new._connector.closed)
+        self.assertIs(new.health, old.health)
+        self.assertEqual(new.health.probe, new._probe)
+        self.assertEqual(new.health.breaker.failure_threshold, 5)
+
+    async def test_reload_keeps_breaker_when_thresholds_unchanged(self):
+        """测试熔断阈值不变时重建后保留熔断器状态"""
+        old = self.registry.get(ConnectorMode.FILE)
+        breaker = old.health.breaker
+        breaker.record_failure()
+
+        self._reload()
+        new = self.registry.get(ConnectorMode.FILE)
+
+        self.assertIs(new.health.breaker, breaker)
+
+    async def test_close_closes_current_and_deferred(self):
+        """测试 close() 关闭当前连接器，以及重建时无法在原事件循环关闭的旧连接器"""
+        old = self.registry.get(ConnectorMode.FILE)
+        old.loop = asyncio.new_event_loop()
+        old.loop.close()
+
+        self._reload()
+        new = self.registry.get(ConnectorMode.FILE)
+        self.assertFalse(old._connector.closed)
+
+        await self.registry.close()
+
+        self.assertTrue(old._connector.closed)
+        self.assertTrue(new._connector.closed)
+        self.assertIsNot(self.registry.get(ConnectorMode.FILE), new)
+
+
+if __name__ == '__main__':
+    unittest.main()
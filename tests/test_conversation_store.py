@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from utils.conversation_store import ConversationStore
+from utils.token_window import MESSAGE_OVERHEAD
+
+
+class TestConversationStore(unittest.TestCase):
+    """对话记忆持久化测试"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "sub", "memory.db")
+        self.store = ConversationStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_load_splits_recent_and_older(self):
+        """测试按预算拆分最近消息与待折叠消息，且最近部分以用户消息开头"""
+        for i, role in enumerate(["user", "ai", "user", "ai", "user", "ai"]):
+            self.store.append("s1", role, f"m{i}", 10)
+        self.store.append("s2", "user", "other", 10)
+
+        recent, older = self.store.load("s1", budget=3 * (10 + MESSAGE_OVERHEAD))
+        self.assertEqual([t.content for t in recent], ["m4", "m5"])
+        self.assertEqual([t.content for t in older], ["m0", "m1", "m2", "m3"])
+        self.assertEqual([t.content for t in self.store.load("s2", 100)[0]], ["other"])
+
+    def test_summary_and_delete_through(self):
+        """测试摘要覆盖写入、已折叠消息删除，以及重新打开后数据仍在"""
+        turns = [self.store.append("s1", "user", f"m{i}", 1) for i in range(3)]
+        self.store.set_summary("s1", "第一版")
+        self.store.set_summary("s1", "第二版")
+        self.store.delete_through("s1", turns[1].seq)
+        self.store.close()
+
+        self.store = ConversationStore(self.path)
+        self.assertEqual(self.store.get_summary("s1"), "第二版")
+        self.assertEqual([t.content for t in self.store.load("s1", 100)[0]], ["m2"])
+
+    def test_clear(self):
+        """测试清除单个会话与全部会话"""
+        self.store.append("s1", "user", "a", 1)
+        self.store.append("s2", "user", "b", 1)
+        self.store.set_summary("s1", "摘要")
+
+        self.store.clear("s1")
+        self.assertEqual(self.store.load("s1", 100), ([], []))
+        self.assertEqual(self.store.get_summary("s1"), "")
+        self.assertEqual(len(self.store.load("s2", 100)[0]), 1)
+
+        self.store.clear()
+        self.assertEqual(self.store.load("s2", 100), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
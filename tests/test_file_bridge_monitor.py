@@ -0,0 +1,162 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import file_bridge_monitor
+from file_bridge_monitor import FileBridgeMonitor
+
+
+class _Monitor(FileBridgeMonitor):
+    """回复内容与耗时可控的 Monitor，记录处理顺序与并发数"""
+
+    def __init__(self, delays=None):
+        super().__init__()
+        self.delays = delays or {}
+        self.started = []
+        self.finished = []
+        self.active = 0
+        self.peak = 0
+
+    async def process_message_stream(self, entry):
+        self.started.append(entry["id"])
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(entry["id"], 0.01))
+            yield f"第一段 {entry['id']}\n\n"
+            yield f"第二段 {entry['id']}"
+        finally:
+            self.active -= 1
+            self.finished.append(entry["id"])
+
+
+class TestFileBridgeMonitor(unittest.IsolatedAsyncioTestCase):
+    """File Bridge Monitor 调度测试"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self._paths = (file_bridge_monitor.INBOX_PATH, file_bridge_monitor.OUTBOX_PATH)
+        file_bridge_monitor.INBOX_PATH = self.tmp / "inbox"
+        file_bridge_monitor.OUTBOX_PATH = self.tmp / "outbox"
+
+    def tearDown(self):
+        file_bridge_monitor.INBOX_PATH, file_bridge_monitor.OUTBOX_PATH = self._paths
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _send(self, monitor, msg_id, sender, stream=False):
+        monitor.inbox_log.append({"id": msg_id, "sender": sender, "message": f"消息 {msg_id}", "stream": stream})
+
+    async def _idle(self, monitor):
+        while monitor._session_tasks:
+            await asyncio.sleep(0.005)
+        await monitor._outbox_queue.join()
+
+    def _replies(self, monitor):
+        lines = monitor.outbox_file.read_text(encoding="utf-8").splitlines()
+        return [json.loads(line) for line in lines]
+
+    async def test_same_session_keeps_order(self):
+        """测试同一发送者的消息按到达顺序处理，其他发送者不被阻塞"""
+        monitor = _Monitor({"a1": 0.1, "a2": 0.01})
+        for msg_id, sender in (("a1", "alice"), ("a2", "alice"), ("b1", "bob")):
+            self._send(monitor, msg_id, sender)
+
+        await monitor.check_messages()
+        await self._idle(monitor)
+
+        self.assertLess(monitor.finished.index("a1"), monitor.started.index("a2"))
+        self.assertLess(monitor.finished.index("b1"), monitor.finished.index("a1"))
+        finals = [r["reply_to"] for r in self._replies(monitor) if not r.get("partial")]
+        self.assertEqual(sorted(finals), ["a1", "a2", "b1"])
+        self.assertLess(finals.index("a1"), finals.index("a2"))
+
+    async def test_new_message_starts_during_slow_one(self):
+        """测试慢消息处理期间到达的新消息立即开始，检查点不越过未完成的消息"""
+        monitor = _Monitor({"slow": 0.2})
+        self._send(monitor, "slow", "alice")
+        await monitor.check_messages()
+        await asyncio.sleep(0.02)
+
+        self._send(monitor, "fast", "bob")
+        await monitor.check_messages()
+        while "fast" not in monitor.finished:
+            await asyncio.sleep(0.005)
+
+        self.assertNotIn("slow", monitor.finished)
+        checkpoint = monitor.inbox_log.load_checkpoint(file_bridge_monitor.CHECKPOINT_CONSUMER)
+        self.assertEqual(checkpoint, monitor._unfinished["slow"])
+
+        await self._idle(monitor)
+        checkpoint = monitor.inbox_log.load_checkpoint(file_bridge_monitor.CHECKPOINT_CONSUMER)
+        self.assertEqual(checkpoint, monitor.position)
+
+    async def test_semaphore_limits_concurrency(self):
+        """测试不同会话并发处理，但同时处理数不超过信号量上限"""
+        monitor = _Monitor({f"m{i}": 0.03 for i in range(6)})
+        monitor._semaphore = asyncio.Semaphore(2)
+        for i in range(6):
+            self._send(monitor, f"m{i}", f"user{i}")
+
+        await monitor.check_messages()
+        await self._idle(monitor)
+
+        self.assertEqual(monitor.peak, 2)
+        self.assertEqual(len(monitor.finished), 6)
+
+    async def test_single_writer_keeps_lines_whole(self):
+        """测试并发的流式回复经唯一写入任务逐行追加，片段在最终回复之前"""
+        monitor = _Monitor()
+        for i in range(8):
+            self._send(monitor, f"m{i}", f"user{i}", stream=True)
+
+        await monitor.check_messages()
+        await self._idle(monitor)
+
+        replies = self._replies(monitor)
+        self.assertEqual(len(replies), 8 * 3)
+        for i in range(8):
+            mine = [r for r in replies if r["reply_to"] == f"m{i}"]
+            self.assertEqual([bool(r.get("partial")) for r in mine], [True, True, False])
+            self.assertEqual(mine[-1]["reply"], "".join(r["chunk"] for r in mine[:-1]))
+
+    async def test_failed_reply_holds_checkpoint(self):
+        """测试回复写入失败时检查点停在该消息之前，其他消息照常完成"""
+        monitor = _Monitor()
+        append = monitor._append_outbox
+
+        def failing_append(entry):
+            if entry["reply_to"] == "lost" and not entry.get("partial"):
+                raise OSError("disk full")
+            append(entry)
+
+        monitor._append_outbox = failing_append
+        self._send(monitor, "lost", "alice")
+        self._send(monitor, "ok", "bob")
+
+        await monitor.check_messages()
+        await self._idle(monitor)
+
+        finals = [r["reply_to"] for r in self._replies(monitor) if not r.get("partial")]
+        self.assertEqual(finals, ["ok"])
+        self.assertIn("lost", monitor._unfinished)
+        checkpoint = monitor.inbox_log.load_checkpoint(file_bridge_monitor.CHECKPOINT_CONSUMER)
+        self.assertEqual(checkpoint, monitor._unfinished["lost"])
+        self.assertNotEqual(checkpoint, monitor.position)
+
+    async def test_duplicate_message_handled_once(self):
+        """测试重复写入的消息只处理一次"""
+        monitor = _Monitor()
+        self._send(monitor, "m1", "alice")
+        self._send(monitor, "m1", "alice")
+
+        await monitor.check_messages()
+        await self._idle(monitor)
+
+        self.assertEqual(monitor.started, ["m1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
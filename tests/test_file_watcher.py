@@ -0,0 +1,59 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.file_watcher import FileWatcher, supports_inotify
+
+
+class TestFileWatcher(unittest.IsolatedAsyncioTestCase):
+    """文件变更监听测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def _assert_wakes_on_append(self, mode: str):
+        watcher = FileWatcher(self.directory, names=["replies.jsonl"], mode=mode)
+        try:
+            token = watcher.mark()
+            self.assertFalse(await watcher.wait(token, timeout=0.1))
+
+            # 无关文件的变化不唤醒
+            (self.directory / "other.txt").write_text("x")
+            self.assertFalse(await watcher.wait(token, timeout=0.2))
+
+            asyncio.get_running_loop().call_later(
+                0.05, lambda: (self.directory / "replies.jsonl").write_text("{}\n")
+            )
+            self.assertTrue(await watcher.wait(token, timeout=2))
+        finally:
+            watcher.close()
+
+    async def test_poll_mode(self):
+        """测试轮询模式检测到目标文件变化"""
+        await self._assert_wakes_on_append("poll")
+
+    async def test_inotify_mode(self):
+        """测试 inotify 模式检测到目标文件变化"""
+        if not supports_inotify(self.directory):
+            self.skipTest("inotify not available")
+        await self._assert_wakes_on_append("inotify")
+
+    async def test_change_before_wait_is_not_lost(self):
+        """测试 mark 之后、wait 之前发生的变化不会丢失"""
+        watcher = FileWatcher(self.directory, names=["replies.jsonl"], mode="poll", min_interval=0.01)
+        try:
+            token = watcher.mark()
+            (self.directory / "replies.jsonl").write_text("{}\n")
+            await asyncio.sleep(0.1)
+            self.assertTrue(await watcher.wait(token, timeout=0))
+        finally:
+            watcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from utils.framing import FrameError, encode_frame, read_frame
+
+
+def _read_all(data: bytes):
+    """把 data 作为连接上收到的全部字节，读出所有帧（末尾的 None 表示正常结束）"""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        frames = []
+        while True:
+            frame = await read_frame(reader)
+            frames.append(frame)
+            if frame is None:
+                return frames
+    return asyncio.run(run())
+
+
+class TestFraming(unittest.TestCase):
+    """长度前缀 JSON 帧测试"""
+
+    def test_round_trip(self):
+        """测试连续多帧按顺序解码，结束时返回 None"""
+        data = encode_frame({"id": 1, "message": "你好"}) + encode_frame({"id": 2, "done": True})
+        first, second, end = _read_all(data)
+        self.assertEqual(first, {"id": 1, "message": "你好"})
+        self.assertEqual(second, {"id": 2, "done": True})
+        self.assertIsNone(end)
+
+    def test_truncated_frame(self):
+        """测试帧写到一半连接关闭时报错"""
+        data = encode_frame({"id": 1, "reply": "hello"})
+        with self.assertRaises(FrameError):
+            _read_all(data[:-3])
+
+    def test_invalid_payload(self):
+        """测试长度超限与非对象内容"""
+        with self.assertRaises(FrameError):
+            _read_all(b"\xff\xff\xff\xff")
+        with self.assertRaises(FrameError):
+            _read_all(b"\x00\x00\x00\x02[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from utils.hedging import HedgeBudget, Hedger, hedged_call
+
+
+def _backend(delay, result, calls):
+    async def call():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        return result
+    return call
+
+
+class TestHedging(unittest.TestCase):
+    """对冲请求测试"""
+
+    def test_secondary_wins_when_primary_stalls(self):
+        """测试主请求超过对冲延迟时发出备用请求，先返回者胜出并取消另一方"""
+        calls = []
+
+        async def run():
+            outcome = await hedged_call(
+                _backend(1.0, "primary", calls), _backend(0.01, "secondary", calls), delay=0.02
+            )
+            await asyncio.sleep(0)  # 让被取消的一方完成退出
+            return outcome, asyncio.all_tasks()
+
+        outcome, leftover = asyncio.run(run())
+        self.assertEqual(outcome["result"], "secondary")
+        self.assertTrue(outcome["hedged"])
+        self.assertEqual(calls, ["primary", "secondary"])
+        self.assertEqual(len(leftover), 1)  # 只剩 run 自身
+
+    def test_fast_primary_not_hedged(self):
+        """测试主请求在对冲延迟内返回时不发备用请求"""
+        calls = []
+        outcome = asyncio.run(hedged_call(
+            _backend(0.0, "primary", calls), _backend(0.0, "secondary", calls), delay=0.5
+        ))
+        self.assertEqual(outcome["winner"], "primary")
+        self.assertEqual(calls, ["primary"])
+
+    def test_failed_result_does_not_win(self):
+        """测试先返回但失败的结果不会胜出"""
+        calls = []
+        outcome = asyncio.run(hedged_call(
+            _backend(0.05, "ok", calls), _backend(0.0, "[Error] down", calls), delay=0.0,
+            is_failure=lambda r: r.startswith("[Error]"),
+        ))
+        self.assertEqual(outcome["result"], "ok")
+
+    def test_budget_bounds_hedges(self):
+        """测试预算耗尽后不再对冲"""
+        budget = HedgeBudget(ratio=0.5, burst=1)
+        self.assertFalse(budget.try_spend())
+        budget.deposit()
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+    def test_hedger_waits_for_samples(self):
+        """测试样本不足时不对冲，之后按分位数对冲"""
+        hedger = Hedger(budget=HedgeBudget(ratio=1, burst=10), min_samples=3)
+        calls = []
+
+        async def run():
+            for _ in range(3):
+                await hedger.call(_backend(0.01, "p", calls), _backend(0.0, "s", calls))
+            self.assertEqual(hedger.stats["hedged"], 0)
+            return await hedger.call(_backend(0.5, "p", calls), _backend(0.0, "s", calls))
+
+        self.assertEqual(asyncio.run(run()), "s")
+        self.assertEqual(hedger.stats["hedged"], 1)
+        self.assertEqual(hedger.stats["secondary_wins"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
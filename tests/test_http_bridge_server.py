@@ -0,0 +1,139 @@
+import unittest
+
+import http_bridge_server as bridge
+from http_bridge_server import (
+    ChatRequest, ReplyBatchRequest, ReplyRequest, StatusBatchRequest,
+    _enqueue_message, _owner_of, get_messages, post_reply_batch,
+    update_message_status_batch, worker_heartbeat, worker_leave,
+)
+
+
+class _BridgeTestCase(unittest.IsolatedAsyncioTestCase):
+    """每个测试使用空的队列与 Worker 表"""
+
+    def setUp(self):
+        for state in (bridge.message_queue, bridge.reply_cache, bridge.workers):
+            state.clear()
+
+    def _send(self, sender, message="你好"):
+        return _enqueue_message(ChatRequest(message=message, sender=sender))
+
+    def _expire(self, worker_id):
+        bridge.workers[worker_id] -= bridge.WORKER_TTL + 1
+
+    def _message(self, msg_id):
+        return next(m for m in bridge.message_queue if m["id"] == msg_id)
+
+
+class TestBatchApi(_BridgeTestCase):
+    """批量领取、批量状态与批量回复接口测试"""
+
+    async def test_claim_with_limit(self):
+        """测试 claim 在同一请求内领取，limit 限制单次条数"""
+        ids = [self._send(f"user{i}") for i in range(3)]
+
+        data = await get_messages(claim=True, limit=2)
+
+        self.assertEqual([m["id"] for m in data["messages"]], ids[:2])
+        self.assertEqual([self._message(i)["status"] for i in ids], ["processing", "processing", "pending"])
+
+    async def test_status_batch_reports_missing(self):
+        """测试批量状态更新返回已更新与不存在的消息"""
+        msg_id = self._send("alice")
+
+        result = await update_message_status_batch(StatusBatchRequest(msg_ids=[msg_id, "nope"], status="processing"))
+
+        self.assertEqual(result["updated"], [msg_id])
+        self.assertEqual(result["missing"], ["nope"])
+
+    async def test_reply_batch_completes_messages(self):
+        """测试批量回复写入缓存并把消息标记为已完成"""
+        ids = [self._send("alice"), self._send("bob")]
+
+        await post_reply_batch(ReplyBatchRequest(replies=[ReplyRequest(msg_id=i, reply=f"回复 {i}") for i in ids]))
+
+        self.assertEqual(bridge.reply_cache, {i: f"回复 {i}" for i in ids})
+        self.assertTrue(all(self._message(i)["status"] == "completed" for i in ids))
+
+
+class TestWorkerSharding(_BridgeTestCase):
+    """按会话分配 Worker 与重新分配测试"""
+
+    def test_owner_moves_only_sessions_of_leaving_worker(self):
+        """测试 Worker 离开时只有它名下的会话换 Worker"""
+        sessions = [f"dm-{i}" for i in range(200)]
+        before = {s: _owner_of(s, ["w1", "w2", "w3"]) for s in sessions}
+        after = {s: _owner_of(s, ["w1", "w2"]) for s in sessions}
+
+        self.assertEqual(set(before.values()), {"w1", "w2", "w3"})
+        for session in sessions:
+            if before[session] != "w3":
+                self.assertEqual(after[session], before[session])
+        self.assertIsNone(_owner_of("dm-0", []))
+
+    async def test_workers_receive_disjoint_sessions(self):
+        """测试每个 Worker 只拿到归属于自己的会话，合起来覆盖全部消息"""
+        bridge.workers.update({"w1": 0.0, "w2": 0.0})
+        await worker_heartbeat("w1")
+        await worker_heartbeat("w2")
+        ids = {self._send(f"user{i}") for i in range(20)}
+
+        first = {m["id"] for m in (await get_messages(claim=True, worker_id="w1"))["messages"]}
+        second = {m["id"] for m in (await get_messages(claim=True, worker_id="w2"))["messages"]}
+
+        self.assertFalse(first & second)
+        self.assertEqual(first | second, ids)
+
+    async def test_heartbeat_keeps_busy_worker_online(self):
+        """测试 Worker 处理期间只发心跳不轮询，仍不会被判定离线，消息不被退回"""
+        msg_id = self._send("alice")
+        owner = _owner_of(self._message(msg_id)["session_key"], ["w1", "w2"])
+        other = "w2" if owner == "w1" else "w1"
+        await get_messages(worker_id=other)
+        await get_messages(claim=True, worker_id=owner)
+
+        self._expire(owner)
+        await worker_heartbeat(owner)
+        await get_messages(worker_id=other)
+
+        self.assertIn(owner, bridge.workers)
+        self.assertEqual(self._message(msg_id)["status"], "processing")
+        self.assertEqual(self._message(msg_id)["worker"], owner)
+
+    async def test_expired_worker_messages_requeued(self):
+        """测试超时无心跳的 Worker 被移除，其处理中的消息退回队列由其他 Worker 领取"""
+        msg_id = self._send("alice")
+        await get_messages(claim=True, worker_id="w1")
+
+        self._expire("w1")
+        data = await get_messages(claim=True, worker_id="w2")
+
+        self.assertNotIn("w1", bridge.workers)
+        self.assertEqual([m["id"] for m in data["messages"]], [msg_id])
+        self.assertEqual(self._message(msg_id)["worker"], "w2")
+
+    async def test_leave_requeues_immediately(self):
+        """测试 Worker 正常退出时立即退回其处理中的消息"""
+        msg_id = self._send("alice")
+        await get_messages(claim=True, worker_id="w1")
+
+        await worker_leave("w1")
+
+        self.assertEqual(self._message(msg_id)["status"], "pending")
+        self.assertIsNone(self._message(msg_id)["worker"])
+
+    async def test_session_busy_elsewhere_waits(self):
+        """测试会话仍在其他 Worker 上处理时，新消息暂不下发给新的归属 Worker"""
+        first = self._send("alice")
+        await get_messages(claim=True, worker_id="w1")
+        second = self._send("alice")
+
+        data = await get_messages(claim=True, worker_id="w2")
+
+        self.assertEqual(data["messages"], [])
+        self.assertEqual(self._message(first)["worker"], "w1")
+        self.assertEqual(self._message(second)["status"], "pending")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+
+from utils.http_pool import SessionPool
+
+
+class TestSessionPool(unittest.TestCase):
+    """共享 HTTP 会话池测试"""
+
+    def test_reuses_connections(self):
+        """测试同一事件循环内复用会话与连接，并计入统计"""
+        async def run():
+            app = web.Application()
+            app.router.add_get("/health", lambda request: web.json_response({"status": "ok"}))
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            base = f"http://127.0.0.1:{port}"
+
+            pool = SessionPool()
+            try:
+                for _ in range(5):
+                    session = pool.get(base)
+                    async with session.get(f"{base}/health") as resp:
+                        await resp.json()
+                same = pool.get(f"{base}/other") is pool.get(base)
+                snapshot = pool.snapshot()
+                await pool.close()
+                return same, snapshot, pool.snapshot()
+            finally:
+                await runner.cleanup()
+
+        same, snapshot, closed = asyncio.run(run())
+        self.assertTrue(same)
+        self.assertEqual(snapshot["sessions_created"], 1)
+        self.assertEqual(snapshot["requests"], 5)
+        self.assertEqual(snapshot["connections_created"], 1)
+        self.assertEqual(snapshot["connections_reused"], 4)
+        self.assertEqual(closed["open_sessions"], 0)
+
+    def test_new_loop_gets_new_session(self):
+        """测试事件循环更换后不会复用绑定在旧循环上的会话"""
+        pool = SessionPool()
+
+        async def first_run():
+            session = pool.get("http://127.0.0.1:9847")
+            await session.close()  # 只关闭会话，池中的条目留给下一次 get 清理
+            return session
+
+        async def second_run():
+            session = pool.get("http://127.0.0.1:9847")
+            entries = len(pool._sessions)
+            await pool.close()
+            return session, entries
+
+        first = asyncio.run(first_run())
+        second, entries = asyncio.run(second_run())
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats["sessions_created"], 2)
+        self.assertEqual(entries, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from utils.jsonl_segments import SegmentedLog
+
+
+class TestSegmentedLog(unittest.TestCase):
+    """分段 JSONL 日志测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _log(self, **kwargs):
+        kwargs.setdefault("max_bytes", 200)
+        kwargs.setdefault("max_age", 0)
+        return SegmentedLog(self.directory, "replies", **kwargs)
+
+    def test_reader_follows_rotation(self):
+        """测试读取位置跨越轮转后不丢不重"""
+        log = self._log()
+        cursor = log.start_cursor()
+        seen = []
+        for i in range(30):
+            log.append({"id": i, "text": "x" * 20})
+            if i % 7 == 0:
+                entries, cursor = log.read(cursor)
+                seen.extend(e["id"] for e in entries)
+        entries, cursor = log.read(cursor)
+        seen.extend(e["id"] for e in entries)
+
+        self.assertEqual(seen, list(range(30)))
+        self.assertGreater(len(log.segments()), 1)
+
+    def test_compaction_respects_slowest_consumer(self):
+        """测试只清理所有消费者都读过的分段，且保留最新封存段"""
+        log = self._log()
+        log.commit("slow", log.start_cursor())
+        for i in range(30):
+            log.append({"id": i, "text": "x" * 20})
+        before = log.segments()
+        self.assertEqual(log.compact(), 0)
+
+        _, end = log.read(log.start_cursor())
+        log.commit("slow", end)
+        log.compact()
+        self.assertEqual(log.segments(), before[-1:])
+
+    def test_retention_removes_segments_of_stale_consumers(self):
+        """测试消费者长期未更新时按保留期清理"""
+        log = self._log(retention=60)
+        log.commit("gone", log.start_cursor())
+        for i in range(30):
+            log.append({"id": i, "text": "x" * 20})
+        old = time.time() - 120
+        for path in self.directory.iterdir():
+            os.utime(path, (old, old))
+
+        log.compact()
+        self.assertEqual(len(log.segments()), 1)
+
+    def test_read_at_returns_indexed_line(self):
+        """测试按 read_lines 给出的位置读回单条记录"""
+        log = self._log()
+        cursor = log.start_cursor()
+        for i in range(30):
+            log.append({"reply_to": f"m{i}", "reply": "x" * 20})
+        lines, cursor = log.read_lines(cursor)
+
+        positions = {log.parse_line(raw)["reply_to"]: (seq, offset) for seq, offset, raw in lines}
+        self.assertEqual(log.read_at(*positions["m3"])["reply_to"], "m3")
+        self.assertEqual(log.read_at(*positions["m29"])["reply_to"], "m29")
+        self.assertEqual(log.read_lines(cursor), ([], cursor))
+
+    def test_read_at_compacted_segment_returns_none(self):
+        """测试所在分段已被清理时不会读到活动段同一偏移处的其他记录"""
+        log = self._log()
+        for i in range(30):
+            log.append({"reply_to": f"m{i}", "reply": "x" * 20})
+        lines, _ = log.read_lines(log.start_cursor())
+        seq, offset, _ = lines[0]
+        self.assertIn(seq, log.segments())
+
+        log.segment_path(seq).unlink()
+        self.assertIsNone(log.read_at(seq, offset))
+
+    def test_count_skips_partials_and_resumes(self):
+        """测试按条件统计跨越分段，写了一半的行留到下次增量统计"""
+        log = self._log()
+        for i in range(20):
+            log.append({"reply_to": str(i), "partial": i % 2 == 0})
+        with open(log.active_path, "ab") as f:
+            f.write(b'{"reply_to": "half"')
+
+        finals, cursor = log.count(where=lambda entry: not entry.get("partial"))
+        self.assertEqual(finals, 10)
+        self.assertGreater(len(log.segments()), 1)
+
+        with open(log.active_path, "ab") as f:
+            f.write(b'}\n')
+        log.append({"reply_to": "last"})
+        self.assertEqual(log.count(cursor), (2, log.end_cursor()))
+
+    def test_checkpoint_roundtrip(self):
+        """测试检查点原子写入后可读回"""
+        log = self._log()
+        self.assertIsNone(log.load_checkpoint("monitor"))
+        log.commit("monitor", (3, 128))
+        self.assertEqual(log.load_checkpoint("monitor"), (3, 128))
+        self.assertEqual([p.name for p in self.directory.iterdir()], ["replies.monitor.checkpoint.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()
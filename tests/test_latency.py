@@ -0,0 +1,40 @@
+import unittest
+
+from utils.latency import LatencyStats
+
+
+class TestLatencyStats(unittest.TestCase):
+    """延迟统计测试"""
+
+    def test_snapshot(self):
+        """测试累计值与分位数"""
+        stats = LatencyStats(window=100)
+        for ms in range(1, 101):
+            stats.record(ms / 1000)
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["count"], 100)
+        self.assertEqual(snapshot["avg_ms"], 50.5)
+        self.assertEqual(snapshot["p50_ms"], 51.0)
+        self.assertEqual(snapshot["p95_ms"], 95.0)
+        self.assertEqual(snapshot["max_ms"], 100.0)
+
+    def test_window_keeps_recent_samples(self):
+        """测试分位数只基于最近的样本，累计值覆盖全部"""
+        stats = LatencyStats(window=10)
+        for _ in range(50):
+            stats.record(1.0)
+        for _ in range(10):
+            stats.record(0.1)
+
+        self.assertEqual(stats.percentile(95), 0.1)
+        self.assertEqual(stats.count, 60)
+        self.assertEqual(stats.max, 1.0)
+
+    def test_empty(self):
+        """测试没有样本时返回空值"""
+        self.assertEqual(LatencyStats().snapshot()["p95_ms"], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from types import SimpleNamespace
+
+from core.openclaw_bridge import iter_sse_content
+
+
+def _response(*lines):
+    """按行产出 SSE 原始数据的响应替身"""
+    async def content():
+        for line in lines:
+            yield line.encode("utf-8")
+    return SimpleNamespace(content=content())
+
+
+class TestIterSseContent(unittest.IsolatedAsyncioTestCase):
+    """SSE 流解析测试"""
+
+    async def _collect(self, *lines):
+        return [chunk async for chunk in iter_sse_content(_response(*lines))]
+
+    async def test_complete_stream(self):
+        """测试收到 [DONE] 的流只产出内容片段"""
+        chunks = await self._collect('data: {"content": "你好"}\n', "\n", 'data: {"content": "！"}\n', "data: [DONE]\n")
+        self.assertEqual(chunks, ["你好", "！"])
+
+    async def test_error_event_ends_stream(self):
+        """测试错误事件以错误片段结束"""
+        chunks = await self._collect('data: {"content": "你好"}\n', 'data: {"error": "boom"}\n', 'data: {"content": "x"}\n')
+        self.assertEqual(chunks, ["你好", "[Error] boom"])
+
+    async def test_stream_cut_before_done(self):
+        """测试没有 [DONE] 就断开的流以错误片段收尾"""
+        chunks = await self._collect('data: {"content": "你好"}\n')
+        self.assertEqual(chunks[0], "你好")
+        self.assertTrue(chunks[-1].startswith("[Error]"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from utils.recent_ids import RecentIds
+
+
+class TestRecentIds(unittest.TestCase):
+    """有界时间窗口去重测试"""
+
+    def test_duplicate_within_window(self):
+        """测试窗口内重复的 ID 被识别"""
+        ids = RecentIds(ttl=60, max_size=10)
+        self.assertTrue(ids.add("a", now=100))
+        self.assertFalse(ids.add("a", now=110))
+
+    def test_expired_ids_are_forgotten(self):
+        """测试超过 ttl 的 ID 过期"""
+        ids = RecentIds(ttl=60, max_size=10)
+        ids.add("a", now=100)
+        ids.add("b", now=150)
+        self.assertTrue(ids.add("a", now=170))
+        self.assertEqual(len(ids), 2)
+
+    def test_size_is_bounded(self):
+        """测试超过容量时淘汰最旧的 ID"""
+        ids = RecentIds(ttl=0, max_size=3)
+        for key in "abcd":
+            ids.add(key)
+        self.assertEqual(len(ids), 3)
+        self.assertNotIn("a", ids)
+        self.assertIn("d", ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
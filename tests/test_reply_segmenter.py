@@ -0,0 +1,37 @@
+import unittest
+
+from utils.reply_segmenter import ReplySegmenter
+
+
+class TestReplySegmenter(unittest.TestCase):
+    """流式回复分段测试"""
+
+    def test_paragraph_sent_as_soon_as_complete(self):
+        """测试首段遇到段落边界立即切出，剩余内容在结束时输出"""
+        segmenter = ReplySegmenter(max_length=100)
+        self.assertEqual(segmenter.feed("第一段"), [])
+        self.assertEqual(segmenter.feed("内容。\n\n第二"), ["第一段内容。"])
+        self.assertEqual(segmenter.feed("段内容"), [])
+        self.assertEqual(segmenter.flush(), ["第二段内容"])
+
+    def test_buffered_paragraphs_are_merged(self):
+        """测试一次到达的多个短段落合并为一条，不超过长度上限"""
+        segmenter = ReplySegmenter(max_length=12)
+        segments = segmenter.feed("aaaa\n\nbbbb\n\ncccc\n\ndd")
+        self.assertEqual(segments, ["aaaa\n\nbbbb", "cccc"])
+        self.assertEqual(segmenter.flush(), ["dd"])
+
+    def test_long_text_cut_at_sentence_end(self):
+        """测试无段落边界的超长内容在句末切分，找不到句末时硬切"""
+        segmenter = ReplySegmenter(max_length=10)
+        segments = segmenter.feed("你好。今天天气很好，适合出门")
+        self.assertEqual(segments[0], "你好。")
+        self.assertTrue(all(len(s) <= 10 for s in segments))
+
+        rest = segments[1:] + segmenter.flush()
+        self.assertEqual("".join(rest), "今天天气很好，适合出门")
+        self.assertTrue(all(len(s) <= 10 for s in rest))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.reply_tailer import ReplyTailer
+
+
+class TestReplyTailer(unittest.IsolatedAsyncioTestCase):
+    """outbox 尾随读取测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.reply_file = Path(self.tmp.name) / "wechat_replies.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _append(self, text: str):
+        with open(self.reply_file, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    async def test_dispatches_only_new_lines_to_waiter(self):
+        """测试启动前的历史回复不会被分发，新回复按 reply_to 分发"""
+        self._append(json.dumps({"reply_to": "a", "reply": "old"}) + "\n")
+        tailer = ReplyTailer(self.reply_file)
+        tailer.start()
+        try:
+            queue = tailer.register("a")
+            self._append(json.dumps({"reply_to": "a", "chunk": "你好", "partial": True}) + "\n")
+            self._append(json.dumps({"reply_to": "b", "reply": "other"}) + "\n")
+            self._append(json.dumps({"reply_to": "a", "reply": "你好，世界"}) + "\n")
+
+            events = [await asyncio.wait_for(queue.get(), 1) for _ in range(2)]
+            self.assertEqual(events, [("chunk", "你好"), ("done", "你好，世界")])
+            self.assertEqual(tailer.stats["unmatched"], 1)
+        finally:
+            await tailer.stop()
+
+    async def test_incomplete_line_waits_for_newline(self):
+        """测试写了一半的行等换行写完后才解析"""
+        tailer = ReplyTailer(self.reply_file)
+        queue = tailer.register("a")
+        line = json.dumps({"reply_to": "a", "reply": "done"})
+
+        self._append(line[:10])
+        self.assertEqual(tailer.poll(), 0)
+        self._append(line[10:] + "\n")
+        self.assertEqual(tailer.poll(), 1)
+        self.assertEqual(queue.get_nowait(), ("done", "done"))
+
+
+if __name__ == '__main__':
+    unittest.main()
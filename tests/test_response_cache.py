@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from utils.response_cache import ResponseCache, cache_key, classify_query, is_side_effecting, normalize_query
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    """回复缓存测试"""
+
+    def test_normalize_and_classify(self):
+        """测试归一化后同一提问命中同一分类，时效性与指代性提问不缓存"""
+        self.assertEqual(normalize_query(" 你是谁？ "), normalize_query("你是谁"))
+        self.assertEqual(normalize_query("ＨＥＬＬＯ!! 😀"), "hello")
+
+        self.assertEqual(classify_query(normalize_query("你好呀~")), "greeting")
+        self.assertEqual(classify_query(normalize_query("Hello!")), "greeting")
+        self.assertEqual(classify_query(normalize_query("你是谁？")), "identity")
+        self.assertEqual(classify_query(normalize_query("Python 的装饰器是什么？")), "faq")
+        self.assertIsNone(classify_query(normalize_query("今天天气怎么样")))
+        self.assertIsNone(classify_query(normalize_query("那个为什么不行")))
+        self.assertIsNone(classify_query(normalize_query("帮我写一首诗")))
+
+    def test_side_effecting_bypass(self):
+        """测试会触发副作用工具的消息与命令被识别"""
+        self.assertTrue(is_side_effecting("提醒我明天开会"))
+        self.assertTrue(is_side_effecting("把这个文件发给张三"))
+        self.assertTrue(is_side_effecting("#重载配置"))
+        self.assertFalse(is_side_effecting("你是谁"))
+
+    def test_key_depends_on_role_and_version(self):
+        """测试缓存键区分角色级别与提示词版本"""
+        key = cache_key("你是谁", 1, "v1")
+        self.assertEqual(key, cache_key("你是谁", 1, "v1"))
+        self.assertNotEqual(key, cache_key("你是谁", 2, "v1"))
+        self.assertNotEqual(key, cache_key("你是谁", 1, "v2"))
+
+    def test_key_scoped_to_session(self):
+        """测试带会话键时只在同一会话内命中，不带会话键时跨会话共享"""
+        key = cache_key("python是什么", 1, "v1", "dm-a")
+        self.assertEqual(key, cache_key("python是什么", 1, "v1", "dm-a"))
+        self.assertNotEqual(key, cache_key("python是什么", 1, "v1", "dm-b"))
+        self.assertNotEqual(key, cache_key("python是什么", 1, "v1"))
+
+    def test_ttl_lru_and_persistence(self):
+        """测试过期失效、LRU 淘汰后从 SQLite 读回，以及重新打开后仍然命中"""
+        clock = _Clock()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            cache = ResponseCache(path, capacity=1, clock=clock)
+            cache.put("a", "greeting", "你好！", ttl=60)
+            cache.put("b", "faq", "答案", ttl=10)
+            cache.put("c", "faq", "不缓存", ttl=0)
+
+            self.assertEqual(cache.get("a"), "你好！")  # 已被 LRU 淘汰，从 SQLite 读回
+            self.assertIsNone(cache.get("c"))
+            clock.now += 30
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(cache.get("a"), "你好！")
+            self.assertEqual(cache.stats["hits"], 2)
+            cache.close()
+
+            reopened = ResponseCache(path, clock=clock)
+            self.assertEqual(reopened.get("a"), "你好！")
+            reopened.clear()
+            self.assertIsNone(reopened.get("a"))
+            reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
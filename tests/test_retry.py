@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+
+from utils.retry import RetryableError, RetryBudget, RetryPolicy
+
+
+def _flaky(failures, exc_factory, result="ok"):
+    """前 failures 次调用抛出异常，之后返回 result"""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise exc_factory()
+        return result
+    return call, calls
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """重试策略测试"""
+
+    def _policy(self, **kwargs):
+        kwargs.setdefault("base_delay", 0.001)
+        return RetryPolicy(rand=lambda low, high: high, **kwargs)
+
+    def test_sync_and_async_retry_until_success(self):
+        """测试同步与协程函数在可重试错误后重试成功"""
+        policy = self._policy(max_attempts=3)
+        call, calls = _flaky(2, ConnectionError)
+        self.assertEqual(policy.call(call), "ok")
+        self.assertEqual(len(calls), 3)
+
+        async_call, async_calls = _flaky(1, lambda: RetryableError("busy"))
+
+        @policy
+        async def run():
+            return async_call()
+
+        self.assertEqual(asyncio.run(run()), "ok")
+        self.assertEqual(len(async_calls), 2)
+
+    def test_non_retryable_and_exhausted(self):
+        """测试不可重试的错误立即抛出，重试次数耗尽后抛出最后一次错误"""
+        policy = self._policy(max_attempts=3)
+        call, calls = _flaky(5, lambda: ValueError("bad"))
+        with self.assertRaises(ValueError):
+            policy.call(call)
+        self.assertEqual(len(calls), 1)
+
+        call, calls = _flaky(5, ConnectionError)
+        with self.assertRaises(ConnectionError):
+            policy.call(call)
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_if_overrides_types(self):
+        """测试指定 retry_if 时按判断函数决定是否重试"""
+        policy = self._policy(max_attempts=3, retry_if=lambda e: type(e) is Exception)
+        call, calls = _flaky(2, lambda: Exception("窗口未就绪"))
+        self.assertEqual(policy.call(call), "ok")
+        self.assertEqual(len(calls), 3)
+
+        call, calls = _flaky(2, lambda: ValueError("bad"))
+        with self.assertRaises(ValueError):
+            policy.call(call)
+        self.assertEqual(len(calls), 1)
+
+    def test_exponential_backoff_and_retry_after(self):
+        """测试退避上限按指数增长并受 max_delay 限制，Retry-After 作为下限"""
+        policy = self._policy(base_delay=1.0, max_delay=5.0, max_attempts=10)
+        self.assertEqual([policy.backoff(n) for n in range(1, 5)], [1.0, 2.0, 4.0, 5.0])
+        self.assertEqual(policy._next_delay(1, RetryableError("busy", retry_after=3.0), None), 3.0)
+
+    def test_deadline_stops_retries(self):
+        """测试下一次等待会超过总时限时放弃"""
+        now = [0.0]
+        policy = RetryPolicy(max_attempts=5, base_delay=2.0, deadline=3.0, clock=lambda: now[0],
+                             rand=lambda low, high: high)
+        expires = policy._start(None)
+        self.assertEqual(policy._next_delay(1, ConnectionError(), expires), 2.0)
+        now[0] = 2.0
+        self.assertIsNone(policy._next_delay(2, ConnectionError(), expires))
+
+    def test_budget_limits_retries(self):
+        """测试共享预算耗尽后不再重试"""
+        budget = RetryBudget(ratio=0.0, burst=1)
+        policy = self._policy(max_attempts=5, budget=budget)
+        call, calls = _flaky(5, ConnectionError)
+        with self.assertRaises(ConnectionError):
+            policy.call(call)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(policy.stats["budget_denied"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
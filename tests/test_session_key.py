@@ -0,0 +1,30 @@
+import unittest
+
+from utils.session_key import derive_session_key, session_key_of
+
+
+class TestSessionKey(unittest.TestCase):
+    """会话键派生测试"""
+
+    def test_deterministic_per_sender_and_room(self):
+        """测试同一 (群, 发送者) 得到相同的键，不同会话与命名空间互不相同"""
+        key = derive_session_key("张三", namespace="ns")
+        self.assertEqual(key, derive_session_key("张三", namespace="ns"))
+        self.assertTrue(key.startswith("dm-"))
+        self.assertNotIn("张三", key)
+
+        in_room = derive_session_key("张三", "技术群", namespace="ns")
+        self.assertTrue(in_room.startswith("room-"))
+        self.assertNotEqual(in_room, key)
+        self.assertNotEqual(in_room, derive_session_key("李四", "技术群", namespace="ns"))
+        self.assertNotEqual(key, derive_session_key("张三", namespace="other"))
+
+    def test_session_key_of_entry(self):
+        """测试消息条目优先使用自带的会话键，缺失时按发送者区分"""
+        self.assertEqual(session_key_of({"sender": "a", "session_key": "dm-1"}), "dm-1")
+        self.assertEqual(session_key_of({"sender": "a", "context": {"session_key": "dm-2"}}), "dm-2")
+        self.assertEqual(session_key_of({"sender": "a"}), "sender:a")
+
+
+if __name__ == '__main__':
+    unittest.main()
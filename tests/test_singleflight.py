@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from utils.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """请求合并测试"""
+
+    async def test_concurrent_calls_share_one_execution(self):
+        """测试并发的相同请求只执行一次"""
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("weather", compute) for _ in range(5)))
+
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats, {"executed": 1, "shared": 4})
+        self.assertEqual(flight.inflight, 0)
+
+    async def test_different_keys_run_separately(self):
+        """测试不同请求互不合并"""
+        flight = SingleFlight()
+
+        async def compute(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: compute(1)),
+            flight.do("b", lambda: compute(2)),
+        )
+        self.assertEqual(results, [1, 2])
+        self.assertEqual(flight.stats["executed"], 2)
+
+    async def test_exception_propagates_to_all_waiters(self):
+        """测试异常会传递给所有等待方，且完成后不再缓存"""
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *(flight.do("k", fail) for _ in range(3)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+        async def succeed():
+            return "ok"
+
+        self.assertEqual(await flight.do("k", succeed), "ok")
+
+    async def test_stream_broadcasts_every_part(self):
+        """测试流式请求只执行一次，每个调用方（含后加入的）都收到全部片段"""
+        flight = SingleFlight()
+        runs = 0
+
+        async def produce():
+            nonlocal runs
+            runs += 1
+            for part in ("a", "b", "c"):
+                await asyncio.sleep(0.01)
+                yield part
+
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            return [part async for part in flight.stream("k", produce)]
+
+        results = await asyncio.gather(consume(0), consume(0), consume(0.015))
+        self.assertEqual(results, [["a", "b", "c"]] * 3)
+        self.assertEqual(runs, 1)
+        self.assertEqual(flight.stats, {"executed": 1, "shared": 2})
+        self.assertEqual(flight.inflight, 0)
+
+    async def test_stream_error_after_parts(self):
+        """测试流式计算出错时，调用方先收到已产出的片段再收到异常"""
+        flight = SingleFlight()
+
+        async def produce():
+            yield "a"
+            raise ValueError("boom")
+
+        received = []
+        with self.assertRaises(ValueError):
+            async for part in flight.stream("k", produce):
+                received.append(part)
+        self.assertEqual(received, ["a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
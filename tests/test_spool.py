@@ -0,0 +1,95 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from utils.file_watcher import FileWatcher
+from utils.spool import Spool, iter_spool_reply
+
+
+class TestSpool(unittest.IsolatedAsyncioTestCase):
+    """spool 目录模式测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_pending_lists_messages_in_write_order(self):
+        """测试待处理消息按写入顺序列出，不含片段和临时文件"""
+        spool = Spool(self.directory)
+        for i, msg_id in enumerate(["b", "a", "c"]):
+            spool.put(msg_id, {"message": msg_id})
+            os.utime(spool.path(msg_id), ns=(i * 10**9, i * 10**9))
+        spool.put_part("a", 1, {"chunk": "x"})
+        (self.directory / ".d.json.1.tmp").write_text("{")
+
+        self.assertEqual([msg_id for msg_id, _ in spool.pending()], ["b", "a", "c"])
+        self.assertEqual(spool.count(), 3)
+
+    async def test_iter_reply_yields_parts_then_final_and_cleans_up(self):
+        """测试按顺序产出片段和最终回复，取走后删除文件"""
+        spool = Spool(self.directory)
+        watcher = FileWatcher(self.directory, mode="poll", min_interval=0.01)
+
+        async def write_reply():
+            await asyncio.sleep(0.05)
+            spool.put_part("m1", 1, {"chunk": "你好，"})
+            spool.put_part("m1", 2, {"chunk": "世界"})
+            spool.put("m1", {"reply": "你好，世界"})
+
+        writer = asyncio.create_task(write_reply())
+        try:
+            events = [event async for event in iter_spool_reply(spool, watcher, "m1", timeout=2)]
+        finally:
+            watcher.close()
+            await writer
+
+        self.assertEqual(events, [("chunk", "你好，"), ("chunk", "世界"), ("done", "你好，世界")])
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    async def test_purge_removes_stale_files(self):
+        """测试清理超过保留期的遗留文件"""
+        spool = Spool(self.directory)
+        spool.put("old", {"reply": "x"})
+        spool.put("new", {"reply": "y"})
+        old = time.time() - 120
+        os.utime(spool.path("old"), (old, old))
+
+        self.assertEqual(spool.purge(max_age=60), 1)
+        self.assertFalse(spool.exists("old"))
+        self.assertTrue(spool.exists("new"))
+
+    async def test_ignores_checkpoint_files(self):
+        """测试同目录下的检查点文件既不当作消息列出，也不会被清理"""
+        spool = Spool(self.directory)
+        spool.put("m1", {"message": "hi"})
+        checkpoints = [
+            self.directory / "wechat_messages.monitor.checkpoint.json",
+            self.directory / "wechat_replies.connector.checkpoint.json",
+        ]
+        old = time.time() - 120
+        for path in checkpoints:
+            path.write_text('{"segment": 1, "offset": 0}')
+            os.utime(path, (old, old))
+
+        self.assertEqual([msg_id for msg_id, _ in spool.pending()], ["m1"])
+        self.assertEqual(spool.count(), 1)
+        self.assertEqual(spool.purge(max_age=60), 0)
+        self.assertTrue(all(path.exists() for path in checkpoints))
+
+    async def test_dotted_id_stays_a_message_file(self):
+        """测试 ID 中的点被替换，不会与其他格式的文件名混淆"""
+        spool = Spool(self.directory)
+        spool.put("a.checkpoint", {"message": "hi"})
+
+        self.assertEqual([msg_id for msg_id, _ in spool.pending()], ["a_checkpoint"])
+        self.assertEqual(spool.get("a.checkpoint"), {"message": "hi"})
+
+
+if __name__ == '__main__':
+    unittest.main()
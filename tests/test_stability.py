@@ -0,0 +1,39 @@
+import unittest
+
+from utils.stability import UI_RETRYABLE, isTransientUiError, retryOnFailure
+
+
+class TestUiRetry(unittest.TestCase):
+    """微信 UI 操作重试范围测试"""
+
+    def test_transient_ui_errors(self):
+        """测试 COM/控件查找/窗口句柄错误与 wxauto 的裸 Exception 视为瞬时错误，代码缺陷不重试"""
+        for error in (LookupError("控件查找超时"), OSError("句柄无效"), Exception("未找到微信窗口")):
+            self.assertTrue(isTransientUiError(error), error)
+        for error in (TypeError("x"), ValueError("x"), AttributeError("x"), KeyError("x"), IndexError("x")):
+            self.assertFalse(isTransientUiError(error), error)
+        self.assertTrue(isTransientUiError(TimeoutError("COM 超时")))
+        self.assertIn(OSError, UI_RETRYABLE)
+
+    def test_decorator_retries_generic_failure_only(self):
+        """测试装饰器重试 wxauto 抛出的裸 Exception，参数错误立即抛出"""
+        calls = []
+
+        @retryOnFailure(maxRetries=3, delay=0.001, retryIf=isTransientUiError)
+        def send(error):
+            calls.append(1)
+            if len(calls) < 3:
+                raise error
+            return "sent"
+
+        self.assertEqual(send(Exception("发送失败")), "sent")
+        self.assertEqual(len(calls), 3)
+
+        calls.clear()
+        with self.assertRaises(TypeError):
+            send(TypeError("bad argument"))
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from utils.token_window import MESSAGE_OVERHEAD, TokenWindow, Turn, estimate_tokens, truncate_tokens
+
+
+def _turn(seq, role, tokens):
+    return Turn(seq, role, "x" * tokens, tokens)
+
+
+class TestTokenWindow(unittest.TestCase):
+    """Token 预算窗口测试"""
+
+    def test_estimate_and_truncate(self):
+        """测试中文按字计数、其余按 4 字符计数，截断保留末尾"""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("你好"), 2)
+        self.assertEqual(estimate_tokens("hello world"), 3)
+        self.assertEqual(estimate_tokens("你好abcd"), 3)
+
+        text = "一二三四五六七八九十"
+        self.assertEqual(truncate_tokens(text, 3), "八九十")
+        self.assertEqual(truncate_tokens(text, 20), text)
+
+    def test_evicts_oldest_over_budget(self):
+        """测试超出预算时从最旧的一端淘汰，窗口不以 AI 回复开头"""
+        window = TokenWindow(budget=3 * (10 + MESSAGE_OVERHEAD))
+        self.assertEqual(window.append(_turn(1, "user", 10)), [])
+        self.assertEqual(window.append(_turn(2, "ai", 10)), [])
+        self.assertEqual(window.append(_turn(3, "user", 10)), [])
+
+        evicted = window.append(_turn(4, "ai", 10))
+        # 淘汰第 1 条后窗口会以 AI 回复开头，因此第 2 条一并淘汰
+        self.assertEqual([t.seq for t in evicted], [1, 2])
+        self.assertEqual([t.seq for t in window], [3, 4])
+        self.assertEqual(window.tokens, 2 * (10 + MESSAGE_OVERHEAD))
+
+    def test_keeps_latest_turn_even_if_oversized(self):
+        """测试单条消息超出预算时仍保留最新一条"""
+        window = TokenWindow(budget=20, turns=[_turn(1, "user", 5)])
+        evicted = window.append(_turn(2, "ai", 100))
+        self.assertEqual([t.seq for t in evicted], [1])
+        self.assertEqual([t.seq for t in window], [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
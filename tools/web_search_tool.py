@@ -16,7 +16,7 @@ async def _perform_tavily_search(query: str) -> str:
     [Internal] 执行 Tavily 搜索的具体实现
     """
     try:
-        import aiohttp
+        from utils.http_pool import get_session
         api_url = "https://api.tavily.com/search"
         payload = {
             "api_key": conf.tavily_api_key,
@@ -25,20 +25,20 @@ async def _perform_tavily_search(query: str) -> str:
             "max_results": 5
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=payload) as response:
-                if response.status != 200:
-                    return f"❌ Tavily API 错误: HTTP {response.status}"
+        session = get_session(api_url)
+        async with session.post(api_url, json=payload) as response:
+            if response.status != 200:
+                return f"❌ Tavily API 错误: HTTP {response.status}"
                 
-                data = await response.json()
-                results = []
-                for i, item in enumerate(data.get("results", []), 1):
-                    title = item.get("title", "无标题")
-                    url = item.get("url", "")
-                    content = item.get("content", "")[:300]
-                    results.append(f"[{i}] {title}\n    链接: {url}\n    摘要: {content}")
+            data = await response.json()
+            results = []
+            for i, item in enumerate(data.get("results", []), 1):
+                title = item.get("title", "无标题")
+                url = item.get("url", "")
+                content = item.get("content", "")[:300]
+                results.append(f"[{i}] {title}\n    链接: {url}\n    摘要: {content}")
 
-                return "\n\n".join(results) if results else "API 未找到相关搜索结果。"
+            return "\n\n".join(results) if results else "API 未找到相关搜索结果。"
     except Exception as e:
         logger.warning(f"Tavily 异步搜索异常: {e}")
         from tools.tools_common import format_error_payload
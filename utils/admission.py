@@ -0,0 +1,127 @@
+"""
+准入控制 (Admission Control)
+
+限制 Bridge 同时处理的请求数和排队长度，
+超出上限时快速拒绝并给出 Retry-After，而不是让请求堆积到超时。
+"""
+import asyncio
+from typing import Callable, Optional
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝"""
+
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def headers(self) -> dict:
+        """HTTP 响应头（Retry-After 取整秒，至少 1 秒）"""
+        return {"Retry-After": str(max(1, int(round(self.retry_after))))}
+
+
+class AdmissionController:
+    """
+    并发准入控制器
+
+    - 正在处理的请求数达到 max_inflight 时，新请求进入等待队列
+    - 等待队列达到 max_queue 时直接拒绝 (429)
+    - 排队超过 queue_timeout 仍未获得处理槽位时拒绝 (503)
+
+    max_inflight 为 0 表示不限制。
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = 0,
+        max_queue: int = 0,
+        queue_timeout: float = 5.0,
+        retry_after: float = 2.0,
+    ):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore: Optional[asyncio.Semaphore] = (
+            asyncio.Semaphore(max_inflight) if max_inflight > 0 else None
+        )
+        self.inflight = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    async def acquire(self) -> None:
+        """
+        申请处理槽位
+
+        @raises AdmissionRejected 队列已满或排队超时
+        """
+        if self._semaphore is not None:
+            if self._semaphore.locked():
+                if self.waiting >= self.max_queue:
+                    self.stats["rejected_queue_full"] += 1
+                    raise AdmissionRejected(
+                        429, self.retry_after,
+                        f"Too many requests: {self.inflight} in flight, {self.waiting} queued"
+                    )
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self.stats["rejected_timeout"] += 1
+                    raise AdmissionRejected(
+                        503, self.retry_after,
+                        f"Server overloaded: no slot within {self.queue_timeout}s"
+                    )
+                finally:
+                    self.waiting -= 1
+            else:
+                await self._semaphore.acquire()
+
+        self.inflight += 1
+        self.stats["admitted"] += 1
+
+    def release(self) -> None:
+        """释放处理槽位"""
+        self.inflight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def hold(self) -> Callable[[], None]:
+        """
+        申请处理槽位，返回只生效一次的释放函数
+
+        供流式响应使用：响应结束、生成器结束、客户端在生成器启动前断开等
+        多条清理路径都可以调用，槽位只释放一次。
+
+        @raises AdmissionRejected 队列已满或排队超时
+        """
+        await self.acquire()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.release()
+
+        return release
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def snapshot(self) -> dict:
+        """当前负载状态（供 /health 展示）"""
+        return {
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            **self.stats,
+        }
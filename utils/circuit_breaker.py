@@ -0,0 +1,142 @@
+"""
+熔断器 (Circuit Breaker)
+
+下游连续失败达到阈值后“断开”，在冷却期内直接拒绝请求，
+不再让每条消息都等满超时；冷却期过后放行少量试探请求（半开），
+试探成功则恢复，失败则重新断开。
+
+试探请求被取消、或结果不计入成败（如下游过载）时须调用 release() 归还名额；
+迟迟没有结果的试探在 trial_timeout 后视为丢失，重新放行，半开状态不会一直卡住。
+
+    closed ──连续失败 N 次──▶ open ──冷却期结束──▶ half_open
+      ▲                                             │
+      └──────────── 试探成功 ◀──────────────────────┤
+                     试探失败 ──▶ open ◀────────────┘
+"""
+import time
+from typing import Callable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    三态熔断器
+
+    调用方在请求前调用 allow()，请求结束后调用 record_success() / record_failure()。
+    后台健康探测的结果同样可以喂给熔断器。
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        half_open_max: int = 1,
+        clock: Optional[Callable[[], float]] = None,
+        trial_timeout: Optional[float] = None,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_max = max(1, half_open_max)
+        # 试探请求多久没有结果视为丢失（默认与冷却期相同）
+        self.trial_timeout = reset_timeout if trial_timeout is None else trial_timeout
+        self._clock = clock or time.monotonic
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_at = 0.0
+        self.stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        """当前状态（冷却期已过的 open 视为 half_open）"""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        elif (
+            self._state == HALF_OPEN
+            and self._trials >= self.half_open_max
+            and self._clock() - self._trial_at >= self.trial_timeout
+        ):
+            # 试探请求没有记录结果（被取消或结果被忽略），重新放行
+            self._trials = 0
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """距离允许试探还有多少秒（非 open 状态为 0）"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        """是否放行一次请求（半开状态下只放行有限次试探）"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._trials < self.half_open_max:
+            self._trials += 1
+            self._trial_at = self._clock()
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        """请求或探测成功：清零失败计数并闭合"""
+        self._failures = 0
+        self._state = CLOSED
+
+    def release(self) -> None:
+        """归还一次试探名额：请求被取消，或结果既不算成功也不算失败时调用"""
+        if self._state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record_probe_success(self) -> None:
+        """
+        后台探测成功
+
+        open / half_open 时重新进入半开并放行试探（包括卡住的试探名额）；
+        closed 时清零失败计数，偶发失败不会跨越下游已恢复的时段累计到阈值。
+        """
+        if self._state == CLOSED:
+            self._failures = 0
+        else:
+            self._state = HALF_OPEN
+            self._trials = 0
+
+    def half_open(self) -> None:
+        """
+        提前结束冷却，进入半开状态（后台探测发现下游已恢复时调用）
+
+        不直接闭合：探测通过不代表请求一定成功，仍由试探请求决定是否恢复。
+        """
+        if self._state == OPEN:
+            self._state = HALF_OPEN
+            self._trials = 0
+
+    def record_failure(self) -> None:
+        """请求或探测失败：半开状态立即断开，闭合状态累计到阈值后断开"""
+        state = self.state
+        self._failures += 1
+        if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+            self._trip()
+        elif state == OPEN:
+            self._opened_at = self._clock()
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._trials = 0
+        self.stats["opened"] += 1
+
+    def snapshot(self) -> dict:
+        """当前状态（供健康检查 / 日志展示）"""
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "retry_after": round(self.retry_after, 1),
+            **self.stats,
+        }
@@ -0,0 +1,113 @@
+"""
+对话记忆持久化 (Conversation Store)
+
+SQLite 保存每个会话尚未折叠进摘要的消息与滚动摘要，重启后记忆不丢失：
+
+- memory_turns：逐条追加，折叠进摘要后删除，表的大小与活跃会话数成正比
+- memory_summaries：每个会话一行滚动摘要
+- 一个连接 + 锁，供处理线程与调度器线程共用；WAL 模式下读写互不阻塞
+"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from utils.token_window import MESSAGE_OVERHEAD, Turn
+
+
+class ConversationStore:
+    """会话消息与摘要的 SQLite 存储"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        path = Path(db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS memory_turns (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memory_turns_session ON memory_turns (session_id, seq)"
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS memory_summaries (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )"""
+            )
+
+    def append(self, session_id: str, role: str, content: str, tokens: int) -> Turn:
+        """追加一条消息，返回带序号的 Turn"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO memory_turns (session_id, role, content, tokens) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, tokens),
+            )
+        return Turn(cursor.lastrowid, role, content, tokens)
+
+    def load(self, session_id: str, budget: int) -> Tuple[List[Turn], List[Turn]]:
+        """
+        读取会话消息
+
+        @returns (预算内最近的消息, 更早的消息)，均按时间顺序；
+                 更早的消息是上次退出前还没来得及折叠进摘要的部分
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content, tokens FROM memory_turns WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        turns = [Turn(*row) for row in rows]
+        total = 0
+        split = len(turns)
+        while split > 0 and (split == len(turns) or total + turns[split - 1].tokens + MESSAGE_OVERHEAD <= budget):
+            total += turns[split - 1].tokens + MESSAGE_OVERHEAD
+            split -= 1
+        # 与 TokenWindow 一致：窗口不以 AI 回复开头
+        while split < len(turns) - 1 and turns[split].role != "user":
+            split += 1
+        return turns[split:], turns[:split]
+
+    def delete_through(self, session_id: str, seq: int) -> None:
+        """删除序号不大于 seq 的消息（已折叠进摘要）"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memory_turns WHERE session_id = ? AND seq <= ?", (session_id, seq))
+
+    def get_summary(self, session_id: str) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM memory_summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else ""
+
+    def set_summary(self, session_id: str, summary: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO memory_summaries (session_id, summary, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, updated_at = CURRENT_TIMESTAMP",
+                (session_id, summary),
+            )
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """清除指定会话（不指定则清除全部）的消息与摘要"""
+        with self._lock, self._conn:
+            if session_id is None:
+                self._conn.execute("DELETE FROM memory_turns")
+                self._conn.execute("DELETE FROM memory_summaries")
+            else:
+                self._conn.execute("DELETE FROM memory_turns WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM memory_summaries WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
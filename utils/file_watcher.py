@@ -0,0 +1,272 @@
+"""
+文件变更监听 (File Watcher)
+
+文件桥接的 inbox/outbox 默认靠定时轮询发现新内容。
+Linux 上改用 inotify 由内核通知目录变更，只在文件真正变化时唤醒；
+在不支持 inotify 事件的文件系统上（WSL 的 drvfs/9p、网络盘等）
+自动回退为自适应轮询：有变化时高频检查，空闲时逐步退避。
+
+用法:
+    watcher = FileWatcher(inbox_dir, names=["wechat_messages.jsonl"])
+    while True:
+        token = watcher.mark()
+        check_messages()
+        await watcher.wait(token, timeout=1.0)
+
+OPENCLAW_WATCH_MODE 可强制指定模式：auto（默认）/ inotify / poll。
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import re
+import struct
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+WATCH_MODE = os.getenv("OPENCLAW_WATCH_MODE", "auto").lower()
+
+# 不投递（或不可靠投递）inotify 事件的文件系统
+_NO_EVENT_FS_TYPES = {"9p", "drvfs", "cifs", "smb3", "smbfs", "nfs", "nfs4", "vboxsf", "fuse"}
+
+# inotify 常量（见 <sys/inotify.h>）
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+
+def _load_libc():
+    """加载带 inotify 的 libc，不可用时返回 None"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                libc.inotify_init1
+                libc.inotify_add_watch
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc or None
+
+
+def filesystem_type(path: Path) -> Optional[str]:
+    """
+    查询路径所在挂载点的文件系统类型（读取 /proc/mounts）
+
+    @returns 文件系统类型，无法判断时返回 None
+    """
+    try:
+        target = str(Path(path).resolve())
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return None
+
+    best, best_type = "", None
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        # 挂载点中的空格等字符以八进制转义
+        mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1])
+        if target == mount_point or target.startswith(mount_point.rstrip("/") + "/"):
+            if len(mount_point) >= len(best):
+                best, best_type = mount_point, fields[2]
+    return best_type
+
+
+def supports_inotify(path: Path) -> bool:
+    """路径所在文件系统能否可靠地投递 inotify 事件"""
+    if _load_libc() is None:
+        return False
+    fs_type = filesystem_type(path)
+    if fs_type is None:
+        return True
+    return fs_type not in _NO_EVENT_FS_TYPES and not fs_type.startswith("fuse")
+
+
+class FileWatcher:
+    """
+    目录变更监听器
+
+    - 监听 directory 下 names 中的文件（names 为空则监听整个目录）
+    - 每次检测到变化时版本号加一；wait(token) 在版本号不同于 token 时返回，
+      多个协程可以同时等待同一个监听器而不会互相“吃掉”通知
+    - 事件源在首次 mark()/wait() 时挂到当前事件循环，事件循环更换后自动重新挂载
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        names: Optional[Iterable[str]] = None,
+        mode: Optional[str] = None,
+        min_interval: float = 0.05,
+        max_interval: float = 1.0,
+    ):
+        self.directory = Path(directory)
+        self.names = set(names) if names else None
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+
+        mode = (mode or WATCH_MODE).lower()
+        if mode == "auto":
+            mode = "inotify" if supports_inotify(self.directory) else "poll"
+        elif mode == "inotify" and _load_libc() is None:
+            mode = "poll"
+        self.mode = mode
+
+        self.version = 0
+        self._fd: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._poll_task: Optional[asyncio.Task] = None
+
+    # ---- 公共接口 ----
+
+    def mark(self) -> int:
+        """
+        启动监听（如尚未启动）并返回当前版本号
+
+        须在检查文件之前调用，检查期间发生的变化会让随后的 wait 立即返回。
+        """
+        self._ensure_started()
+        return self.version
+
+    async def wait(self, token: int, timeout: Optional[float] = None) -> bool:
+        """
+        等待文件变化
+
+        @param token mark() 返回的版本号
+        @param timeout 最长等待秒数，None 表示一直等
+        @returns 是否检测到变化（超时返回 False）
+        """
+        self._ensure_started()
+        if self.version != token:
+            return True
+        event = self._event
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version != token
+
+    def close(self) -> None:
+        """释放 inotify 句柄与轮询任务"""
+        self._detach()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # ---- 内部实现 ----
+
+    def _notify(self) -> None:
+        self.version += 1
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._detach()
+        self._loop = loop
+        self._event = asyncio.Event()
+
+        if self.mode == "inotify":
+            try:
+                if self._fd is None:
+                    self._fd = self._open_inotify()
+                loop.add_reader(self._fd, self._on_inotify)
+                return
+            except OSError:
+                # 目录无法监听（不存在、句柄数耗尽等），回退轮询
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self.mode = "poll"
+
+        # 基准快照在 mark() 时同步获取，之后的任何变化都会被发现
+        self._poll_task = loop.create_task(self._poll_loop(self._signature()))
+
+    def _detach(self) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            if self._fd is not None:
+                self._loop.remove_reader(self._fd)
+            if self._poll_task is not None:
+                self._poll_task.cancel()
+        self._poll_task = None
+        self._loop = None
+
+    def _open_inotify(self) -> int:
+        libc = _load_libc()
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"inotify_add_watch failed: {self.directory}")
+        return fd
+
+    def _on_inotify(self) -> None:
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+                offset += length
+                if mask & _IN_Q_OVERFLOW or self.names is None or name in self.names:
+                    changed = True
+        if changed:
+            self._notify()
+
+    def _signature(self):
+        """轮询模式下用于比较的文件状态快照"""
+        def stat_of(path):
+            try:
+                st = os.stat(path)
+                return st.st_ino, st.st_size, st.st_mtime_ns
+            except FileNotFoundError:
+                return None
+
+        if self.names is not None:
+            return tuple(stat_of(self.directory / name) for name in sorted(self.names))
+        try:
+            with os.scandir(self.directory) as entries:
+                names = [entry.name for entry in entries]
+        except FileNotFoundError:
+            return None
+        return frozenset((name, stat_of(self.directory / name)) for name in names)
+
+    async def _poll_loop(self, signature) -> None:
+        interval = self.min_interval
+        while True:
+            await asyncio.sleep(interval)
+            current = self._signature()
+            if current != signature:
+                signature = current
+                interval = self.min_interval
+                self._notify()
+            else:
+                interval = min(interval * 2, self.max_interval)
@@ -0,0 +1,57 @@
+"""
+长度前缀 JSON 帧 (Length-Prefixed JSON Frames)
+
+Unix 域套接字连接上的消息格式：4 字节大端无符号长度 + UTF-8 JSON。
+客户端与 Bridge 共用，同一连接上可以交错传输多个请求的帧，
+以帧内的 "id" 字段区分。
+"""
+import asyncio
+import json
+import struct
+from typing import Any, Dict, Optional
+
+_HEADER = struct.Struct(">I")
+
+# 单帧上限，防止对端发送异常长度导致内存暴涨
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FrameError(Exception):
+    """帧格式错误"""
+
+
+def encode_frame(payload: Dict[str, Any]) -> bytes:
+    """编码一帧"""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if len(body) > MAX_FRAME_SIZE:
+        raise FrameError(f"Frame too large: {len(body)} bytes")
+    return _HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """
+    读取一帧
+
+    @returns 解码后的对象；对端正常关闭连接时返回 None
+    @raises FrameError 长度超限或内容不是 JSON 对象
+    """
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise FrameError("Connection closed mid-header")
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"Frame too large: {length} bytes")
+    try:
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise FrameError("Connection closed mid-frame")
+    try:
+        payload = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise FrameError(f"Invalid frame: {e}")
+    if not isinstance(payload, dict):
+        raise FrameError("Frame is not a JSON object")
+    return payload
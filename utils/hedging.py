@@ -0,0 +1,161 @@
+"""
+对冲请求 (Request Hedging)
+
+单个后端偶尔卡顿会拖长尾延迟。对冲的做法：主请求超过其观测到的 p95
+仍未返回时，把同一请求再发给备用后端，先成功返回的一方胜出，另一方取消。
+
+- 对冲延迟取主后端最近成功请求的分位数（默认 p95），样本不足时不对冲
+- 对冲预算是令牌桶：每个主请求积累 ratio 个令牌，每次对冲消耗 1 个，
+  因此额外负载最多约为 ratio（另有 burst 上限防止空闲后突发）
+- 只适合幂等或可容忍重复执行的请求，默认关闭，由调用方显式启用
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.latency import LatencyStats
+
+# 对冲预算：每个主请求允许的额外请求比例
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+# 对冲预算令牌上限
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "5"))
+# 触发对冲的延迟分位数
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# 至少积累多少个成功样本后才开始对冲
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+
+class HedgeBudget:
+    """对冲令牌桶"""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+
+    def deposit(self) -> None:
+        """每个主请求调用一次"""
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """尝试消耗一次对冲额度"""
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+async def hedged_call(
+    primary: Callable[[], Awaitable[Any]],
+    secondary: Callable[[], Awaitable[Any]],
+    delay: Optional[float],
+    budget: Optional[HedgeBudget] = None,
+    is_failure: Optional[Callable[[Any], bool]] = None,
+) -> Dict[str, Any]:
+    """
+    执行一次可能被对冲的请求
+
+    @param primary 主请求的协程工厂
+    @param secondary 备用请求的协程工厂
+    @param delay 主请求超过多少秒未返回时发出备用请求，None 表示不对冲
+    @param budget 对冲预算，None 表示不限
+    @param is_failure 判断返回值是否为失败（失败的结果不会胜出，除非双方都失败）
+    @returns {"result", "winner": "primary"|"secondary", "hedged": bool, "denied": bool}
+             双方都失败时返回主请求的结果（主请求抛出异常则重新抛出）
+    """
+    def failed(task: asyncio.Task) -> bool:
+        if task.cancelled() or task.exception() is not None:
+            return True
+        return bool(is_failure and is_failure(task.result()))
+
+    primary_task = asyncio.ensure_future(primary())
+    tasks = {primary_task: "primary"}
+    outcome = {"hedged": False, "denied": False}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait({primary_task}, timeout=max(0.0, delay))
+            if not done:
+                if budget is None or budget.try_spend():
+                    tasks[asyncio.ensure_future(secondary())] = "secondary"
+                    outcome["hedged"] = True
+                else:
+                    outcome["denied"] = True
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # 同时完成时主请求优先
+            for task in sorted(done, key=lambda t: tasks[t] != "primary"):
+                if not failed(task):
+                    return {"result": task.result(), "winner": tasks[task], **outcome}
+
+        return {"result": primary_task.result(), "winner": "primary", **outcome}
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class Hedger:
+    """
+    某个主后端的对冲器：记录主后端成功延迟、维护预算并统计效果
+    """
+
+    def __init__(
+        self,
+        budget: Optional[HedgeBudget] = None,
+        percentile: float = HEDGE_PERCENTILE,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = 200,
+    ):
+        self.budget = budget or HedgeBudget()
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latency = LatencyStats(window=window)
+        self.stats = {"calls": 0, "hedged": 0, "secondary_wins": 0, "budget_denied": 0}
+
+    def delay(self) -> Optional[float]:
+        """当前的对冲延迟，样本不足时返回 None"""
+        if self.latency.count < self.min_samples:
+            return None
+        return self.latency.percentile(self.percentile)
+
+    async def call(
+        self,
+        primary: Callable[[], Awaitable[Any]],
+        secondary: Callable[[], Awaitable[Any]],
+        is_failure: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """执行请求，主请求慢于 p95 时对冲到备用后端"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.budget.deposit()
+        self.stats["calls"] += 1
+
+        async def timed_primary():
+            try:
+                result = await primary()
+            except asyncio.CancelledError:
+                # 被对冲请求抢先：真实延迟至少是已等待的时间，照样计入，避免 p95 被低估
+                self.latency.record(loop.time() - started)
+                raise
+            if not (is_failure and is_failure(result)):
+                self.latency.record(loop.time() - started)
+            return result
+
+        outcome = await hedged_call(timed_primary, secondary, self.delay(), self.budget, is_failure)
+        if outcome["hedged"]:
+            self.stats["hedged"] += 1
+        if outcome["denied"]:
+            self.stats["budget_denied"] += 1
+        if outcome["winner"] == "secondary":
+            self.stats["secondary_wins"] += 1
+        return outcome["result"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        delay = self.delay()
+        return {
+            **self.stats,
+            "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "tokens": round(self.budget.tokens, 2),
+        }
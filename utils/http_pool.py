@@ -0,0 +1,130 @@
+"""
+共享 HTTP 会话池 (HTTP Session Pool)
+
+各连接器原先每次请求都新建 aiohttp.ClientSession，每条消息都要重新建立
+TCP（以及 TLS）连接。这里按 (事件循环, 目标源) 缓存会话：
+
+- 同一事件循环内，发往同一 scheme://host:port 的请求复用同一个会话与连接池
+- 连接池限制总连接数与单主机连接数，空闲连接保持一段时间，DNS 结果缓存
+- 会话绑定创建它的事件循环，因此调用方应使用持久事件循环，
+  每次 asyncio.run() 都会得到新的会话（旧循环关闭后其会话被丢弃）
+- 通过 aiohttp TraceConfig 统计新建连接与复用连接次数，见 snapshot()
+
+用法:
+    session = get_session("http://127.0.0.1:9847")
+    async with session.post(url, json=payload) as resp:
+        ...
+    # 退出前（在会话所属的事件循环中）
+    await http_pool.close()
+"""
+import asyncio
+import os
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+# 所有主机的连接总数上限
+POOL_LIMIT = int(os.getenv("OPENCLAW_HTTP_POOL_LIMIT", "100"))
+# 单个主机的连接数上限
+POOL_LIMIT_PER_HOST = int(os.getenv("OPENCLAW_HTTP_POOL_PER_HOST", "20"))
+# 空闲连接保持时间（秒）
+KEEPALIVE_TIMEOUT = float(os.getenv("OPENCLAW_HTTP_KEEPALIVE", "30"))
+# DNS 缓存时间（秒）
+DNS_CACHE_TTL = int(os.getenv("OPENCLAW_HTTP_DNS_TTL", "300"))
+
+
+def _origin(url: str) -> str:
+    """URL 的 scheme://host:port 部分，作为会话的键"""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{host}:{port}"
+
+
+class SessionPool:
+    """按 (事件循环, 目标源) 缓存的 aiohttp 会话"""
+
+    def __init__(self):
+        self._sessions: Dict[Tuple[asyncio.AbstractEventLoop, str], aiohttp.ClientSession] = {}
+        self.stats = {
+            "sessions_created": 0,
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+        }
+
+    def get(self, url: str) -> aiohttp.ClientSession:
+        """
+        获取发往 url 所在源的会话（须在事件循环中调用）
+
+        会话由池统一管理，调用方不要关闭或用 async with 包裹它。
+        """
+        loop = asyncio.get_running_loop()
+        self._drop_closed_loops()
+        key = (loop, _origin(url))
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._create_session()
+            self._sessions[key] = session
+            self.stats["sessions_created"] += 1
+        return session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.stats["connections_reused"] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def _drop_closed_loops(self) -> None:
+        """丢弃事件循环已关闭的会话（它们已无法再使用，也无法正常关闭）"""
+        for key in [key for key in self._sessions if key[0].is_closed()]:
+            del self._sessions[key]
+
+    async def close(self) -> None:
+        """关闭当前事件循环中的全部会话"""
+        loop = asyncio.get_running_loop()
+        for key in [key for key in self._sessions if key[0] is loop]:
+            session = self._sessions.pop(key)
+            if not session.closed:
+                await session.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """连接复用统计"""
+        created = self.stats["connections_created"]
+        reused = self.stats["connections_reused"]
+        return {
+            **self.stats,
+            "open_sessions": sum(1 for s in self._sessions.values() if not s.closed),
+            "reuse_ratio": round(reused / (created + reused), 3) if created + reused else None,
+        }
+
+
+# 进程级会话池
+http_pool = SessionPool()
+
+
+def get_session(url: str) -> aiohttp.ClientSession:
+    """获取发往 url 所在源的共享会话"""
+    return http_pool.get(url)
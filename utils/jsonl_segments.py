@@ -0,0 +1,373 @@
+"""
+分段 JSONL 日志 (Segmented JSONL Log)
+
+文件桥接的 inbox/outbox 原本是永远追加的单个 JSONL 文件，
+读取成本随运行时间线性增长。这里把它拆成分段：
+
+    <stem>.jsonl            当前写入的活动段
+    <stem>.000001.jsonl     已封存的历史段（序号递增）
+    <stem>.<consumer>.checkpoint.json   各消费者读到的位置
+
+- 活动段超过大小或时间上限时改名封存，新消息写入新的活动段
+- 读取位置用 (段序号, 段内偏移) 表示；活动段的序号是“封存后将获得的序号”，
+  因此轮转前后位置始终有效
+- 所有消费者都读过的封存段会被清理；长期未更新的消费者视为失效，
+  超过保留期的封存段无论如何都会删除，保证磁盘占用有上限
+- 每个消费者单独一个检查点文件（先写临时文件再原子替换），
+  Windows 宿主与 Docker 容器中的进程互不覆盖对方的记录
+"""
+import json
+import mmap
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 活动段大小上限（字节）
+SEGMENT_MAX_BYTES = int(os.getenv("OPENCLAW_SEGMENT_MAX_BYTES", str(8 * 1024 * 1024)))
+# 活动段时间上限（秒）
+SEGMENT_MAX_AGE = float(os.getenv("OPENCLAW_SEGMENT_MAX_AGE", "86400"))
+# 封存段与消费者检查点的保留期（秒）
+SEGMENT_RETENTION = float(os.getenv("OPENCLAW_SEGMENT_RETENTION", str(7 * 86400)))
+
+Cursor = Tuple[int, int]
+
+
+class SegmentedLog:
+    """
+    分段 JSONL 日志
+
+    写入方调用 append()；读取方保存 read() 返回的位置，
+    需要参与清理的消费者用 commit() 持久化位置。
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        stem: str,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        retention: Optional[float] = None,
+    ):
+        self.directory = Path(directory)
+        self.stem = stem
+        self.max_bytes = SEGMENT_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age = SEGMENT_MAX_AGE if max_age is None else max_age
+        self.retention = SEGMENT_RETENTION if retention is None else retention
+        self._segment_re = re.compile(rf"^{re.escape(stem)}\.(\d{{6,}})\.jsonl$")
+        self._birth: Optional[Tuple[int, float]] = None  # (inode, 活动段创建时间)
+
+    # ---- 路径 ----
+
+    @property
+    def active_path(self) -> Path:
+        """活动段路径"""
+        return self.directory / f"{self.stem}.jsonl"
+
+    def segment_path(self, seq: int) -> Path:
+        """封存段路径"""
+        return self.directory / f"{self.stem}.{seq:06d}.jsonl"
+
+    def checkpoint_path(self, consumer: str) -> Path:
+        """消费者检查点路径"""
+        return self.directory / f"{self.stem}.{consumer}.checkpoint.json"
+
+    def segments(self) -> List[int]:
+        """已封存段的序号（升序）"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        seqs = []
+        for name in names:
+            match = self._segment_re.match(name)
+            if match:
+                seqs.append(int(match.group(1)))
+        return sorted(seqs)
+
+    @staticmethod
+    def _active_seq(segments: List[int]) -> int:
+        return (segments[-1] if segments else 0) + 1
+
+    # ---- 位置 ----
+
+    def start_cursor(self) -> Cursor:
+        """最早一条仍保留的记录的位置"""
+        segments = self.segments()
+        return (segments[0] if segments else self._active_seq(segments), 0)
+
+    def end_cursor(self) -> Cursor:
+        """当前末尾位置（之后写入的记录才会被读到）"""
+        seq = self._active_seq(self.segments())
+        try:
+            size = self.active_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        return seq, size
+
+    # ---- 写入 ----
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """追加一条记录（必要时先轮转活动段）"""
+        self.maybe_rotate()
+        with open(self.active_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def maybe_rotate(self) -> bool:
+        """
+        活动段超过大小或时间上限时封存
+
+        @returns 是否发生了轮转
+        """
+        try:
+            st = self.active_path.stat()
+        except FileNotFoundError:
+            return False
+        if st.st_size == 0:
+            return False
+        too_big = self.max_bytes > 0 and st.st_size >= self.max_bytes
+        too_old = self.max_age > 0 and time.time() - self._active_birth(st) >= self.max_age
+        if not (too_big or too_old):
+            return False
+
+        seq = self._active_seq(self.segments())
+        while self.segment_path(seq).exists():
+            seq += 1
+        try:
+            os.rename(self.active_path, self.segment_path(seq))
+        except (FileNotFoundError, PermissionError):
+            # 其他写入方已经轮转，或 Windows 上文件正被占用，下次再试
+            return False
+        self._birth = None
+        self.compact()
+        return True
+
+    def _active_birth(self, st: os.stat_result) -> float:
+        """活动段创建时间：取首条记录的 timestamp，缺失时用修改时间"""
+        if self._birth is not None and self._birth[0] == st.st_ino:
+            return self._birth[1]
+        birth = st.st_mtime
+        try:
+            with open(self.active_path, "r", encoding="utf-8") as f:
+                first = json.loads(f.readline())
+            birth = datetime.fromisoformat(first["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        self._birth = (st.st_ino, birth)
+        return birth
+
+    # ---- 读取 ----
+
+    def read(self, cursor: Cursor) -> Tuple[List[Dict[str, Any]], Cursor]:
+        """
+        读取位置之后的所有完整记录
+
+        写了一半的行留到下次读取；无法解析的行跳过。
+        @returns (记录列表, 新位置)
+        """
+        lines, cursor = self.read_lines(cursor)
+        entries = []
+        for _, _, raw in lines:
+            entry = self.parse_line(raw)
+            if entry is not None:
+                entries.append(entry)
+        return entries, cursor
+
+    def read_lines(self, cursor: Cursor) -> Tuple[List[Tuple[int, int, bytes]], Cursor]:
+        """
+        读取位置之后的所有完整行（不解析）
+
+        @returns ([(段序号, 行起始偏移, 行内容)], 新位置)
+        """
+        seq, offset = cursor
+        lines: List[Tuple[int, int, bytes]] = []
+        while True:
+            segments = self.segments()
+            active_seq = self._active_seq(segments)
+            sealed = seq in segments
+            if not sealed and seq != active_seq:
+                if seq > active_seq:
+                    # 日志被整体重置
+                    seq, offset = active_seq, 0
+                else:
+                    # 所在段已被清理，跳到下一个仍存在的段
+                    later = [s for s in segments if s > seq]
+                    seq, offset = (later[0] if later else active_seq), 0
+                continue
+
+            path = self.segment_path(seq) if sealed else self.active_path
+            scanned = self._scan_lines(path, offset)
+            if scanned is None:
+                # 文件比记录的位置短：活动段刚被轮转或被截断
+                if not sealed and seq in self.segments():
+                    continue
+                offset = 0
+                continue
+            if not sealed and seq in self.segments():
+                # 打开前活动段已被轮转，读到的是新活动段，改读封存段
+                continue
+
+            found, offset = scanned
+            lines.extend((seq, start, raw) for start, raw in found)
+            if sealed:
+                seq, offset = seq + 1, 0
+                continue
+            return lines, (seq, offset)
+
+    def read_at(self, seq: int, offset: int) -> Optional[Dict[str, Any]]:
+        """
+        读取指定位置的一条记录，所在分段已被清理或位置已失效时返回 None
+
+        位置的段序号就是活动段封存后的序号：只有序号等于当前活动段时才读活动段，
+        已清理的封存段不会读到活动段里同一偏移处的其他记录
+        """
+        segments = self.segments()
+        sealed = seq in segments
+        if not sealed and seq != self._active_seq(segments):
+            return None
+        scanned = self._scan_lines(self.segment_path(seq) if sealed else self.active_path, offset, limit=1)
+        if not sealed and seq in self.segments():
+            # 读取期间活动段被轮转，改读封存段
+            scanned = self._scan_lines(self.segment_path(seq), offset, limit=1)
+        if not scanned or not scanned[0]:
+            return None
+        return self.parse_line(scanned[0][0][1])
+
+    @staticmethod
+    def parse_line(raw: bytes) -> Optional[Dict[str, Any]]:
+        """解析一行 JSON，空行或无法解析时返回 None"""
+        if not raw.strip():
+            return None
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def count(
+        self,
+        cursor: Optional[Cursor] = None,
+        where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Tuple[int, Cursor]:
+        """
+        统计位置之后（默认从最早的保留分段开始）的完整记录数
+
+        写了一半的行不计入，从返回的位置继续统计即可增量累加。
+        @param where 只统计满足条件的记录
+        @returns (条数, 新位置)
+        """
+        lines, cursor = self.read_lines(self.start_cursor() if cursor is None else cursor)
+        total = 0
+        for _, _, raw in lines:
+            entry = self.parse_line(raw)
+            if entry is not None and (where is None or where(entry)):
+                total += 1
+        return total, cursor
+
+    @staticmethod
+    def _scan_lines(
+        path: Path, offset: int, limit: int = 0
+    ) -> Optional[Tuple[List[Tuple[int, bytes]], int]]:
+        """
+        内存映射文件，从 offset 起切出以换行结尾的完整行
+
+        只触及 offset 之后的字节，文件再大也不会整体读入。
+        @param limit 最多返回的行数，0 表示不限
+        @returns ([(行起始偏移, 行内容)], 已消费到的偏移)；文件比 offset 短时返回 None
+        """
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < offset:
+                    return None
+                if size == offset:
+                    return [], offset
+                with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                    lines = []
+                    pos = offset
+                    while not limit or len(lines) < limit:
+                        end = mm.find(b"\n", pos, size)
+                        if end < 0:
+                            break
+                        lines.append((pos, mm[pos:end]))
+                        pos = end + 1
+                    return lines, pos
+        except FileNotFoundError:
+            return None if offset else ([], 0)
+
+    # ---- 检查点与清理 ----
+
+    def load_checkpoint(self, consumer: str) -> Optional[Cursor]:
+        """读取消费者检查点，不存在时返回 None"""
+        try:
+            with open(self.checkpoint_path(consumer), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def commit(self, consumer: str, cursor: Cursor) -> None:
+        """原子写入消费者检查点"""
+        path = self.checkpoint_path(consumer)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        data = {
+            "consumer": consumer,
+            "segment": cursor[0],
+            "offset": cursor[1],
+            "updated": datetime.now().isoformat(),
+        }
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _consumer_positions(self) -> List[int]:
+        """仍活跃的消费者所在段序号"""
+        positions = []
+        now = time.time()
+        suffix = ".checkpoint.json"
+        prefix = f"{self.stem}."
+        for name in os.listdir(self.directory):
+            if not (name.startswith(prefix) and name.endswith(suffix)):
+                continue
+            path = self.directory / name
+            try:
+                if self.retention > 0 and now - path.stat().st_mtime > self.retention:
+                    continue
+            except FileNotFoundError:
+                continue
+            cursor = self.load_checkpoint(name[len(prefix):-len(suffix)])
+            if cursor is not None:
+                positions.append(cursor[0])
+        return positions
+
+    def compact(self) -> int:
+        """
+        删除不再需要的封存段
+
+        - 所有活跃消费者都已读过的段
+        - 超过保留期的段（消费者失效或从未登记时的兜底）
+        最新的封存段始终保留，以保证段序号单调递增。
+        @returns 删除的段数
+        """
+        segments = self.segments()
+        if len(segments) <= 1:
+            return 0
+        positions = self._consumer_positions()
+        floor = min(positions) if positions else None
+        now = time.time()
+
+        removed = 0
+        for seq in segments[:-1]:
+            path = self.segment_path(seq)
+            consumed = floor is not None and seq < floor
+            try:
+                expired = self.retention > 0 and now - path.stat().st_mtime > self.retention
+                if consumed or expired:
+                    path.unlink()
+                    removed += 1
+            except (FileNotFoundError, PermissionError):
+                continue
+        return removed
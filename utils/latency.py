@@ -0,0 +1,52 @@
+"""
+延迟统计 (Latency Stats)
+
+累计次数、平均值与最大值，并在最近 window 个样本上计算分位数。
+所有操作与历史总量无关，可以在状态接口中频繁调用。
+"""
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyStats:
+    """滑动窗口延迟统计（单位：秒）"""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """记录一次耗时"""
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        最近样本的分位数
+
+        @param q 0~100
+        @returns 没有样本时返回 None
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """统计摘要（毫秒）"""
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "count": self.count,
+            "avg_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
@@ -0,0 +1,54 @@
+"""
+有界时间窗口去重 (Recent IDs)
+
+记录最近见过的消息 ID：超过 ttl 的记录过期，
+总数超过 max_size 时淘汰最旧的记录，内存占用有上限。
+"""
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class RecentIds:
+    """
+    最近 ID 集合
+
+    按插入时间排序的 OrderedDict，过期与淘汰都只需从头部弹出。
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def add(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """
+        记录一个 ID
+
+        @returns 首次出现返回 True，窗口内重复返回 False
+        """
+        now = time.time() if now is None else now
+        self._expire(now)
+        if key in self._items:
+            return False
+        self._items[key] = now
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        self._expire(time.time())
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _expire(self, now: float) -> None:
+        if self.ttl <= 0:
+            return
+        cutoff = now - self.ttl
+        while self._items:
+            key, seen_at = next(iter(self._items.items()))
+            if seen_at >= cutoff:
+                break
+            self._items.popitem(last=False)
@@ -0,0 +1,72 @@
+"""
+流式回复分段 (Reply Segmenter)
+
+把流式到达的回复切成适合逐条发送到微信的消息段：
+
+- 缓冲区中出现段落边界（空行）时，切出边界之前、不超过长度上限的全部内容，
+  第一段写完即可发送；发送期间积累的多个段落会合并成一条，避免刷屏
+- 没有段落边界但超过长度上限时，在上限内最后一个换行或句末标点处切分，
+  找不到则硬切
+- 拼接所有消息段（忽略段间空白）等于原文
+"""
+import re
+from typing import List
+
+# 句末标点（切分点在标点之后）
+_SENTENCE_END = re.compile(r"[。！？!?；;…]|\.(?=\s)|\n")
+
+
+class ReplySegmenter:
+    """流式回复分段器"""
+
+    def __init__(self, max_length: int = 500):
+        self.max_length = max(1, max_length)
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        追加一段流式文本
+
+        @returns 已经完整、可以立即发送的消息段
+        """
+        self._buffer += text
+        segments = []
+        while True:
+            segment = self._cut()
+            if segment is None:
+                return segments
+            if segment:
+                segments.append(segment)
+
+    def flush(self) -> List[str]:
+        """流结束：返回剩余内容（超长时同样按上限切分）"""
+        segments = []
+        while len(self._buffer) > self.max_length:
+            segment = self._cut()
+            if segment:
+                segments.append(segment)
+        rest, self._buffer = self._buffer.strip(), ""
+        if rest:
+            segments.append(rest)
+        return segments
+
+    def _cut(self):
+        """切出一段；内容还不够成段时返回 None（切出的空白段返回空字符串）"""
+        buffer = self._buffer
+        limit = self.max_length
+
+        boundary = buffer.rfind("\n\n", 0, limit + 1)
+        if boundary >= 0:
+            self._buffer = buffer[boundary + 2:]
+            return buffer[:boundary].strip()
+
+        if len(buffer) <= limit:
+            return None
+
+        cut = 0
+        for match in _SENTENCE_END.finditer(buffer, 0, limit):
+            cut = match.end()
+        if cut <= 0:
+            cut = limit
+        self._buffer = buffer[cut:]
+        return buffer[:cut].strip()
@@ -0,0 +1,159 @@
+"""
+回复文件尾随读取器 (Reply Tailer)
+
+文件桥接模式下，所有等待回复的请求共用一个后台任务读取 outbox：
+只从上次读到的偏移处解析新追加的行，再按 reply_to 分发给对应的等待方，
+避免每个请求各自反复 readlines 整个回复文件。
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncGenerator, Dict, Optional, Tuple
+
+from utils.file_watcher import FileWatcher
+from utils.jsonl_segments import SegmentedLog
+
+# 分发给等待方的事件：("chunk", 片段) 或 ("done", 完整回复)
+ReplyEvent = Tuple[str, str]
+
+
+class ReplyTailer:
+    """
+    outbox 尾随读取器
+
+    - 启动时定位到文件末尾，历史回复不再解析
+    - 只消费以换行结尾的完整行，写了一半的行留到下次再读
+    - 按分段日志读取，活动段轮转时接着读封存段
+    - partial 行分发为 ("chunk", chunk)，最终回复分发为 ("done", reply)
+    - 由 FileWatcher 在文件变化时唤醒，rescan_interval 只作兜底重读
+    - 以 consumer 名义定期提交检查点，供写入方清理已读过的封存段
+    """
+
+    def __init__(
+        self,
+        reply_file: Path,
+        rescan_interval: float = 1.0,
+        consumer: str = "bridge",
+        checkpoint_interval: float = 5.0,
+    ):
+        self.reply_file = Path(reply_file)
+        self.rescan_interval = rescan_interval
+        self.consumer = consumer
+        self.checkpoint_interval = checkpoint_interval
+        self.log = SegmentedLog(self.reply_file.parent, self.reply_file.stem)
+        self.watcher = FileWatcher(self.reply_file.parent, names=[self.reply_file.name])
+        self._cursor = self.log.end_cursor()
+        self._committed: Optional[Tuple[int, int]] = None
+        self._last_commit = 0.0
+        self._waiters: Dict[str, asyncio.Queue] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"lines": 0, "replies": 0, "dispatched": 0, "unmatched": 0}
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台读取任务"""
+        if self._task is not None:
+            return
+        self._cursor = self.log.end_cursor()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台读取任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.watcher.close()
+        if self._cursor != self._committed:
+            self.log.commit(self.consumer, self._cursor)
+            self._committed = self._cursor
+
+    def register(self, msg_id: str) -> asyncio.Queue:
+        """
+        登记等待方
+
+        须在消息写入 inbox 之后、下一次 await 之前调用，保证不会错过回复。
+        @returns 接收 ReplyEvent 的队列
+        """
+        queue = asyncio.Queue()
+        self._waiters[msg_id] = queue
+        return queue
+
+    def unregister(self, msg_id: str) -> None:
+        """取消登记（等待结束或超时后调用）"""
+        self._waiters.pop(msg_id, None)
+
+    async def iter_reply(self, msg_id: str, timeout: float) -> AsyncGenerator[ReplyEvent, None]:
+        """
+        等待某条消息的回复
+
+        按顺序产出 ("chunk", 片段)，最后产出 ("done", 完整回复)；超时则直接结束。
+        须在消息写入 inbox 后立即开始迭代（中间不能有 await）。
+        """
+        queue = self.register(msg_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    kind, text = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return
+                yield kind, text
+                if kind == "done":
+                    return
+        finally:
+            self.unregister(msg_id)
+
+    @property
+    def waiting(self) -> int:
+        """当前等待回复的请求数"""
+        return len(self._waiters)
+
+    def poll(self) -> int:
+        """
+        读取一次新增内容并分发
+
+        @returns 本次分发的事件数
+        """
+        entries, self._cursor = self.log.read(self._cursor)
+        dispatched = 0
+        for entry in entries:
+            self.stats["lines"] += 1
+            if not entry.get("partial"):
+                self.stats["replies"] += 1
+            if self._dispatch(entry):
+                dispatched += 1
+
+        now = time.monotonic()
+        if self._cursor != self._committed and now - self._last_commit >= self.checkpoint_interval:
+            self.log.commit(self.consumer, self._cursor)
+            self._committed, self._last_commit = self._cursor, now
+        return dispatched
+
+    def _dispatch(self, entry: dict) -> bool:
+        queue = self._waiters.get(entry.get("reply_to"))
+        if queue is None:
+            self.stats["unmatched"] += 1
+            return False
+        if entry.get("partial"):
+            queue.put_nowait(("chunk", entry.get("chunk", "")))
+        else:
+            queue.put_nowait(("done", entry.get("reply", "[Empty reply]")))
+        self.stats["dispatched"] += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            token = self.watcher.mark()
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error reading reply file: {e}")
+            await self.watcher.wait(token, timeout=self.rescan_interval)
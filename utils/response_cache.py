@@ -0,0 +1,179 @@
+"""
+回复缓存 (Response Cache)
+
+相当一部分消息是重复提问：问候、“你是谁”、同一个常见问题，
+每条都要完整跑一遍 ReAct 循环。这里按归一化后的提问缓存回复：
+
+- normalize_query 统一全半角、大小写，去掉空白与标点表情，“你是谁？”与“你是谁”命中同一条
+- classify_query 只给上下文无关的提问分类（问候 / 身份 / 常见问题），不同分类使用不同 TTL；
+  无法分类的消息不缓存
+- 常见问题的回答仍可能受该会话的对话历史影响，缓存键带上会话键，只在同一会话内复用；
+  问候与身份回复与会话无关，跨会话共享
+- is_side_effecting 识别会触发发送、提醒、执行等副作用工具的消息，这类消息既不读也不写缓存
+- ResponseCache 是 SQLite 持久化 + 内存 LRU 前端，热点条目不必访问磁盘，重启后缓存仍在
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+# 各分类的默认 TTL（秒）
+DEFAULT_TTLS: Dict[str, float] = {
+    "greeting": 24 * 3600,
+    "identity": 7 * 24 * 3600,
+    "faq": 3600,
+}
+
+# 常见问题的最大长度（更长的消息通常带有具体上下文）
+FAQ_MAX_CHARS = 40
+
+_GREETING = re.compile(
+    r"(你好|您好|hi|hello|hey|嗨|哈喽|早|早上好|早安|中午好|下午好|晚上好|晚安|在吗|在不在)(呀|啊|哦|呢|哇)?"
+)
+_IDENTITY = re.compile(
+    r"(你是谁|你叫什么(名字)?|你是什么|你能做什么|你会什么|你会做什么|你有什么功能|介绍一下你自己|自我介绍(一下)?)(呀|啊|呢)?"
+)
+_QUESTION = re.compile(r"什么|怎么|如何|为什么|为何|哪些|哪个|是否|吗$|呢$|^(how|what|why|which)")
+# 答案随时间变化的提问
+_TIME_SENSITIVE = re.compile(r"今天|明天|昨天|现在|最近|最新|目前|实时|天气|新闻|股价|汇率|几点|时间|日期")
+# 依赖前文的提问（指代、追问）
+_CONTEXTUAL = re.compile(r"它|他|她|这个|那个|这些|那些|上面|刚才|之前|继续|还有")
+# 会触发副作用工具（发送、提醒、执行、文件与系统操作）或实时查询的提问
+_SIDE_EFFECT = re.compile(
+    r"发送|发给|转发|提醒|定时|删除|清除|清空|保存|写入|记录|执行|运行|打开|关闭|启动|重启|进化|"
+    r"更新|同步|上传|下载|截图|播放|朗读|语音|切换|安装|设置|配置|搜|查"
+)
+
+
+def normalize_query(text: str) -> str:
+    """归一化提问：全半角统一、小写、去掉空白、标点与表情符号"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(
+        ch for ch in text
+        if not ch.isspace() and unicodedata.category(ch)[0] not in ("P", "S", "C")
+    )
+
+
+def classify_query(normalized: str) -> Optional[str]:
+    """
+    给归一化后的提问分类
+
+    @returns "greeting" / "identity" / "faq"，不适合缓存时返回 None
+    """
+    if not normalized:
+        return None
+    if _GREETING.fullmatch(normalized):
+        return "greeting"
+    if _IDENTITY.fullmatch(normalized):
+        return "identity"
+    if (
+        len(normalized) <= FAQ_MAX_CHARS
+        and _QUESTION.search(normalized)
+        and not _TIME_SENSITIVE.search(normalized)
+        and not _CONTEXTUAL.search(normalized)
+    ):
+        return "faq"
+    return None
+
+
+def is_side_effecting(text: str) -> bool:
+    """消息是否可能触发有副作用的工具（按原文判断，含命令前缀 #）"""
+    return (text or "").lstrip().startswith("#") or bool(_SIDE_EFFECT.search(text or ""))
+
+
+def cache_key(normalized: str, role_level: int, version: str, session: str = "") -> str:
+    """缓存键：归一化提问 + 角色级别 + 提示词/工具版本（+ 会话键，为空表示跨会话共享）"""
+    raw = "\x00".join((version, str(role_level), session, normalized))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite + 内存 LRU 的回复缓存
+
+    @param db_path 数据库路径，None 表示只用内存（不持久化）
+    @param capacity 内存 LRU 的条目数
+    """
+
+    # 每写入多少次清理一次过期条目
+    PURGE_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: Union[str, Path, None],
+        capacity: int = 512,
+        clock: Optional[Callable[[], float]] = None,
+    ):
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.capacity = max(1, capacity)
+        self._clock = clock or time.time
+        self._lru: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:" if db_path is None else str(db_path), check_same_thread=False)
+        self._writes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    reply TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )"""
+            )
+
+    def _remember(self, key: str, reply: str, expires_at: float) -> None:
+        self._lru[key] = (reply, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的回复，未命中返回 None"""
+        now = self._clock()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT reply, expires_at FROM response_cache WHERE key = ?", (key,)
+                ).fetchone()
+                entry = tuple(row) if row else None
+            if entry is None or entry[1] <= now:
+                self._lru.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._remember(key, *entry)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, category: str, reply: str, ttl: float) -> None:
+        """写入回复（ttl <= 0 表示该分类不缓存）"""
+        if ttl <= 0 or not reply:
+            return
+        expires_at = self._clock() + ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, category, reply, expires_at) VALUES (?, ?, ?, ?)",
+                (key, category, reply, expires_at),
+            )
+            self._remember(key, reply, expires_at)
+            self.stats["stores"] += 1
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (self._clock(),))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._lru.clear()
+            self._conn.execute("DELETE FROM response_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
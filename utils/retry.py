@@ -0,0 +1,207 @@
+"""
+重试策略 (Retry Policy)
+
+同一套策略同时用于协程与普通函数：
+
+- 指数退避 + 全抖动：第 n 次重试等待 uniform(0, min(max_delay, base × multiplier^(n-1)))，
+  多个客户端同时失败时不会在同一时刻一起重试
+- 只重试可重试的错误（连接失败、超时、RetryableError），参数错误等直接抛出
+- 下游给出 Retry-After 时至少等待该时长
+- 每次调用有总时限：时限内放不下下一次等待就放弃；协程的每次尝试也受剩余时间约束
+- 重试预算是令牌桶：每次调用积累 ratio 个令牌，每次重试消耗 1 个，
+  下游大面积故障时重试量被限制在正常流量的约 ratio 倍，不会把下游进一步压垮
+
+用法:
+    policy = RetryPolicy(max_attempts=4, base_delay=0.5, deadline=60, budget=retry_budget)
+    reply = await policy.call_async(send, message)
+
+    @policy
+    def flaky(): ...
+"""
+import asyncio
+import functools
+import inspect
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+
+# 重试预算：每次调用允许的重试比例
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+# 重试预算令牌上限（也是启动时的初始令牌数）
+RETRY_BUDGET_BURST = float(os.getenv("RETRY_BUDGET_BURST", "10"))
+
+
+class RetryableError(Exception):
+    """
+    可重试的错误（例如下游返回 429/503）
+
+    @param retry_after 下游建议的最短等待时间（秒）
+    """
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# 默认视为可重试的异常
+DEFAULT_RETRYABLE: Tuple[Type[BaseException], ...] = (
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    RetryableError,
+)
+
+
+class RetryBudget:
+    """重试令牌桶（可在多个策略间共享）"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, burst: float = RETRY_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self) -> None:
+        """每次调用（首次尝试）调用一次"""
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """尝试消耗一次重试额度"""
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+# 进程级共享的重试预算（各 OpenClaw 连接器共用）
+retry_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    @param max_attempts 最多尝试次数（含首次）
+    @param base_delay 首次重试的退避上限（秒）
+    @param max_delay 单次退避上限（秒）
+    @param multiplier 退避倍数
+    @param deadline 每次调用的总时限（秒），None 表示不限
+    @param retry_on 可重试的异常类型
+    @param retry_if 判断异常是否可重试的函数，指定时代替 retry_on（类型不足以区分时使用）
+    @param budget 重试预算，None 表示不限
+    @param on_retry 每次重试前的回调 (attempt, delay, exc)，用于记录日志
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        multiplier: float = 2.0,
+        deadline: Optional[float] = None,
+        retry_on: Tuple[Type[BaseException], ...] = DEFAULT_RETRYABLE,
+        retry_if: Optional[Callable[[BaseException], bool]] = None,
+        budget: Optional[RetryBudget] = None,
+        on_retry: Optional[Callable[[int, float, BaseException], None]] = None,
+        clock: Optional[Callable[[], float]] = None,
+        rand: Optional[Callable[[float, float], float]] = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.retry_if = retry_if
+        self.budget = budget
+        self.on_retry = on_retry
+        self._clock = clock or time.monotonic
+        self._rand = rand or random.uniform
+        self.stats = {"calls": 0, "retries": 0, "budget_denied": 0, "gave_up": 0}
+
+    def retryable(self, exc: BaseException) -> bool:
+        """异常是否可重试"""
+        if self.retry_if is not None:
+            return self.retry_if(exc)
+        return isinstance(exc, self.retry_on)
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的退避时间（全抖动）"""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return self._rand(0.0, ceiling)
+
+    def _next_delay(self, attempt: int, exc: BaseException, expires: Optional[float]) -> Optional[float]:
+        """失败后下一次重试前的等待时间；返回 None 表示放弃"""
+        if not self.retryable(exc) or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if expires is not None and self._clock() + delay >= expires:
+            return None
+        if self.budget is not None and not self.budget.try_spend():
+            self.stats["budget_denied"] += 1
+            return None
+        self.stats["retries"] += 1
+        if self.on_retry:
+            self.on_retry(attempt, delay, exc)
+        return delay
+
+    def _start(self, deadline: Optional[float]) -> Optional[float]:
+        """开始一次调用，返回截止时刻"""
+        self.stats["calls"] += 1
+        if self.budget is not None:
+            self.budget.deposit()
+        deadline = self.deadline if deadline is None else deadline
+        return None if deadline is None else self._clock() + deadline
+
+    def call(self, func: Callable[..., Any], *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        """同步执行 func，失败时按策略重试"""
+        expires = self._start(deadline)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, expires)
+                if delay is None:
+                    self.stats["gave_up"] += 1
+                    raise
+            time.sleep(delay)
+
+    async def call_async(
+        self, func: Callable[..., Awaitable[Any]], *args: Any, deadline: Optional[float] = None, **kwargs: Any
+    ) -> Any:
+        """执行协程函数 func，失败时按策略重试（每次尝试受剩余时限约束）"""
+        expires = self._start(deadline)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if expires is None:
+                    return await func(*args, **kwargs)
+                return await asyncio.wait_for(func(*args, **kwargs), timeout=max(0.0, expires - self._clock()))
+            except Exception as e:
+                delay = self._next_delay(attempt, e, expires)
+                if delay is None:
+                    self.stats["gave_up"] += 1
+                    raise
+            await asyncio.sleep(delay)
+
+    def __call__(self, func: Callable) -> Callable:
+        """装饰器用法：按 func 是否为协程函数选择同步或异步重试"""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                return await self.call_async(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+    def snapshot(self) -> dict:
+        return {**self.stats, **({"tokens": round(self.budget.tokens, 2)} if self.budget else {})}
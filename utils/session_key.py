@@ -0,0 +1,42 @@
+"""
+OpenClaw 会话键 (Session Key)
+
+原先所有请求共用 OPENCLAW_SESSION_KEY 一个全局值，后端无法区分对话，
+只能每条消息都从零构建上下文。这里按 (群, 发送者) 派生确定性的会话键：
+
+- 同一私聊 / 同一群里的同一成员，每次得到相同的键，后端可以按键保存对话状态、
+  保持提示缓存热度，并把同一会话固定路由到同一 Worker
+- 键是哈希值，不在请求与日志中暴露联系人或群名称
+- OPENCLAW_SESSION_KEY 作为命名空间参与哈希，不同部署之间的键互不相同
+"""
+import hashlib
+import os
+from typing import Optional
+
+# 会话键命名空间（沿用原全局会话密钥配置）
+SESSION_NAMESPACE = os.getenv("OPENCLAW_SESSION_KEY", "")
+
+
+def derive_session_key(sender: str, room: Optional[str] = None, namespace: Optional[str] = None) -> str:
+    """
+    派生会话键
+
+    @param sender 发送者（私聊联系人或群成员）
+    @param room 群名称，私聊为空
+    @param namespace 命名空间，默认取 OPENCLAW_SESSION_KEY
+    @returns 形如 "dm-1a2b3c4d5e6f7a8b" / "room-..." 的会话键
+    """
+    namespace = SESSION_NAMESPACE if namespace is None else namespace
+    raw = "\x00".join((namespace, room or "", sender or ""))
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    return f"{'room' if room else 'dm'}-{digest}"
+
+
+def session_key_of(entry: dict) -> str:
+    """
+    取出消息条目的会话键（bridge / worker 侧使用）
+
+    旧客户端不带会话键时退回按发送者区分，保持原有的按发送者串行与路由行为。
+    """
+    context = entry.get("context") or {}
+    return entry.get("session_key") or context.get("session_key") or f"sender:{entry.get('sender', 'unknown')}"
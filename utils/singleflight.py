@@ -0,0 +1,125 @@
+"""
+请求合并 (Singleflight)
+
+同一时刻到达的相同请求只执行一次计算，
+其余调用方等待并共享同一份结果。
+
+流式请求使用 stream()：计算在后台任务中执行，产出的每一段广播给所有调用方，
+各调用方按自己的节奏消费（后加入的先补齐已产出的部分）。
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class _StreamFlight:
+    """一次进行中的流式计算：已产出的片段与完成状态"""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        """唤醒等待中的调用方（换新事件，之后的等待不受本次影响）"""
+        event, self.changed = self.changed, asyncio.Event()
+        event.set()
+
+
+class SingleFlight:
+    """
+    进行中请求合并器
+
+    以 key 标识请求：key 相同且首个请求尚未完成时，
+    后续调用不再重复执行，而是等待首个请求的结果（包括异常）。
+    请求完成后立即移除记录，不做结果缓存。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, _StreamFlight] = {}
+        self.stats = {"executed": 0, "shared": 0}
+
+    def __contains__(self, key: Hashable) -> bool:
+        """指定请求是否正在进行中"""
+        return key in self._calls or key in self._streams
+
+    @property
+    def inflight(self) -> int:
+        """当前进行中的不同请求数"""
+        return len(self._calls) + len(self._streams)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入一次请求
+
+        @param key 请求标识
+        @param fn 实际计算的协程工厂，仅由首个调用方执行
+        @returns 计算结果
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.stats["shared"] += 1
+            # shield: 某个等待方被取消时不影响共享的计算结果
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待方时也标记异常已读取，避免 "exception was never retrieved" 警告
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.stats["executed"] += 1
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        执行或加入一次流式请求
+
+        @param key 请求标识
+        @param fn 异步生成器工厂，仅由首个调用方启动（在后台任务中执行，
+                  某个调用方中途退出不影响其他调用方）
+        @returns 逐段产出计算结果；计算抛出的异常在产出已有片段后重新抛出
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = self._streams[key] = _StreamFlight()
+            self.stats["executed"] += 1
+            asyncio.get_running_loop().create_task(self._pump(key, flight, fn))
+        else:
+            self.stats["shared"] += 1
+
+        index = 0
+        while True:
+            changed = flight.changed
+            while index < len(flight.items):
+                yield flight.items[index]
+                index += 1
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await changed.wait()
+
+    async def _pump(self, key: Hashable, flight: _StreamFlight, fn: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for item in fn():
+                flight.items.append(item)
+                flight.notify()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._streams.pop(key, None)
+            flight.notify()
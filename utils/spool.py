@@ -0,0 +1,210 @@
+"""
+文件桥接 spool 目录模式
+
+与 JSONL 追加模式并列的另一种布局（OPENCLAW_FILE_LAYOUT=spool）：
+
+    inbox/<msg_id>.json               一条消息一个文件
+    outbox/<msg_id>.json              对应的最终回复
+    outbox/<msg_id>.<n>.part.json     流式回复的第 n 个片段
+
+每个文件先写入以点开头的临时文件再原子改名，读取方永远看不到写了一半的内容；
+多个写入方之间也不再争用同一个文件。查找回复只需按 ID 打开一个文件。
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from utils.file_watcher import FileWatcher
+
+# 文件桥接布局：jsonl（默认，追加到 wechat_*.jsonl）或 spool（每条消息一个文件）
+FILE_LAYOUT = os.getenv("OPENCLAW_FILE_LAYOUT", "jsonl").lower()
+# 未被取走的回复文件保留时间（秒）
+SPOOL_RETENTION = float(os.getenv("OPENCLAW_SPOOL_RETENTION", "86400"))
+
+_UNSAFE = re.compile(r"[^\w-]")
+# spool 自己的文件名：<id>.json 与 <id>.<n>.part.json（ID 中不含点）。
+# 同一目录下还可能有 JSONL 布局的分段与检查点（wechat_messages.monitor.checkpoint.json 等），
+# 列举与清理都只认这两种格式
+_MESSAGE_FILE = re.compile(r"[\w-]+\.json")
+_PART_FILE = re.compile(r"[\w-]+\.\d+\.part\.json")
+
+
+def _safe_id(msg_id: str) -> str:
+    """消息 ID 转为安全的文件名（点也替换掉，文件名中只有格式本身的点）"""
+    return _UNSAFE.sub("_", str(msg_id))
+
+
+class Spool:
+    """单目录 spool"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, msg_id: str) -> Path:
+        """消息（或最终回复）文件路径"""
+        return self.directory / f"{_safe_id(msg_id)}.json"
+
+    def part_path(self, msg_id: str, seq: int) -> Path:
+        """流式片段文件路径"""
+        return self.directory / f"{_safe_id(msg_id)}.{seq:04d}.part.json"
+
+    # ---- 写入 ----
+
+    def _write(self, path: Path, entry: Dict[str, Any]) -> None:
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def put(self, msg_id: str, entry: Dict[str, Any]) -> None:
+        """原子写入消息或最终回复"""
+        self._write(self.path(msg_id), entry)
+
+    def put_part(self, msg_id: str, seq: int, entry: Dict[str, Any]) -> None:
+        """原子写入流式片段"""
+        self._write(self.part_path(msg_id, seq), entry)
+
+    # ---- 读取 ----
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return None
+
+    def get(self, msg_id: str) -> Optional[Dict[str, Any]]:
+        """按 ID 读取消息或最终回复，不存在时返回 None"""
+        return self._read(self.path(msg_id))
+
+    def get_part(self, msg_id: str, seq: int) -> Optional[Dict[str, Any]]:
+        """读取第 seq 个流式片段，不存在时返回 None"""
+        return self._read(self.part_path(msg_id, seq))
+
+    def exists(self, msg_id: str) -> bool:
+        """是否已有该 ID 的消息或最终回复"""
+        return self.path(msg_id).exists()
+
+    def pending(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        目录中的全部消息（不含片段），按写入时间排序
+
+        @returns [(文件名中的 ID, 内容)]
+        """
+        found = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for item in entries:
+                    name = item.name
+                    if not _MESSAGE_FILE.fullmatch(name):
+                        continue
+                    try:
+                        found.append((item.stat().st_mtime_ns, name[:-len(".json")]))
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            return []
+
+        messages = []
+        for _, msg_id in sorted(found):
+            entry = self._read(self.directory / f"{msg_id}.json")
+            if entry is not None:
+                messages.append((msg_id, entry))
+        return messages
+
+    def count(self) -> int:
+        """目录中的消息数（不含片段、临时文件与其他布局的文件）"""
+        try:
+            return sum(1 for name in os.listdir(self.directory) if _MESSAGE_FILE.fullmatch(name))
+        except FileNotFoundError:
+            return 0
+
+    # ---- 清理 ----
+
+    def remove(self, msg_id: str) -> None:
+        """删除消息（或回复）及其全部片段"""
+        prefix = f"{_safe_id(msg_id)}."
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith(prefix) and (name == f"{prefix}json" or name.endswith(".part.json")):
+                try:
+                    (self.directory / name).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def purge(self, max_age: float = SPOOL_RETENTION) -> int:
+        """
+        删除超过 max_age 仍无人取走的文件（等待方超时后遗留的回复、写入中断留下的临时文件）
+
+        @returns 删除的文件数
+        """
+        if max_age <= 0:
+            return 0
+        cutoff = time.time() - max_age
+        removed = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for item in entries:
+                    name = item.name
+                    spool_tmp = name.startswith(".") and name.endswith(".tmp")
+                    if not (spool_tmp or _MESSAGE_FILE.fullmatch(name) or _PART_FILE.fullmatch(name)):
+                        continue
+                    try:
+                        if item.stat().st_mtime < cutoff:
+                            os.unlink(item.path)
+                            removed += 1
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            return 0
+        return removed
+
+
+async def iter_spool_reply(
+    spool: Spool,
+    watcher: FileWatcher,
+    msg_id: str,
+    timeout: float,
+    rescan_interval: float = 5.0,
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """
+    等待 spool 中某条消息的回复
+
+    按顺序产出 ("chunk", 片段)，最后产出 ("done", 完整回复)；
+    超时则直接结束。取走回复后删除对应文件。
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    next_part = 1
+    try:
+        while True:
+            token = watcher.mark()
+            while True:
+                part = spool.get_part(msg_id, next_part)
+                if part is None:
+                    break
+                yield "chunk", part.get("chunk", "")
+                next_part += 1
+
+            reply = spool.get(msg_id)
+            if reply is not None:
+                yield "done", reply.get("reply", "[Empty reply]")
+                return
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            await watcher.wait(token, timeout=min(rescan_interval, remaining))
+    finally:
+        spool.remove(msg_id)
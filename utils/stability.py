@@ -4,50 +4,97 @@
 提供异常重试装饰器、微信窗口保活、
 全局异常处理等机制确保长时间后台运行。
 """
-import time
 import functools
-from typing import Callable, Any
+import inspect
+from typing import Callable, Any, Optional
 
 from utils.logger import logger
+from utils.retry import DEFAULT_RETRYABLE, RetryPolicy
 from core.config import conf
 
+try:
+    from pywintypes import com_error as _ComError
+except ImportError:  # 非 Windows 环境没有 pywin32
+    _ComError = OSError
+
+# 微信 UI 自动化的瞬时错误类型（含子类）：COM 调用失败、窗口句柄暂时不可用（OSError）
+UI_RETRYABLE: tuple = (_ComError, OSError)
+# wxauto / uiautomation 直接抛出的通用异常（只认这两个类型本身）：
+# 控件查找超时 raise LookupError(...)，窗口未就绪、发送失败等 raise Exception(...)
+_UI_GENERIC_ERRORS = (Exception, LookupError)
+
+
+def isTransientUiError(e: BaseException) -> bool:
+    """
+    是否为值得重试的微信 UI 自动化错误
+
+    除 UI_RETRYABLE 外，wxauto 在窗口未就绪、控件未找到、发送失败时直接 raise Exception("...")，
+    uiautomation 控件查找超时 raise LookupError("...")，这两种通用异常同样重试；
+    它们的子类（TypeError、ValueError、AttributeError、KeyError、IndexError 等）
+    表示参数错误或代码缺陷，重试也不会成功，直接抛出
+    """
+    return isinstance(e, UI_RETRYABLE) or type(e) in _UI_GENERIC_ERRORS
+
 
 def retryOnFailure(
     maxRetries: int | None = None,
     delay: float | None = None,
-    exceptions: tuple = (Exception,),
+    exceptions: tuple = DEFAULT_RETRYABLE,
+    retryIf: Optional[Callable[[BaseException], bool]] = None,
 ) -> Callable:
     """
     异常自动重试装饰器
 
-    在目标函数抛出异常时自动重试指定次数，
-    每次重试间隔递增（简单指数退避）。
+    在目标函数抛出异常时自动重试指定次数，重试间隔为带抖动的指数退避
+    （见 utils.retry.RetryPolicy）。同时支持普通函数与协程函数。
 
-    @param maxRetries 最大重试次数
+    @param maxRetries 最大尝试次数
     @param delay 初始重试延迟（秒）
-    @param exceptions 要捕获的异常类型元组
+    @param exceptions 要捕获并重试的异常类型元组，默认只重试连接错误与超时（utils.retry.DEFAULT_RETRYABLE），
+                      调用方按自己会遇到的瞬时错误显式指定
+    @param retryIf 判断异常是否可重试的函数，指定时代替 exceptions（如 isTransientUiError）
     """
     _max_retries = maxRetries or conf.max_retries
     _delay = delay or conf.retry_delay
 
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            last_exception = None
-            for attempt in range(1, _max_retries + 1):
-                try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    last_exception = e
-                    wait_time = _delay * attempt  # 简单线性退避
-                    logger.warning(
-                        f"[{func.__name__}] 第 {attempt}/{_max_retries} 次重试，"
-                        f"等待 {wait_time:.1f}s，错误: {e}"
-                    )
-                    time.sleep(wait_time)
+        def log_retry(attempt: int, wait_time: float, e: BaseException) -> None:
+            logger.warning(
+                f"[{func.__name__}] 第 {attempt}/{_max_retries} 次重试，"
+                f"等待 {wait_time:.1f}s，错误: {e}"
+            )
+
+        policy = RetryPolicy(
+            max_attempts=_max_retries,
+            base_delay=_delay,
+            max_delay=max(_delay, 30.0),
+            retry_on=exceptions,
+            retry_if=retryIf,
+            on_retry=log_retry,
+        )
 
+        def log_give_up() -> None:
             logger.error(f"[{func.__name__}] 已达最大重试次数 {_max_retries}，放弃执行")
-            raise last_exception  # type: ignore
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                try:
+                    return await policy.call_async(func, *args, **kwargs)
+                except Exception as e:
+                    if policy.retryable(e):
+                        log_give_up()
+                    raise
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return policy.call(func, *args, **kwargs)
+            except Exception as e:
+                if policy.retryable(e):
+                    log_give_up()
+                raise
 
         return wrapper
     return decorator
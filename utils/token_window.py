@@ -0,0 +1,90 @@
+"""
+按 Token 预算截断的对话窗口 (Token Window)
+
+原先的记忆按消息条数截断：一条长消息和一句“好的”占同样的名额，
+提示长度无法预估。这里按估算的 Token 数维护最近若干轮对话：
+
+- estimate_tokens 不依赖分词器：中日韩字符约 1 字 1 Token，其余字符约 4 个 1 Token
+- TokenWindow 用 deque 实现环形缓冲，追加时从最旧的一端淘汰，直到总量不超过预算；
+  淘汰出的轮次交给调用方折叠进滚动摘要
+"""
+import math
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterable, List
+
+# 中日韩文字与全角标点
+_CJK = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+# 每条消息的角色标记等固定开销
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 Token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """保留文本末尾不超过 budget 个 Token 的部分（摘要越靠后越新）"""
+    if estimate_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high) // 2
+        if estimate_tokens(text[mid:]) <= budget:
+            high = mid
+        else:
+            low = mid + 1
+    return text[low:]
+
+
+@dataclass(frozen=True)
+class Turn:
+    """一条对话消息"""
+    seq: int        # 持久化序号（单调递增）
+    role: str       # "user" / "ai"
+    content: str
+    tokens: int
+
+
+class TokenWindow:
+    """Token 预算内的最近对话（环形缓冲）"""
+
+    def __init__(self, budget: int, turns: Iterable[Turn] = ()):
+        self.budget = max(1, budget)
+        self._turns: Deque[Turn] = deque()
+        self.tokens = 0
+        for turn in turns:
+            self._push(turn)
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __iter__(self):
+        return iter(self._turns)
+
+    def _push(self, turn: Turn) -> None:
+        self._turns.append(turn)
+        self.tokens += turn.tokens + MESSAGE_OVERHEAD
+
+    def append(self, turn: Turn) -> List[Turn]:
+        """
+        追加一条消息
+
+        @returns 被淘汰的旧消息（按时间顺序）。最新一条即使单独超出预算也会保留；
+                 淘汰后窗口不以 AI 回复开头，避免留下没有提问的回答
+        """
+        self._push(turn)
+        evicted = []
+        while len(self._turns) > 1 and (
+            self.tokens > self.budget or (evicted and self._turns[0].role != "user")
+        ):
+            old = self._turns.popleft()
+            self.tokens -= old.tokens + MESSAGE_OVERHEAD
+            evicted.append(old)
+        return evicted
@@ -61,6 +61,14 @@ def handle_admin_command(content: str, admin_name: str) -> bool:
                 sender.sendMessage(admin_name, "\n".join(lines))
             return True
 
+        elif cmd == "#重载配置":
+            # 重新读取 .env；OpenClaw 连接器与连接器链在下一条消息时按新配置重建
+            from core.config import conf
+            version = conf.reload()
+            audit_logger.log_action(admin_name, content, f"RELOAD_CONFIG_V{version}")
+            sender.sendMessage(admin_name, f"✅ 配置已重新加载（版本 {version}），OpenClaw 连接将按新配置重建。")
+            return True
+
         elif cmd == "#重启":
             sender.sendMessage(admin_name, "🔄 正在尝试重启助理服务 (Mutation v10.2.1)...")
             from tools.evolution import request_hot_reload
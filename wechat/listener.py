@@ -14,7 +14,7 @@ from typing import Optional
 from core.config import conf
 from core.deduplicator import deduplicator
 from utils.logger import logger, daily_logger
-from utils.stability import retryOnFailure, keepAliveWechatWindow
+from utils.stability import isTransientUiError, retryOnFailure, keepAliveWechatWindow
 from utils.ui_lock import ui_lock
 
 
@@ -52,7 +52,7 @@ class WechatListener:
         self._start_timestamp = time.time()
         logger.info(f"[启动时间] 监听器初始化时间: {datetime.fromtimestamp(self._start_timestamp).strftime('%Y-%m-%d %H:%M:%S')}")
 
-    @retryOnFailure(maxRetries=5, delay=3.0)
+    @retryOnFailure(maxRetries=5, delay=3.0, retryIf=isTransientUiError)
     def _initWechat(self):
         """
         初始化微信连接 (无锁版)
@@ -8,7 +8,7 @@ from typing import Optional
 from pathlib import Path
 from core.config import conf
 from utils.logger import logger
-from utils.stability import retryOnFailure, keepAliveWechatWindow
+from utils.stability import isTransientUiError, retryOnFailure, keepAliveWechatWindow
 from utils.ui_lock import ui_lock
 
 
@@ -89,7 +89,7 @@ class WechatSender:
             return False
         return True
 
-    @retryOnFailure(maxRetries=3, delay=2.0)
+    @retryOnFailure(maxRetries=3, delay=2.0, retryIf=isTransientUiError)
     def sendMessage(self, receiver: str, content: str, context: Optional[str] = None) -> None:
         """
         向指定联系人发送消息（智能版本）
@@ -162,7 +162,7 @@ class WechatSender:
             logger.warning(f"[sendMessage] 发送异常，已清理微信对象以备重试: {e}")
             raise e
 
-    @retryOnFailure(maxRetries=3, delay=2.0)
+    @retryOnFailure(maxRetries=3, delay=2.0, retryIf=isTransientUiError)
     def sendImage(self, receiver: str, image_path: str) -> None:
         """
         向指定联系人发送图片
@@ -196,7 +196,7 @@ class WechatSender:
             logger.warning(f"[sendImage] 发送异常，已清理微信对象以备重试: {e}")
             raise e
 
-    @retryOnFailure(maxRetries=3, delay=2.0)
+    @retryOnFailure(maxRetries=3, delay=2.0, retryIf=isTransientUiError)
     def sendFile(self, receiver: str, file_path: str) -> None:
         """
         向指定联系人发送文件
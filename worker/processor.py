@@ -4,14 +4,19 @@
 从消息队列消费微信消息，
 调用 AI Agent 处理后发送回复。
 """
+import asyncio
 import time
 import threading
 
 import pythoncom
 from wechat.listener import msg_queue, WechatMessage
 from wechat.sender import sender
-from core.agent import processMessage
+from core.agent import processMessage, processMessageStream
+from core.memory import memory_manager
+from core.openclaw_connector import connector_registry
 from core.config import conf
+from utils.http_pool import http_pool
+from utils.reply_segmenter import ReplySegmenter
 from utils.logger import logger, daily_logger
 
 
@@ -21,25 +26,72 @@ class MessageProcessor:
 
     在独立线程中运行，持续从队列取出消息，
     调用 Agent 处理并发送回复。
+    线程内使用一个持久事件循环，HTTP 连接池中的会话与连接得以跨消息复用。
     """
 
+    # stop() 等待处理线程退出的最长时间（秒）
+    STOP_TIMEOUT = 5.0
+
     def __init__(self):
         self._running = False
         self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopDeadline: float | None = None
+
+    async def _streamReply(self, message: WechatMessage, user_input: str) -> tuple[str, int]:
+        """
+        消费流式回复：每凑满一个段落（或达到单条消息长度上限）就立即发送到微信，
+        首条消息的等待时间只取决于第一段的生成速度
+
+        @returns (完整回复, 已发送部分在回复中的长度)
+        """
+        # 预留签名长度，避免发送时再被 sender 二次拆分
+        max_length = int(conf.max_message_length) - len(conf.ai_signature or "")
+        segmenter = ReplySegmenter(max_length)
+        reply = ""
+        sent = 0
+
+        def send(segment: str) -> None:
+            nonlocal sent
+            # 首段做上下文相关性检查，后续段是同一回复的延续
+            sender.sendMessage(
+                receiver=message.sender,
+                content=segment,
+                context=None if sent else user_input
+            )
+            sent += 1
+            if sent == 1:
+                logger.info(f"⚡ 首段回复已提前发送给 [{message.sender}]")
+
+        async for chunk in processMessageStream(
+            userInput=user_input,
+            sender=message.sender,
+            role_level=message.role_level,
+            group_name=message.room or ""
+        ):
+            reply += chunk
+            for segment in segmenter.feed(chunk):
+                send(segment)
+        for segment in segmenter.flush():
+            send(segment)
+        return reply, len(reply) if sent else 0
 
     def _processLoop(self):
         """消息处理主循环"""
         # 初始化线程 COM 环境 (wxauto/uiautomation 必需)
         pythoncom.CoInitialize()
         logger.debug("MessageProcessor 线程 COM 环境已初始化")
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
         
         try:
             while self._running:
                 try:
-                    # 阻塞等待消息，超时 1 秒后重新检查运行状态
+                    # 阻塞等待消息，超时 1 秒后重新检查运行状态；有摘要待完成时缩短等待，空闲时分片推进
                     try:
-                        message: WechatMessage = msg_queue.get(timeout=1.0)
+                        message: WechatMessage = msg_queue.get(timeout=self._summarySlice() if memory_manager.busy else 1.0)
                     except Exception:
+                        self._advanceSummaries()
                         continue
 
                     logger.info(
@@ -180,15 +232,26 @@ class MessageProcessor:
                             msg_queue.task_done()
                             continue
 
+                    # [Fix v10.6.1] 修正下发策略：
+                    # 只有开启了"发送到微信"且当前是"语音输入"时，才跳过文本回复
+                    tts_to_chat = getattr(conf, 'tts_enabled', False) and getattr(conf, 'tts_send_to_chat', False)
+                    should_skip_text = tts_to_chat and is_voice_input
+                    stream_replies = str(getattr(conf, 'stream_replies', False)).lower() == 'true'
+
                     # 调用 AI Agent 获取回复
+                    sent_len = 0
                     try:
-                        import asyncio
-                        # [v7.3 Bridge] 在同步线程中调用异步的 processMessage
-                        reply = asyncio.run(processMessage(
-                            userInput=user_input,
-                            sender=message.sender,
-                            role_level=message.role_level
-                        ))
+                        if stream_replies and not should_skip_text:
+                            # 流式模式：边生成边按段发送，不必等待完整回复
+                            reply, sent_len = self._loop.run_until_complete(self._streamReply(message, user_input))
+                        else:
+                            # [v7.3 Bridge] 在同步线程中调用异步的 processMessage
+                            reply = self._loop.run_until_complete(processMessage(
+                                userInput=user_input,
+                                sender=message.sender,
+                                role_level=message.role_level,
+                                group_name=message.room or ""  # 与发送者一起决定 OpenClaw 会话键
+                            ))
                         # [Fix v10.2.7] 动态模型名称日志
                         provider_name = getattr(conf, 'llm_provider', 'AI').capitalize()
                         logger.info(f"{provider_name} 回复获取成功 [{message.sender}]，长度: {len(reply) if reply else 0}")
@@ -210,19 +273,18 @@ class MessageProcessor:
                     # 通过微信发送回复
                     if reply:
                         try:
-                            # [Fix v10.6.1] 修正下发策略：
-                            # 只有开启了"发送到微信"且当前是"语音输入"时，才跳过文本回复
-                            tts_to_chat = getattr(conf, 'tts_enabled', False) and getattr(conf, 'tts_send_to_chat', False)
-                            should_skip_text = tts_to_chat and is_voice_input
-                            
-                            if not should_skip_text:
+                            remaining = reply[sent_len:].strip()
+                            if not should_skip_text and remaining:
                                 # 传递原始用户输入作为上下文（而不是完整消息内容）
+                                # 首段已提前发送时，后续内容是同一回复的延续，不再做上下文相关性检查
                                 sender.sendMessage(
                                     receiver=message.sender,
-                                    content=reply,
-                                    context=user_input  # 使用处理后的用户输入作为上下文
+                                    content=remaining,
+                                    context=None if sent_len else user_input  # 使用处理后的用户输入作为上下文
                                 )
                                 logger.info(f"✅ 文本回复已发送给 [{message.sender}]")
+                            elif not should_skip_text:
+                                logger.info(f"✅ 流式回复已全部发送给 [{message.sender}]")
                             else:
                                 logger.info(f"🔇 已启用纯语音回复模式，跳过文本发送")
                                 
@@ -237,7 +299,7 @@ class MessageProcessor:
                                 try:
                                     from tools.speech_tool import async_tts_and_play
                                     # 异步触发并获取路径 (v10.6 已集成 SILK 转码)
-                                    final_audio_path = asyncio.run(async_tts_and_play(reply))
+                                    final_audio_path = self._loop.run_until_complete(async_tts_and_play(reply))
                                     
                                     # 如果开启了微信端发送
                                     if final_audio_path and tts_to_chat:
@@ -248,6 +310,9 @@ class MessageProcessor:
                         except Exception as e:
                             logger.error(f"发送回复失败 [{message.sender}]: {e}")
 
+                    # 回复送达后推进对话摘要，最多一个时间片，未完成的在空闲时与后续消息处理期间继续
+                    self._advanceSummaries()
+
                     # 标记任务完成
                     msg_queue.task_done()
 
@@ -255,9 +320,54 @@ class MessageProcessor:
                     logger.error(f"消息循环内部异常: {e}")
                     time.sleep(2)
         finally:
+            self._closeLoop()
             pythoncom.CoUninitialize()
             logger.debug("MessageProcessor 线程 COM 环境已释放")
 
+    @staticmethod
+    def _summarySlice() -> float:
+        return float(getattr(conf, 'memory_summary_slice', 0.2) or 0.2)
+
+    def _advanceSummaries(self) -> None:
+        """让事件循环运行一个时间片以推进后台摘要任务，不等待其完成"""
+        if not memory_manager.busy:
+            return
+        try:
+            self._loop.run_until_complete(memory_manager.flush(self._summarySlice()))
+        except Exception as e:
+            logger.warning(f"对话摘要失败: {e}")
+
+    def _closeLoop(self) -> None:
+        """
+        关闭 OpenClaw 连接器、连接池会话与事件循环（取消遗留的后台任务）
+
+        先关闭连接器与连接池，再用 stop() 等待时限内剩余的时间完成对话摘要，
+        未完成的摘要消息仍在 SQLite 中，下次加载会话时继续折叠。
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.run_until_complete(connector_registry.close())
+            loop.run_until_complete(http_pool.close())
+            if memory_manager.busy:
+                deadline = self._stopDeadline or time.monotonic() + self.STOP_TIMEOUT
+                # 留出取消任务与关闭事件循环的时间
+                remaining = deadline - time.monotonic() - 0.5
+                if remaining > 0:
+                    loop.run_until_complete(memory_manager.flush(remaining))
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        except Exception as e:
+            logger.warning(f"事件循环关闭异常: {e}")
+        finally:
+            loop.close()
+            self._loop = None
+
     def start(self) -> None:
         """启动处理器线程"""
         if self._running:
@@ -265,6 +375,7 @@ class MessageProcessor:
             return
 
         self._running = True
+        self._stopDeadline = None
         self._thread = threading.Thread(
             target=self._processLoop,
             name="MessageProcessor",
@@ -276,8 +387,9 @@ class MessageProcessor:
     def stop(self) -> None:
         """停止处理器"""
         self._running = False
+        self._stopDeadline = time.monotonic() + self.STOP_TIMEOUT
         if self._thread:
-            self._thread.join(timeout=5)
+            self._thread.join(timeout=self.STOP_TIMEOUT)
         logger.info("消息处理器已停止")
 
     @property